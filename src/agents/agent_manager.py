@@ -1,12 +1,56 @@
+from functools import partial
+
+
 class AgentManager:
-    def __init__(self, agents):
+    def __init__(self, agents, middleware=None):
+        '''
+        agents: agents handling the tasks; each task type is routed to the first agent listing it.
+        middleware: middleware wrapping every task, outermost first.
+        '''
         self.agents = agents
+        self.routes = {}
+        for agent in agents:
+            for task_type in agent.task_types:
+                self.routes.setdefault(task_type, agent)
+        self.middleware = []
+        for middleware_item in middleware or []:
+            self.use(middleware_item)
 
-    def dispatch(self, task, context=None):
+    def use(self, middleware, *task_types):
         '''
-        dispatches a task to the appropriate agent based on the task type.
+        wraps the tasks of the given types, or every task if none is given, with a middleware.
+        middleware added later runs inside the one added before it.
         '''
+        self.middleware.append((middleware, set(task_types)))
+        return self
+
+    def _find_agent(self, task):
+        agent = self.routes.get(task.get("type"))
+        if agent is not None:
+            return agent
         for agent in self.agents:
             if agent.can_handle(task):
-                return agent.handle(task, context)
-        raise Exception("No agent can handle this task")
\ No newline at end of file
+                return agent
+        raise Exception("No agent can handle this task")
+
+    def _chain(self, task):
+        task_type = task.get("type")
+        return [middleware for middleware, task_types in self.middleware if not task_types or task_type in task_types]
+
+    def dispatch(self, task, context=None):
+        '''
+        dispatches a task to the appropriate agent based on the task type.
+        '''
+        call = self._find_agent(task).handle
+        for middleware in reversed(self._chain(task)):
+            call = partial(middleware.handle, call_next=call)
+        return call(task, context)
+
+    async def adispatch(self, task, context=None):
+        '''
+        dispatches a task to the appropriate agent without blocking the event loop.
+        '''
+        call = self._find_agent(task).ahandle
+        for middleware in reversed(self._chain(task)):
+            call = partial(middleware.ahandle, call_next=call)
+        return await call(task, context)
@@ -1,6 +1,27 @@
+from runtime.executor import get_executor_service
+
 class BaseAgent:
+    # Task types the agent handles, used by AgentManager to route tasks
+    task_types = ()
+
     def can_handle(self, task):
-        raise NotImplementedError
+        """
+        Check if the agent can handle the given task.
+
+        Args:
+            task (dict): The task to be evaluated
+
+        Returns:
+            bool: True if the task's type is one of the agent's task_types, False otherwise
+        """
+        return task.get("type") in self.task_types
 
     def handle(self, task, context):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    async def ahandle(self, task, context):
+        """
+        Asynchronous variant of handle. Agents with native async work override it;
+        by default the synchronous handle runs on the io pool.
+        """
+        return await get_executor_service().run_io(self.handle, task, context)
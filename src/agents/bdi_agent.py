@@ -1,18 +1,135 @@
-from mistralai.client import MistralClient
-import streamlit as st
+import asyncio
+import functools
+import os
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from types import MappingProxyType
+from llm.client import get_llm_client
+from llm.structured import structured_chat, astructured_chat, schema_instructions, StructuredOutputError
+from nlp.context_packer import ContextPacker
+from runtime.cancellation import cancellation_scope, check_cancelled
+from runtime.executor import get_executor_service
+from .places import PLACE_SCHEMA, PLACES_SCHEMA, PlaceRecord
+from .materialized import MaterializedRecommendations
+from .recommendation_cache import RecommendationCache
+
+# Belief state of every agent taking part in the current request, keyed by agent
+_request_states = ContextVar("bdi_request_states", default=None)
+
+
+class BeliefState:
+    """
+    Beliefs and intentions of one agent while it serves one request.
+    """
+
+    def __init__(self, beliefs):
+        self.beliefs = beliefs
+        self.intentions = []
+
+
+def per_request(method):
+    """
+    Run an agent method, sync or async, inside the agent's request scope.
+
+    Args:
+        method (callable): The method to wrap
+
+    Returns:
+        callable: The wrapped method
+    """
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            with self.request_scope():
+                return await method(self, *args, **kwargs)
+    else:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.request_scope():
+                return method(self, *args, **kwargs)
+    return wrapper
+
 
 class BDIAgent:
+    """
+    Base of the BDI agents. Agent instances hold only immutable knowledge, desires
+    and plans, so one instance serves every session concurrently; beliefs and
+    intentions live in a per-request BeliefState reached through a context variable.
+    """
+
+    # Static domain knowledge, exposed read-only as self.knowledge
+    KNOWLEDGE = {}
+
     def __init__(self, name, vector_db=None):
         self.name = name
         self.vector_db = vector_db
-        self.client = MistralClient(api_key="XEV0fCx3MqiG9HqVkGc4Hy5qyD3WwPHr")
+        self.client = get_llm_client()
+        self.context_packer = ContextPacker()
+        self.structured_output = os.getenv("GPTUR_STRUCTURED_SPECIALISTS", "1") != "0"
         
-        self.beliefs = {"context": []}
+        self.knowledge = MappingProxyType(self.KNOWLEDGE)
         self.desires = []
-        self.intentions = []
         self.plans = {}
+
+    def initial_beliefs(self):
+        """
+        Build the beliefs an agent starts each request with.
+
+        Returns:
+            dict: Fresh, request-owned beliefs
+        """
+        return {"context": []}
+
+    @contextmanager
+    def request_scope(self):
+        """
+        Give the agent its own beliefs for the current request. Nested scopes of the
+        same agent, e.g. action called from process_query, share the outer one.
+        Work started from the scope (threads submitted with a copied context, asyncio
+        tasks) sees the same beliefs; other requests never do.
+
+        Yields:
+            BeliefState: The agent's state for the request
+        """
+        states = _request_states.get() or {}
+        if self in states:
+            yield states[self]
+            return
+        state = BeliefState(self.initial_beliefs())
+        token = _request_states.set({**states, self: state})
+        try:
+            yield state
+        finally:
+            _request_states.reset(token)
+
+    def _state(self):
+        state = (_request_states.get() or {}).get(self)
+        if state is None:
+            # Binding a state here would leak it into later requests served by the same thread
+            raise RuntimeError(f"{self.name} usa sus creencias fuera de un request_scope")
+        return state
+
+    @property
+    def beliefs(self):
+        """
+        dict: Beliefs of the agent for the current request. Only available inside
+        request_scope, e.g. from a method decorated with per_request.
+        """
+        return self._state().beliefs
+
+    @property
+    def intentions(self):
+        """
+        list: Intentions of the agent for the current request.
+        """
+        return self._state().intentions
+
+    @intentions.setter
+    def intentions(self, intentions):
+        self._state().intentions = intentions
         
-    def action(self, percept):
+    @per_request
+    def action(self, percept, token=None):
         """
         Execute the BDI algorithm based on the pseudocode:
         function action(p : P): A
@@ -23,31 +140,67 @@ class BDIAgent:
 
         Args:
             percept: The perception input for the agent
+            token (CancellationToken, optional): Cancellation token and deadline for every
+                retrieval and LLM call of the action. Defaults to the caller's token
 
         Returns:
             The result of executing the selected intentions
+
+        Raises:
+            OperationCancelled: If the token is cancelled or expires before the action completes
         """
-        self.brf(percept)
-        options = self.generate_options()
-        self.intentions = self.filter(options)
-        
-        return self.execute()
+        with cancellation_scope(token) if token is not None else nullcontext():
+            check_cancelled("agent")
+            self.brf(percept)
+            options = self.generate_options()
+            self.intentions = self.filter(options)
+
+            return self.execute()
+
+    @per_request
+    async def aaction(self, percept, token=None):
+        """
+        Asynchronous variant of action. Belief revision and deliberation are cheap and
+        run inline; only the execution of the selected intention is awaited.
+
+        Args:
+            percept: The perception input for the agent
+            token (CancellationToken, optional): Cancellation token and deadline for every
+                retrieval and LLM call of the action. Defaults to the caller's token
+
+        Returns:
+            The result of executing the selected intentions
+
+        Raises:
+            OperationCancelled: If the token is cancelled or expires before the action completes
+        """
+        with cancellation_scope(token) if token is not None else nullcontext():
+            check_cancelled("agent")
+            self.brf(percept)
+            options = self.generate_options()
+            self.intentions = self.filter(options)
+
+            return await self.aexecute()
         
     def brf(self, percept):
         """
         Belief Revision Function that updates the agent's beliefs based on new perception.
 
         Args:
-            percept: Can be either a dictionary of beliefs or a tuple containing (user_query, chat_history)
+            percept: Can be either a dictionary of beliefs or a tuple containing
+                (user_query, chat_history) or (user_query, chat_history, prefetched),
+                where prefetched is work done ahead of time for this query
         """
+        self.beliefs.pop("prefetched", None)
         if isinstance(percept, dict):
             self.beliefs.update(percept)
-        elif isinstance(percept, tuple) and len(percept) == 2:
-            user_query, chat_history = percept
+        elif isinstance(percept, tuple) and len(percept) in (2, 3):
+            user_query, chat_history = percept[:2]
             self.beliefs.update({
                 "current_query": user_query,
                 "history": chat_history,
-                "data_freshness": self.check_data_freshness()
+                "data_freshness": self.check_data_freshness(),
+                "prefetched": percept[2] if len(percept) == 3 else None
             })
             
     def generate_options(self) -> list:
@@ -139,6 +292,25 @@ class BDIAgent:
                     self.blackboard.write(self.name, result)
                 return result
         return None
+
+    async def aexecute(self):
+        """
+        Asynchronous variant of execute.
+
+        Returns:
+            The result of performing the selected action, or None if no action is available
+        """
+        if not self.intentions:
+            return None
+
+        for intention in self.intentions:
+            action = self._get_next_action(intention)
+            if action:
+                result = await self._aperform_action(action)
+                if hasattr(self, 'specialization') and hasattr(self, 'blackboard') and result:
+                    self.blackboard.write(self.name, result)
+                return result
+        return None
         
     def _get_next_action(self, intention):
         """
@@ -165,12 +337,358 @@ class BDIAgent:
         """
         # Debe ser implementado por los agentes específicos
         pass
+
+    async def _aperform_action(self, action):
+        """
+        Execute a specific action without blocking the event loop.
+        Agents override it with native async implementations; by default the
+        synchronous action runs in a worker thread.
+
+        Args:
+            action: The action to perform
+
+        Returns:
+            The result of performing the action
+        """
+        return await get_executor_service().run_io(self._perform_action, action)
         
+    def prefetch_query(self, query):
+        """
+        Get the retrieval query this agent will run for a user query, so it can be
+        prefetched before the agent is invoked. Agents whose retrieval depends on an
+        LLM step return None.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            str: The retrieval query, or None if it cannot be known in advance
+        """
+        return None
+
+    def _location_request(self, query):
+        """
+        Build the chat request that extracts the location mentioned in a query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            dict: Keyword arguments for client.chat / client.achat
+        """
+        system_prompt = """Extract the destination/location from this query. Return ONLY the location name, nothing else.
+        If no location is found, return 'unknown'."""
+
+        return {
+            "task": "extract_location",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": query}
+            ]
+        }
+
+    # Topic of the specialist's recommendations and schema of the preferences it
+    # extracts; specialists supporting structured answers override both
+    structured_topic = None
+    preferences_schema = {"type": "object"}
+
+    def structured_schema(self):
+        """
+        Get the schema of the specialist's structured answer.
+
+        Returns:
+            dict: JSON schema with destination, preferences and recommendations
+        """
+        return {
+            "type": "object",
+            "required": ["destination", "preferences", "recommendations"],
+            "properties": {
+                "destination": {"type": "string"},
+                "preferences": self.preferences_schema,
+                "recommendations": {"type": "array", "items": PLACE_SCHEMA}
+            }
+        }
+
+    def _unclear_preferences(self):
+        """
+        Describe the value of each preference when the query leaves it unclear,
+        taken from the preferences schema so the model never picks one it rejects.
+
+        Returns:
+            str: e.g. "diet='none', meal='any'"
+        """
+        fallbacks = []
+        for name, schema in self.preferences_schema.get("properties", {}).items():
+            enum = schema.get("enum")
+            fallback = next((value for value in ("any", "none") if value in enum), None) if enum else "any"
+            if fallback:
+                fallbacks.append(f"{name}='{fallback}'")
+        return ", ".join(fallbacks) or "'any'"
+
+    def _structured_context(self, query, relevant_docs=None):
+        """
+        Retrieve the information the structured answer is grounded on.
+
+        Args:
+            query (str): The user's query
+            relevant_docs (list, optional): Prefetched documents
+
+        Returns:
+            str: Search results
+        """
+        if relevant_docs is None:
+            relevant_docs = self.vector_db.similarity_search(query)
+        return "\n".join(doc.page_content for doc in relevant_docs)
+
+    def _structured_messages(self, query, context):
+        """
+        Build the messages of the structured answer call.
+
+        Args:
+            query (str): The user's query
+            context (str): Search results
+
+        Returns:
+            list: Chat messages
+        """
+        system_prompt = f"""Eres un experto en {self.structured_topic} en Cuba.
+        A partir de la consulta del usuario y de la información proporcionada:
+        - destination: el destino mencionado en la consulta, o 'unknown' si no hay ninguno
+        - preferences: las preferencias del usuario; si una no está clara usa {self._unclear_preferences()}
+        - recommendations: entre 5 y 10 {self.structured_topic} recomendados, con su tipo,
+          costo promedio en USD, valoración de 1 a 10 y una breve descripción
+        {schema_instructions(self.structured_schema())}"""
+        passages = self._materialized_passages(query) + [context]
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Consulta: {query}\n\nInformación disponible:\n"
+                                        f"{self.context_packer.pack(query, passages)}"}
+        ]
+
+    def _materialized_passages(self, query):
+        """
+        Get the precomputed places of the city a query mentions, to ground the answer
+        on them before the retrieved documents.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            list: A labelled passage with the places, or an empty list
+        """
+        store = MaterializedRecommendations()
+        city = store.find_destination(query)
+        places = store.get(getattr(self, "specialization", None), city) if city else None
+        if not places:
+            return []
+        text = "\n".join(
+            f"{place.name} ({place.type}): ${place.cost:.0f} USD, valoración {place.rating}/10. {place.description}"
+            for place in places
+        )
+        return [(f"{self.structured_topic.capitalize()} recomendados en {city}", text)]
+
+    def _apply_structured(self, answer):
+        """
+        Update beliefs with a structured answer.
+
+        Args:
+            answer (dict): Validated structured answer
+
+        Returns:
+            str: The answer formatted for the blackboard
+        """
+        destination = answer["destination"].strip()
+        if destination and destination.lower() != "unknown":
+            self.beliefs["destination"] = destination
+        self.beliefs["preferences"] = answer["preferences"]
+        self.beliefs["recommendations"] = {
+            "destination": destination,
+            "places": [PlaceRecord.from_dict(place) for place in answer["recommendations"]]
+        }
+        return self.format_structured(answer)
+
+    def format_structured(self, answer):
+        """
+        Format a structured answer as text.
+
+        Args:
+            answer (dict): Validated structured answer
+
+        Returns:
+            str: One line per recommendation under the destination
+        """
+        lines = [f"{self.structured_topic.capitalize()} en {answer['destination']}:"]
+        for place in answer["recommendations"]:
+            lines.append(
+                f"- {place['name']} ({place['type']}): ${place['cost']:.0f} USD, "
+                f"valoración {place['rating']}/10. {place['description']}"
+            )
+        return "\n".join(lines)
+
+    def structured_query(self, query, relevant_docs=None):
+        """
+        Answer a query with a single JSON-mode call returning destination, preferences
+        and recommendations together.
+
+        Args:
+            query (str): The user's query
+            relevant_docs (list, optional): Prefetched documents
+
+        Returns:
+            str: The formatted answer, or None if the model never produced a valid one
+        """
+        context = self._structured_context(query, relevant_docs)
+        try:
+            answer = structured_chat(
+                self.client, "specialist_structured",
+                self._structured_messages(query, context), self.structured_schema()
+            )
+        except StructuredOutputError as e:
+            print(f"Respuesta estructurada inválida en {self.name}: {e}")
+            return None
+        return self._apply_structured(answer)
+
+    async def astructured_query(self, query, relevant_docs=None):
+        """
+        Asynchronous variant of structured_query.
+
+        Args:
+            query (str): The user's query
+            relevant_docs (list, optional): Prefetched documents
+
+        Returns:
+            str: The formatted answer, or None if the model never produced a valid one
+        """
+        context = await get_executor_service().run_io(self._structured_context, query, relevant_docs)
+        try:
+            answer = await astructured_chat(
+                self.client, "specialist_structured",
+                self._structured_messages(query, context), self.structured_schema()
+            )
+        except StructuredOutputError as e:
+            print(f"Respuesta estructurada inválida en {self.name}: {e}")
+            return None
+        return self._apply_structured(answer)
+
+    def _places_messages(self, destination, n, context):
+        """
+        Build the messages of the place recommendation call.
+
+        Args:
+            destination (str): Target destination
+            n (int): Number of places requested
+            context (str): Search results
+
+        Returns:
+            list: Chat messages
+        """
+        system_prompt = f"""Eres un experto en {self.structured_topic} en Cuba.
+        Recomienda {n} {self.structured_topic} en el destino indicado, basándote en la información
+        proporcionada y, si no es suficiente, en opciones reales y conocidas del destino.
+        Para cada uno indica nombre, tipo, costo promedio en USD, valoración de 1 a 10 y una breve descripción.
+        {schema_instructions(PLACES_SCHEMA)}"""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Destino: {destination}\n\nInformación disponible:\n"
+                                        f"{self.context_packer.pack(f'{self.structured_topic} {destination}', [context])}"}
+        ]
+
+    def recommend_places(self, destination, n=8):
+        """
+        Recommend places in a destination as typed records. The nightly materialization
+        is read first; otherwise the places are generated and shared through the
+        RecommendationCache, so popular destinations are not regenerated per user.
+
+        Args:
+            destination (str): Target destination
+            n (int, optional): Number of places requested. Defaults to 8
+
+        Returns:
+            List[PlaceRecord]: The recommended places, empty if none could be produced
+        """
+        materialized = self._materialized_places(destination, n)
+        if materialized:
+            return materialized
+        return list(RecommendationCache().get(
+            self, destination, f"top{n}", lambda: self.generate_places(destination, n)
+        ))
+
+    def _materialized_places(self, destination, n):
+        places = MaterializedRecommendations().get(getattr(self, "specialization", None), destination)
+        return places[:n] if places and len(places) >= n else None
+
+    @per_request
+    def generate_places(self, destination, n=8):
+        """
+        Generate place recommendations with one structured call grounded on the
+        specialist's own retrieval, bypassing every cache.
+
+        Args:
+            destination (str): Target destination
+            n (int, optional): Number of places requested. Defaults to 8
+
+        Returns:
+            List[PlaceRecord]: The recommended places, empty if none could be produced
+        """
+        context = self._structured_context(destination)
+        try:
+            answer = structured_chat(
+                self.client, "recommend_places",
+                self._places_messages(destination, n, context), PLACES_SCHEMA
+            )
+        except StructuredOutputError as e:
+            print(f"Lugares inválidos de {self.name} para {destination}: {e}")
+            return []
+        return [PlaceRecord.from_dict(place) for place in answer["places"][:n]]
+
+    async def arecommend_places(self, destination, n=8):
+        """
+        Asynchronous variant of recommend_places.
+
+        Args:
+            destination (str): Target destination
+            n (int, optional): Number of places requested. Defaults to 8
+
+        Returns:
+            List[PlaceRecord]: The recommended places, empty if none could be produced
+        """
+        materialized = self._materialized_places(destination, n)
+        if materialized:
+            return materialized
+        return list(await RecommendationCache().aget(
+            self, destination, f"top{n}", lambda: self.agenerate_places(destination, n)
+        ))
+
+    @per_request
+    async def agenerate_places(self, destination, n=8):
+        """
+        Asynchronous variant of generate_places.
+
+        Args:
+            destination (str): Target destination
+            n (int, optional): Number of places requested. Defaults to 8
+
+        Returns:
+            List[PlaceRecord]: The recommended places, empty if none could be produced
+        """
+        context = await get_executor_service().run_io(self._structured_context, destination)
+        try:
+            answer = await astructured_chat(
+                self.client, "recommend_places",
+                self._places_messages(destination, n, context), PLACES_SCHEMA
+            )
+        except StructuredOutputError as e:
+            print(f"Lugares inválidos de {self.name} para {destination}: {e}")
+            return []
+        return [PlaceRecord.from_dict(place) for place in answer["places"][:n]]
+
     def check_data_freshness(self):
         """
-        Check the freshness of the data in the session state.
+        Check the freshness of the data in the vector database.
 
         Returns:
-            The timestamp of the last update from session state
+            float: time.time() of the last change to the documents, 0 if unknown
         """
-        return st.session_state.get("last_update", 0)
\ No newline at end of file
+        return getattr(self.vector_db, "last_update", 0)
\ No newline at end of file
@@ -1,4 +1,22 @@
-from threading import Lock
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Condition, Lock, Thread, Event
+from runtime.executor import ServiceBusyError
+from telemetry.metrics import MetricsRegistry
+
+# Limits keeping long-running servers from accumulating leaked problems
+MAX_PROBLEMS = int(os.getenv("GPTUR_BLACKBOARD_MAX_PROBLEMS", "256"))
+MAX_PROBLEM_BYTES = int(os.getenv("GPTUR_BLACKBOARD_MAX_PROBLEM_BYTES", str(512 * 1024)))
+PROBLEM_TTL = float(os.getenv("GPTUR_BLACKBOARD_TTL", "600"))
+
+# Problem the current turn works on. Context variables follow the turn into tasks
+# and into pool threads started with a copied context, so concurrent turns
+# never see each other's problem.
+_current_problem = ContextVar("blackboard_problem", default=None)
+
 
 class Blackboard:
     _instance = None
@@ -10,48 +28,261 @@ class Blackboard:
                 if cls._instance is None:
                     cls._instance = super(Blackboard, cls).__new__(cls)
                     cls._instance._shared_space = {}
-                    cls._instance._current_problem = None
+                    cls._instance._problem_locks = {}
+                    cls._instance._listeners = {}
+                    cls._instance._created = {}
+                    cls._instance._sizes = {}
+                    cls._instance.max_problems = MAX_PROBLEMS
+                    cls._instance.max_problem_bytes = MAX_PROBLEM_BYTES
+                    cls._instance.ttl = PROBLEM_TTL
+                    cls._instance.metrics = MetricsRegistry()
+                    cls._instance._stop_janitor = Event()
+                    Thread(
+                        target=cls._instance._janitor, name="GPTur_BlackboardJanitor", daemon=True
+                    ).start()
         return cls._instance
 
-    def write(self, agent_name, contribution):
+    def _janitor(self):
+        """
+        Periodically evict expired problems and record the blackboard's size.
+        """
+        while not self._stop_janitor.wait(max(1.0, self.ttl / 4)):
+            self.evict_expired()
+            stats = self.stats()
+            self.metrics.observe("blackboard.problems", stats["problems"])
+            self.metrics.observe("blackboard.bytes", stats["bytes"])
+
+    @staticmethod
+    def _size_of(contribution):
+        if isinstance(contribution, str):
+            return len(contribution.encode("utf-8"))
+        return len(repr(contribution).encode("utf-8"))
+
+    def _drop(self, problem_id):
+        self._shared_space.pop(problem_id, None)
+        self._problem_locks.pop(problem_id, None)
+        self._listeners.pop(problem_id, None)
+        self._created.pop(problem_id, None)
+        self._sizes.pop(problem_id, None)
+
+    def evict_expired(self, now=None):
+        """
+        Remove the problems older than the TTL, e.g. those leaked by failed turns.
+
+        Args:
+            now (float, optional): Current monotonic time. Defaults to time.monotonic()
+
+        Returns:
+            int: Number of problems evicted
+        """
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            expired = [pid for pid, created in self._created.items() if now - created > self.ttl]
+            for problem_id in expired:
+                self._drop(problem_id)
+        if expired:
+            self.metrics.increment("blackboard.evicted.ttl", len(expired))
+        return len(expired)
+
+    def stats(self):
+        """
+        Report the blackboard's live problems, entries and memory.
+
+        Returns:
+            dict: problems, entries and bytes held
+        """
+        with self._lock:
+            return {
+                "problems": len(self._shared_space),
+                "entries": sum(len(entries) for entries in self._shared_space.values()),
+                "bytes": sum(self._sizes.values())
+            }
+
+    def _problem_lock(self, problem_id, create=False):
+        """
+        Get the condition guarding the contributions of a problem.
+
+        Args:
+            problem_id (str): The unique identifier of the problem
+            create (bool, optional): Register the problem if it does not exist. Defaults to False
+
+        Returns:
+            Condition: The problem's condition, or None if the problem does not exist
+
+        Raises:
+            ServiceBusyError: If a new problem would exceed max_problems. Problems are
+                cleared when their turn ends, so the live ones all belong to running turns
+        """
+        if create and len(self._created) >= self.max_problems:
+            self.evict_expired()
+        with self._lock:
+            if create and problem_id not in self._problem_locks:
+                if len(self._created) >= self.max_problems:
+                    self.metrics.increment("blackboard.rejected")
+                    raise ServiceBusyError("La pizarra está llena")
+                self._problem_locks[problem_id] = Condition()
+                self._listeners[problem_id] = []
+                self._shared_space[problem_id] = []
+                self._created[problem_id] = time.monotonic()
+                self._sizes[problem_id] = 0
+            return self._problem_locks.get(problem_id)
+
+    @contextmanager
+    def problem(self, problem_id=None):
+        """
+        Scope a problem to the current context. Contributions written inside the scope,
+        including from tasks and pool threads started with a copied context, go to
+        this problem. The problem is cleared when the scope ends.
+
+        Args:
+            problem_id (str, optional): The unique identifier of the problem. Defaults to a new UUID
+
+        Yields:
+            str: The problem identifier
+        """
+        problem_id = problem_id or str(uuid.uuid4())
+        self._problem_lock(problem_id, create=True)
+        token = _current_problem.set(problem_id)
+        try:
+            yield problem_id
+        finally:
+            _current_problem.reset(token)
+            self.clear_problem(problem_id)
+
+    def current_problem(self):
         """
-        Write a contribution to the blackboard for the current problem.
+        Get the problem of the current context.
+
+        Returns:
+            str: The problem identifier, or None outside a problem scope
+        """
+        return _current_problem.get()
+
+    def write(self, agent_name, contribution, problem_id=None):
+        """
+        Write a contribution to the blackboard. Text beyond the problem's byte budget
+        is truncated; other contributions that do not fit are dropped.
 
         Args:
             agent_name (str): The name of the agent making the contribution
             contribution (any): The content being contributed by the agent
+            problem_id (str, optional): Target problem. Defaults to the current context's problem
+        """
+        problem_id = problem_id or _current_problem.get()
+        if not problem_id:
+            return
+        lock = self._problem_lock(problem_id)
+        if lock is None:
+            return
+        with lock:
+            entries = self._shared_space.get(problem_id)
+            if entries is None:
+                return
+            available = self.max_problem_bytes - self._sizes.get(problem_id, 0)
+            size = self._size_of(contribution)
+            if size > available:
+                self.metrics.increment("blackboard.over_budget")
+                if not isinstance(contribution, str) or available <= 0:
+                    print(f"Contribución de {agent_name} descartada: supera el presupuesto del problema")
+                    return
+                contribution = contribution.encode("utf-8")[:available].decode("utf-8", errors="ignore")
+                size = self._size_of(contribution)
+            entry = {
+                "agent": agent_name,
+                "contribution": contribution
+            }
+            entries.append(entry)
+            self._sizes[problem_id] = self._sizes.get(problem_id, 0) + size
+            listeners = list(self._listeners.get(problem_id, []))
+            lock.notify_all()
+
+        for listener in listeners:
+            listener(entry)
+
+    def subscribe(self, problem_id, listener):
+        """
+        Register a callback invoked with every contribution written to a problem.
+        Callbacks run in the writer's thread and must not block.
+
+        Args:
+            problem_id (str): The unique identifier of the problem
+            listener (callable): Called with the written entry
+
+        Returns:
+            callable: Function removing the subscription
         """
         with self._lock:
-            if self._current_problem:
-                if self._current_problem not in self._shared_space:
-                    self._shared_space[self._current_problem] = []
-                self._shared_space[self._current_problem].append({
-                    "agent": agent_name,
-                    "contribution": contribution
-                })
+            listeners = self._listeners.get(problem_id)
+            if listeners is not None:
+                listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners.get(problem_id, []):
+                    self._listeners[problem_id].remove(listener)
+        return unsubscribe
 
-    def read(self, problem_id):
+    def notify(self, problem_id):
         """
-        Read all contributions for a specific problem from the blackboard.
+        Wake the threads waiting on a problem so they re-check their condition.
 
         Args:
             problem_id (str): The unique identifier of the problem
+        """
+        lock = self._problem_lock(problem_id)
+        if lock is not None:
+            with lock:
+                lock.notify_all()
+
+    def wait_for(self, problem_id, predicate, timeout=None):
+        """
+        Block until a predicate over a problem's contributions holds.
+        The predicate is re-checked on every write and every notify.
+
+        Args:
+            problem_id (str): The unique identifier of the problem
+            predicate (callable): Receives the list of contributions
+            timeout (float, optional): Maximum seconds to wait
+
+        Returns:
+            bool: The last value of the predicate
+        """
+        lock = self._problem_lock(problem_id)
+        if lock is None:
+            return predicate([])
+        with lock:
+            return lock.wait_for(
+                lambda: predicate(self._shared_space.get(problem_id, [])), timeout
+            )
+
+    def read(self, problem_id=None):
+        """
+        Read all contributions for a specific problem from the blackboard.
+
+        Args:
+            problem_id (str, optional): The unique identifier of the problem.
+                Defaults to the current context's problem
 
         Returns:
             list: A list of all contributions made for the specified problem
         """
-        with self._lock:
-            return self._shared_space.get(problem_id, [])
+        problem_id = problem_id or _current_problem.get()
+        lock = self._problem_lock(problem_id)
+        if lock is None:
+            return []
+        with lock:
+            return list(self._shared_space.get(problem_id, []))
 
     def set_current_problem(self, problem_id):
         """
-        Set the current active problem in the blackboard.
+        Set the current active problem for the current context only.
+        Prefer the problem() scope, which also clears the problem afterwards.
 
         Args:
             problem_id (str): The unique identifier for the current problem being solved
         """
-        with self._lock:
-            self._current_problem = problem_id
+        self._problem_lock(problem_id, create=True)
+        _current_problem.set(problem_id)
 
     def clear_problem(self, problem_id):
         """
@@ -61,5 +292,4 @@ class Blackboard:
             problem_id (str): The unique identifier of the problem to be cleared
         """
         with self._lock:
-            if problem_id in self._shared_space:
-                del self._shared_space[problem_id]
+            self._drop(problem_id)
@@ -3,22 +3,12 @@ from crawlers.dynamic_crawler import DynamicCrawler
 from duckduckgo_search import DDGS
 
 class GapDetectorAgent(BaseAgent):
+    task_types = ("detect_gap",)
+
     def __init__(self, detector):
         self.detector = detector
         self.crawler = DynamicCrawler()
 
-    def can_handle(self, task):
-        """
-        Check if the agent can handle the given task.
-
-        Args:
-            task (dict): The task to be evaluated
-
-        Returns:
-            bool: True if the task is of type 'detect_gap', False otherwise
-        """
-        return task.get("type") == "detect_gap"
-
     def get_search_query(self, prompt, response):
         """
         Use the LLM to generate a focused search query for missing information.
@@ -43,7 +33,7 @@ class GapDetectorAgent(BaseAgent):
         try:
             messages = [{"role": "user", "content": search_prompt}]
             api_response = self.detector.client.chat(
-                model="mistral-small",
+                task="search_query",
                 messages=messages,
                 temperature=0.2
             )
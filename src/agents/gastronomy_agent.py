@@ -1,41 +1,51 @@
+import asyncio
 import json
-from .bdi_agent import BDIAgent
+from runtime.executor import get_executor_service
+from .bdi_agent import BDIAgent, per_request
 from .blackboard import Blackboard
 
 class GastronomyAgent(BDIAgent):
+    KNOWLEDGE = {
+        "cuisine_types": (
+            "cuban",
+            "seafood",
+            "international",
+            "creole",
+            "italian",
+            "fusion"
+        ),
+        "price_ranges": ("economic", "moderate", "luxury"),
+        "special_diets": (
+            "vegetarian",
+            "vegan",
+            "gluten_free"
+        ),
+        "meal_types": (
+            "breakfast",
+            "lunch",
+            "dinner",
+            "snacks",
+            "drinks"
+        )
+    }
+
+    structured_topic = "restaurantes"
+    preferences_schema = {
+        "type": "object",
+        "required": ["cuisine", "price_range", "diet", "meal"],
+        "properties": {
+            "cuisine": {"type": "string"},
+            "price_range": {"type": "string", "enum": ["economic", "moderate", "luxury", "any"]},
+            "diet": {"type": "string", "enum": ["vegetarian", "vegan", "gluten_free", "none"]},
+            "meal": {"type": "string", "enum": ["breakfast", "lunch", "dinner", "snacks", "drinks", "any"]}
+        }
+    }
+
     def __init__(self, name, vector_db=None):
         super().__init__(name, vector_db)
         self.specialization = "gastronomy"
         self.blackboard = Blackboard()
         
-        self.beliefs = {
-            "restaurants": {},
-            "cuisine_types": [
-                "cuban",
-                "seafood",
-                "international",
-                "creole",
-                "italian",
-                "fusion"
-            ],
-            "price_ranges": ["economic", "moderate", "luxury"],
-            "special_diets": [
-                "vegetarian",
-                "vegan",
-                "gluten_free"
-            ],
-            "meal_types": [
-                "breakfast",
-                "lunch",
-                "dinner",
-                "snacks",
-                "drinks"
-            ],
-            "current_query": None,
-            "destination": None,
-            "preferences": None
-        }
-        
         self.desires = [
             "process_user_query", 
             "recommend_restaurants"
@@ -54,6 +64,21 @@ class GastronomyAgent(BDIAgent):
             }
         }
 
+    def initial_beliefs(self):
+        """
+        Build the beliefs a restaurant request starts with, including its per-request result cache.
+
+        Returns:
+            dict: Fresh, request-owned beliefs
+        """
+        return {
+            **super().initial_beliefs(),
+            "restaurants": {},
+            "current_query": None,
+            "destination": None,
+            "preferences": None
+        }
+
     def search_restaurants(self, query, relevant_docs=None):
         """
         Search for restaurants matching the specified query.
@@ -72,7 +97,7 @@ class GastronomyAgent(BDIAgent):
             
         processed_results = []
         for doc in relevant_docs:
-            if any(cuisine in doc.page_content.lower() for cuisine in self.beliefs["cuisine_types"]):
+            if any(cuisine in doc.page_content.lower() for cuisine in self.knowledge["cuisine_types"]):
                 processed_results.append(doc.page_content)
                 
         classified_restaurants = self._classify_restaurants(processed_results)
@@ -83,6 +108,21 @@ class GastronomyAgent(BDIAgent):
             
         return self._format_restaurant_results(classified_restaurants)
 
+    def prefetch_query(self, query):
+        """
+        Get the restaurants retrieval query run for a user query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            str: The retrieval query
+        """
+        return self._build_restaurant_query(query)
+
+    def _structured_context(self, query, relevant_docs=None):
+        return self.search_restaurants(query, relevant_docs)
+
     def _build_restaurant_query(self, location, filters=None):
         """
         Constructs an optimized search query based on location and filters.
@@ -98,13 +138,13 @@ class GastronomyAgent(BDIAgent):
         
         if filters:
             for filter_type, value in filters.items():
-                if filter_type == "cuisine" and value in self.beliefs["cuisine_types"]:
+                if filter_type == "cuisine" and value in self.knowledge["cuisine_types"]:
                     query_parts.append(f"specializing in {value} cuisine")
-                elif filter_type == "price" and value in self.beliefs["price_ranges"]:
+                elif filter_type == "price" and value in self.knowledge["price_ranges"]:
                     query_parts.append(f"with {value} prices")
-                elif filter_type == "diet" and value in self.beliefs["special_diets"]:
+                elif filter_type == "diet" and value in self.knowledge["special_diets"]:
                     query_parts.append(f"offering {value} options")
-                elif filter_type == "meal" and value in self.beliefs["meal_types"]:
+                elif filter_type == "meal" and value in self.knowledge["meal_types"]:
                     query_parts.append(f"for {value}")
                     
         return " ".join(query_parts)
@@ -178,10 +218,44 @@ class GastronomyAgent(BDIAgent):
             str: Personalized restaurant recommendation
         """
         results = self.search_restaurants(location)
-        
+        return self.client.chat(
+            **self._suggestion_request(location, preferences, budget, results)
+        ).choices[0].message.content
+
+    async def aget_restaurant_suggestion(self, location, preferences, budget):
+        """
+        Asynchronous variant of get_restaurant_suggestion.
+
+        Args:
+            location (str): Target location
+            preferences (dict): User dining preferences
+            budget (str): User's budget level
+
+        Returns:
+            str: Personalized restaurant recommendation
+        """
+        results = await get_executor_service().run_io(self.search_restaurants, location)
+        response = await self.client.achat(
+            **self._suggestion_request(location, preferences, budget, results)
+        )
+        return response.choices[0].message.content
+
+    def _suggestion_request(self, location, preferences, budget, results):
+        """
+        Build the chat request that picks the best dining option.
+
+        Args:
+            location (str): Target location
+            preferences (dict): User dining preferences
+            budget (str): User's budget level
+            results (str): Formatted restaurant search results
+
+        Returns:
+            dict: Keyword arguments for client.chat / client.achat
+        """
         suggestion_prompt = f"""
         Based on these restaurants in {location}:
-        {results}
+        {self.context_packer.pack(f"{location} {' '.join(str(v) for v in preferences.values())}", [results])}
         
         Suggest the best dining option for a visitor with:
         - Budget: {budget}
@@ -190,15 +264,13 @@ class GastronomyAgent(BDIAgent):
         - Meal type: {preferences.get('meal', 'any')}
         """
         
-        suggestion = self.client.chat(
-            model="mistral-medium",
-            messages=[{
+        return {
+            "task": "specialist_suggestion",
+            "messages": [{
                 "role": "user",
                 "content": suggestion_prompt
             }]
-        ).choices[0].message.content
-        
-        return suggestion
+        }
             
     def _get_recommendations(self, destination):
         """
@@ -227,11 +299,14 @@ class GastronomyAgent(BDIAgent):
             razonables basadas en el contexto cultural y gastronómico del destino."""
             
             response = self.client.chat(
-                model="mistral-medium",
+                task="specialist_recommendations",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Información sobre restaurantes en {destination}: " + 
-                     "\n".join([doc.page_content for doc in relevant_docs]) + 
+                     self.context_packer.pack(
+                         f"restaurantes en {destination}",
+                         [doc.page_content for doc in relevant_docs]
+                     ) + 
                      "\n\nGenera las recomendaciones siguiendo el formato solicitado."}
                 ]
             )
@@ -311,20 +386,13 @@ class GastronomyAgent(BDIAgent):
         """Execute a specific action"""
         if action == "extract_destination_and_preferences":
             query = self.beliefs["current_query"]
-            system_prompt = """Extract the destination from this query. Return ONLY the destination name, nothing else.
-            If no destination is found, return 'unknown'."""
-            
-            response = self.client.chat(
-                model="mistral-medium",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": query}
-                ]
-            )
-            destination = response.choices[0].message.content.strip()
-            
-            if destination and destination.lower() != 'unknown':
-                self.beliefs["destination"] = destination
+            if self.structured_output:
+                answer = self.structured_query(query, self.beliefs.get("prefetched"))
+                if answer:
+                    return answer
+
+            response = self.client.chat(**self._destination_request(query))
+            self._update_destination(response)
             
             preferences = self._extract_preferences(query)
             self.beliefs["preferences"] = preferences
@@ -337,6 +405,63 @@ class GastronomyAgent(BDIAgent):
         elif action == "get_recommendations":
             return self._get_recommendations(self.beliefs["destination"])
 
+    async def _aperform_action(self, action):
+        """Execute a specific action without blocking the event loop"""
+        if action == "extract_destination_and_preferences":
+            query = self.beliefs["current_query"]
+            if self.structured_output:
+                answer = await self.astructured_query(query, self.beliefs.get("prefetched"))
+                if answer:
+                    return answer
+
+            response, preferences = await asyncio.gather(
+                self.client.achat(**self._destination_request(query)),
+                self._aextract_preferences(query)
+            )
+            self._update_destination(response)
+            self.beliefs["preferences"] = preferences
+
+            return await self.aget_restaurant_suggestion(
+                self.beliefs["destination"],
+                preferences,
+                preferences.get("price_range", "moderate")
+            )
+        return await super()._aperform_action(action)
+
+    def _destination_request(self, query):
+        """
+        Build the chat request that extracts the destination of a query.
+
+        Args:
+            query (str): The user's query string
+
+        Returns:
+            dict: Keyword arguments for client.chat / client.achat
+        """
+        system_prompt = """Extract the destination from this query. Return ONLY the destination name, nothing else.
+        If no destination is found, return 'unknown'."""
+        
+        return {
+            "task": "extract_location",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": query}
+            ]
+        }
+
+    def _update_destination(self, response):
+        """
+        Store the destination extracted by the LLM in the beliefs.
+
+        Args:
+            response (ChatCompletionResponse): Destination extraction response
+        """
+        destination = response.choices[0].message.content.strip()
+        
+        if destination and destination.lower() != 'unknown':
+            self.beliefs["destination"] = destination
+
+    @per_request
     def process_query(self, query):
         """
         Processes a user query to extract preferences and generate recommendations.
@@ -356,6 +481,7 @@ class GastronomyAgent(BDIAgent):
         
         return self.action({"type": "query", "content": query})
 
+    @per_request
     def get_recommendations(self, destination):
         """
         Gets general restaurant recommendations for a destination.
@@ -382,6 +508,48 @@ class GastronomyAgent(BDIAgent):
         Returns:
             dict: Extracted preferences including cuisine, price range, diet, and meal type
         """
+        try:
+            response = self.client.chat(**self._preferences_request(query))
+        except Exception as e:
+            print(f"Error extracting preferences: {e}")
+            return self._default_preferences()
+        return self._parse_preferences(response)
+
+    async def _aextract_preferences(self, query):
+        """
+        Asynchronous variant of _extract_preferences.
+
+        Args:
+            query (str): The user's query string
+
+        Returns:
+            dict: Extracted preferences including cuisine, price range, diet, and meal type
+        """
+        try:
+            response = await self.client.achat(**self._preferences_request(query))
+        except Exception as e:
+            print(f"Error extracting preferences: {e}")
+            return self._default_preferences()
+        return self._parse_preferences(response)
+
+    def _default_preferences(self):
+        return {
+            "cuisine": "any",
+            "price_range": "moderate",
+            "diet": "none",
+            "meal": "any"
+        }
+
+    def _preferences_request(self, query):
+        """
+        Build the chat request that extracts dining preferences.
+
+        Args:
+            query (str): The user's query string
+
+        Returns:
+            dict: Keyword arguments for client.chat / client.achat
+        """
         system_prompt = """Eres un asistente que extrae preferencias gastronómicas.
         IMPORTANTE: Tu respuesta debe ser ÚNICAMENTE un objeto JSON válido, sin texto adicional.
         
@@ -395,15 +563,26 @@ class GastronomyAgent(BDIAgent):
         
         Si una preferencia no está clara en la consulta, usa 'any' o 'none' como valor por defecto."""
         
+        return {
+            "task": "extract_preferences",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Extrae las preferencias gastronómicas de: {query}"}
+            ]
+        }
+
+    def _parse_preferences(self, response):
+        """
+        Parse and validate the preferences returned by the LLM.
+
+        Args:
+            response (ChatCompletionResponse): Preferences extraction response
+
+        Returns:
+            dict: Valid preferences, with defaults for anything missing or unknown
+        """
+        response_text = ""
         try:
-            response = self.client.chat(
-                model="mistral-medium",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Extrae las preferencias gastronómicas de: {query}"}
-                ]
-            )
-            
             response_text = response.choices[0].message.content.strip()
                         
             if response_text.startswith("```") and response_text.endswith("```"):
@@ -414,25 +593,18 @@ class GastronomyAgent(BDIAgent):
             
             preferences = json.loads(response_text)
             
-            default_preferences = {
-                "cuisine": "any",
-                "price_range": "moderate",
-                "diet": "none",
-                "meal": "any"
-            }
-            
-            valid_preferences = default_preferences.copy()
+            valid_preferences = self._default_preferences()
             
-            if "cuisine" in preferences and preferences["cuisine"].lower() in [c.lower() for c in self.beliefs["cuisine_types"] + ["any"]]:
+            if "cuisine" in preferences and preferences["cuisine"].lower() in [c.lower() for c in [*self.knowledge["cuisine_types"], "any"]]:
                 valid_preferences["cuisine"] = preferences["cuisine"].lower()
             
-            if "price_range" in preferences and preferences["price_range"].lower() in self.beliefs["price_ranges"]:
+            if "price_range" in preferences and preferences["price_range"].lower() in self.knowledge["price_ranges"]:
                 valid_preferences["price_range"] = preferences["price_range"].lower()
             
-            if "diet" in preferences and preferences["diet"].lower() in [d.lower() for d in self.beliefs["special_diets"] + ["none"]]:
+            if "diet" in preferences and preferences["diet"].lower() in [d.lower() for d in [*self.knowledge["special_diets"], "none"]]:
                 valid_preferences["diet"] = preferences["diet"].lower()
             
-            if "meal" in preferences and preferences["meal"].lower() in [m.lower() for m in self.beliefs["meal_types"] + ["any"]]:
+            if "meal" in preferences and preferences["meal"].lower() in [m.lower() for m in [*self.knowledge["meal_types"], "any"]]:
                 valid_preferences["meal"] = preferences["meal"].lower()
             
             self.beliefs["preferences"] = valid_preferences
@@ -441,17 +613,7 @@ class GastronomyAgent(BDIAgent):
         except json.JSONDecodeError as e:
             print(f"Error decodificando JSON: {e}")
             print(f"Texto que causó el error: {response_text}")
-            return {
-                "cuisine": "any",
-                "price_range": "moderate",
-                "diet": "none",
-                "meal": "any"
-            }
+            return self._default_preferences()
         except Exception as e:
             print(f"Error extracting preferences: {e}")
-            return {
-                "cuisine": "any",
-                "price_range": "moderate",
-                "diet": "none",
-                "meal": "any"
-            }
\ No newline at end of file
+            return self._default_preferences()
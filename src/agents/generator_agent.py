@@ -1,7 +1,10 @@
+import asyncio
 import json
 import logging
+import time
+from runtime.executor import get_executor_service
 from .base_agent import BaseAgent
-import streamlit as st
+from .speculation import Speculation
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -36,6 +39,7 @@ class GeneratorAgent(BaseAgent):
     An agent responsible for generating responses and handling different types of user queries.
     Coordinates between guide and planner agents based on user intent.
     """
+    task_types = ("generate", "classify_intent", "prepare", "plan")
 
     def __init__(self, guide_agent, planner_agent):
         """
@@ -48,17 +52,55 @@ class GeneratorAgent(BaseAgent):
         self.guide_agent = guide_agent
         self.planner_agent = planner_agent
 
-    def can_handle(self, task):
+    def _intent_request(self, prompt):
         """
-        Check if the agent can handle the given task.
+        Build the chat request that classifies the user's intent.
 
         Args:
-            task (dict): The task to be evaluated
+            prompt (str): User's input text
+
+        Returns:
+            dict: Keyword arguments for client.chat / client.achat
+        """
+        system_prompt = """Analiza la intención del usuario y clasifícala en una de estas categorías:
+        - PLANNING: Si el usuario quiere planear un viaje o crear un itinerario
+        - INFO: Si el usuario busca información general, recomendaciones o respuestas sobre lugares
+        Si tienes dudas sobre la intención, responde con INFO.
+        Responde únicamente con la categoría: PLANNING o INFO"""
+        
+        return {
+            "task": "classify_intent",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+        }
+
+    def classify_intent(self, prompt):
+        """
+        Classify the user's intent as PLANNING or INFO.
+
+        Args:
+            prompt (str): User's input text
 
         Returns:
-            bool: True if the task is of type 'generate', False otherwise
+            str: The detected intent
+        """
+        intent_response = self.guide_agent.client.chat(**self._intent_request(prompt))
+        return intent_response.choices[0].message.content.strip()
+
+    async def aclassify_intent(self, prompt):
         """
-        return task.get("type") == "generate"
+        Asynchronous variant of classify_intent.
+
+        Args:
+            prompt (str): User's input text
+
+        Returns:
+            str: The detected intent
+        """
+        intent_response = await self.guide_agent.client.achat(**self._intent_request(prompt))
+        return intent_response.choices[0].message.content.strip()
 
     def _extract_travel_params(self, prompt):
         """
@@ -80,7 +122,7 @@ class GeneratorAgent(BaseAgent):
         {"dias": X, "destino": "Y", "presupuesto": Z}"""
         
         response = self.guide_agent.client.chat(
-            model="mistral-small",
+            task="extract_travel_params",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
@@ -129,36 +171,97 @@ class GeneratorAgent(BaseAgent):
     def handle(self, task, context):
         """
         Process the task and generate appropriate response using either guide or planner agent.
+        A 'classify_intent' task only returns the intent, a 'prepare' task only the
+        guide's preparation and a 'plan' task the itinerary for its 'preferences';
+        a 'generate' task may carry an already classified intent and preparation to
+        skip those calls.
+
+        When the intent is unknown, the guide's preparation for the INFO path starts
+        speculatively while the intent is classified, and is discarded on PLANNING.
 
         Args:
             task (dict): The task containing the prompt to process
             context (dict): Additional context information
 
         Returns:
-            str: Generated response from either guide or planner agent
+            tuple: Generated response from either guide or planner agent and the intent
         """
         print("\nGeneratorAgent.handle")
         prompt = task.get("prompt")
         
-        context_text = _convert_docs_to_string(context) if isinstance(context, list) else str(context)
-        
-        system_prompt = """Analiza la intención del usuario y clasifícala en una de estas categorías:
-        - PLANNING: Si el usuario quiere planear un viaje o crear un itinerario
-        - INFO: Si el usuario busca información general, recomendaciones o respuestas sobre lugares
-        Si tienes dudas sobre la intención, responde con INFO.
-        Responde únicamente con la categoría: PLANNING o INFO"""
+        if task.get("type") == "classify_intent":
+            return self.classify_intent(prompt)
+        if task.get("type") == "prepare":
+            return self.guide_agent.prepare(prompt)
+        if task.get("type") == "plan":
+            return self.planner_agent.action(task["preferences"])
         
-        intent_response = self.guide_agent.client.chat(
-            model="mistral-small",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        intent = intent_response.choices[0].message.content.strip()
+        context_text = _convert_docs_to_string(context) if isinstance(context, list) else str(context)
+        intent = task.get("intent")
+        preparation = task.get("preparation")
+        speculation = None
+        if not intent:
+            speculation = Speculation(
+                "guide_preparation",
+                self.guide_agent.executor.io.submit(self.guide_agent.prepare, prompt)
+            )
+            intent = self.classify_intent(prompt)
         
         if intent == "PLANNING":
+            if speculation:
+                speculation.discard()
             preferences = self._extract_travel_params(prompt)
             return self.planner_agent.action(preferences), intent
         
-        return self.guide_agent.action((prompt, context_text)), intent
\ No newline at end of file
+        if speculation:
+            try:
+                preparation = speculation.commit(time.perf_counter())
+            except Exception as e:
+                logger.warning(f"Speculative preparation failed: {e}")
+        
+        return self.guide_agent.action((prompt, context_text, preparation)), intent
+
+    async def ahandle(self, task, context):
+        """
+        Asynchronous variant of handle.
+
+        Args:
+            task (dict): The task containing the prompt to process
+            context (dict): Additional context information
+
+        Returns:
+            tuple: Generated response from either guide or planner agent and the intent
+        """
+        prompt = task.get("prompt")
+
+        if task.get("type") == "classify_intent":
+            return await self.aclassify_intent(prompt)
+        if task.get("type") == "prepare":
+            return await self.guide_agent.aprepare(prompt)
+        if task.get("type") == "plan":
+            return await self.planner_agent.aaction(task["preferences"])
+
+        context_text = _convert_docs_to_string(context) if isinstance(context, list) else str(context)
+        intent = task.get("intent")
+        preparation = task.get("preparation")
+        speculation = None
+        if not intent:
+            speculation = Speculation(
+                "guide_preparation",
+                asyncio.create_task(self.guide_agent.aprepare(prompt))
+            )
+            intent = await self.aclassify_intent(prompt)
+
+        if intent == "PLANNING":
+            if speculation:
+                speculation.discard()
+            preferences = await get_executor_service().run_io(self._extract_travel_params, prompt)
+            return await self.planner_agent.aaction(preferences), intent
+
+        if speculation:
+            try:
+                preparation = await speculation.acommit(time.perf_counter())
+            except Exception as e:
+                logger.warning(f"Speculative preparation failed: {e}")
+
+        return await self.guide_agent.aaction((prompt, context_text, preparation)), intent
@@ -5,17 +5,55 @@ from .lodging_agent import LodgingAgent
 from .historic_agent import HistoricAgent 
 from .nightlife_agent import NightlifeAgent
 from .gastronomy_agent import GastronomyAgent
+from .specialist_router import SpecialistRouter
 from .generator_agent import _convert_docs_to_string
-from langchain_community.retrievers import BM25Retriever
 from crawlers.dynamic_crawler import DynamicCrawler
-import time
-import streamlit as st
-import uuid
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Event
+import asyncio
+import math
+import os
+from runtime.cancellation import CancellationToken, OperationCancelled, current_token
+from runtime.executor import get_executor_service
+from telemetry.metrics import MetricsRegistry
+
+# Fraction of the consulted specialists whose answers are enough to start the synthesis
+SPECIALIST_QUORUM = float(os.getenv("GPTUR_GUIDE_QUORUM", "0.75"))
+# Seconds after which the synthesis starts with whatever has been contributed
+SOFT_DEADLINE = float(os.getenv("GPTUR_GUIDE_SOFT_DEADLINE", "20"))
+
+
+def create_specialists(vector_db):
+    """
+    Build one instance of each specialist. Specialists keep no per-request state,
+    so a single set serves the guide, the planner and every session.
+
+    Args:
+        vector_db (VectorStorage): The shared vector database
+
+    Returns:
+        dict: Specialized agents by specialization
+    """
+    return {
+        "lodging": LodgingAgent("LodgingBot", vector_db),
+        "historic": HistoricAgent("HistoricBot", vector_db),
+        "nightlife": NightlifeAgent("NightlifeBot", vector_db),
+        "gastronomy": GastronomyAgent("GastronomyBot", vector_db)
+    }
+
+
+def _contributors(entries):
+    return {entry["agent"] for entry in entries}
+
 
 class GuideAgent(BDIAgent):
-    def __init__(self, vector_db):
+    def __init__(self, vector_db, specialized_agents=None):
+        """
+        Initialize the guide.
+
+        Args:
+            vector_db (VectorStorage): The shared vector database
+            specialized_agents (dict, optional): Specialists by specialization, shared with
+                other agents. Defaults to a new lodging, historic, nightlife and gastronomy set
+        """
         super().__init__("GuideBot", vector_db)
         
         self.desires = [
@@ -30,22 +68,17 @@ class GuideAgent(BDIAgent):
             }
         }
         
-        self.retriever = BM25Retriever.from_documents(vector_db.get_documents())
         self.blackboard = Blackboard()
-        self.stop_event = Event()
+        self.quorum = SPECIALIST_QUORUM
+        self.soft_deadline = SOFT_DEADLINE
+        self.metrics = MetricsRegistry()
         self.nlp_processor = NLPProcessor()
         
-        self.specialized_agents = {
-            "lodging": LodgingAgent("LodgingBot", vector_db),
-            "historic": HistoricAgent("HistoricBot", vector_db),
-            "nightlife": NightlifeAgent("NightlifeBot", vector_db),
-            "gastronomy": GastronomyAgent("GastronomyBot", vector_db)
-        }
+        self.specialized_agents = specialized_agents or create_specialists(vector_db)
 
-        self.thread_pool = ThreadPoolExecutor(
-            max_workers=len(self.specialized_agents),
-            thread_name_prefix="GPTur_Agent"
-        )
+        self.router = SpecialistRouter(getattr(vector_db, "embeddings", None), self.nlp_processor)
+
+        self.executor = get_executor_service()
         
     def _is_plan_relevant(self, plan) -> bool:
         """
@@ -89,7 +122,7 @@ class GuideAgent(BDIAgent):
         if precondition == "tiene_consulta":
             return "current_query" in self.beliefs
         elif precondition == "datos_disponibles":
-            return bool(self.vector_db.get_documents())
+            return self.vector_db.count() > 0
         return False
 
     def _is_compatible(self, plan) -> bool:
@@ -108,18 +141,23 @@ class GuideAgent(BDIAgent):
         if action == "generar_respuesta":
             return self.generate_response()
         return None
+
+    async def _aperform_action(self, action):
+        """Ejecuta una acción específica sin bloquear el bucle de eventos"""
+        if action == "generar_respuesta":
+            return await self.agenerate_response()
+        return None
     
     def trigger_crawler(self):
         """
-        Trigger the web crawler to update information sources and refresh the vector database.
-        Updates the last update timestamp in the session state.
+        Trigger the web crawler to update information sources and refresh the vector database,
+        which records the time of the update.
         """
         crawler = DynamicCrawler()
         crawler.update_sources(self.vector_db.get_sources())
         self.vector_db.reload_data()
-        st.session_state.last_update = time.time()
         
-    def process_agent_query(self, agent : BDIAgent, query, relevant_docs):
+    def process_agent_query(self, agent : BDIAgent, query, relevant_docs, prefetched_docs=None, token=None):
         """
         Process a query using a specific specialized agent in a thread-safe manner.
 
@@ -127,19 +165,40 @@ class GuideAgent(BDIAgent):
             agent (BDIAgent): The specialized agent to handle the query
             query (str): The user's query
             relevant_docs (str): Relevant context documents
+            prefetched_docs (list, optional): The agent's own retrieval, done ahead of time
+            token (CancellationToken, optional): The agent's cancellation token and deadline
 
         Returns:
-            Any: The agent's response or None if processing fails
+            Any: The agent's response or None if processing fails or is cancelled
         """
-        if self.stop_event.is_set():
-            return None
-        
-        percept = (query, relevant_docs)
+        percept = (query, relevant_docs, prefetched_docs)
             
         try:
-            results = agent.action(percept)
-            self.blackboard.write(agent.name, results)
-            return results
+            return agent.action(percept, token=token)
+        except OperationCancelled:
+            return None
+        except Exception as e:
+            print(f"Error with {agent.specialization} agent: {str(e)}")
+            return None
+
+    async def aprocess_agent_query(self, agent : BDIAgent, query, relevant_docs, prefetched_docs=None, token=None):
+        """
+        Asynchronous variant of process_agent_query.
+
+        Args:
+            agent (BDIAgent): The specialized agent to handle the query
+            query (str): The user's query
+            relevant_docs (str): Relevant context documents
+            prefetched_docs (list, optional): The agent's own retrieval, done ahead of time
+            token (CancellationToken, optional): The agent's cancellation token and deadline
+
+        Returns:
+            Any: The agent's response or None if processing fails or is cancelled
+        """
+        try:
+            return await agent.aaction((query, relevant_docs, prefetched_docs), token=token)
+        except OperationCancelled:
+            return None
         except Exception as e:
             print(f"Error with {agent.specialization} agent: {str(e)}")
             return None
@@ -166,6 +225,106 @@ class GuideAgent(BDIAgent):
             "sentiment": sentiment
         }
 
+    def select_specialists(self, query: str):
+        """
+        Choose the specialists relevant to a query.
+
+        Args:
+            query (str): The raw user query
+
+        Returns:
+            dict: The chosen specialized agents by specialization
+        """
+        keys = self.router.route(query, self.specialized_agents)
+        return {key: self.specialized_agents[key] for key in keys}
+
+    def prepare(self, query: str, prefetch_specialists=True):
+        """
+        Run the query-only part of answering: NLP analysis, document retrieval, the choice
+        of specialists and the retrieval of those that can be known in advance. It does not
+        depend on the intent, so it can start speculatively while the intent is classified.
+
+        Args:
+            query (str): The raw user query
+            prefetch_specialists (bool, optional): Also run the specialists' retrievals. Defaults to True
+
+        Returns:
+            dict: query, query_analysis, relevant_docs, specialists and specialist_docs by specialization
+        """
+        specialists = self.select_specialists(query)
+        query_analysis = self.preprocess_query(query)
+        search_query = f"{query_analysis['processed_text']} {' '.join(query_analysis['keywords'])}"
+        relevant_docs = self.vector_db.similarity_search(search_query)
+
+        specialist_docs = {}
+        if prefetch_specialists:
+            for key, agent in specialists.items():
+                prefetch_query = agent.prefetch_query(query)
+                if prefetch_query:
+                    specialist_docs[key] = self.vector_db.similarity_search(prefetch_query)
+
+        return {
+            "query": query,
+            "query_analysis": query_analysis,
+            "relevant_docs": relevant_docs,
+            "specialists": specialists,
+            "specialist_docs": specialist_docs
+        }
+
+    async def aprepare(self, query: str, prefetch_specialists=True):
+        """
+        Asynchronous variant of prepare; the specialist retrievals run concurrently with
+        the analysis and retrieval chain.
+
+        Args:
+            query (str): The raw user query
+            prefetch_specialists (bool, optional): Also run the specialists' retrievals. Defaults to True
+
+        Returns:
+            dict: query, query_analysis, relevant_docs, specialists and specialist_docs by specialization
+        """
+        async def analyze_and_retrieve():
+            query_analysis = await self.executor.run_cpu(self.preprocess_query, query)
+            search_query = f"{query_analysis['processed_text']} {' '.join(query_analysis['keywords'])}"
+            relevant_docs = await self.executor.run_io(self.vector_db.similarity_search, search_query)
+            return query_analysis, relevant_docs
+
+        specialists = await self.executor.run_cpu(self.select_specialists, query)
+        prefetch_queries = {}
+        if prefetch_specialists:
+            for key, agent in specialists.items():
+                prefetch_query = agent.prefetch_query(query)
+                if prefetch_query:
+                    prefetch_queries[key] = prefetch_query
+
+        (query_analysis, relevant_docs), *docs = await asyncio.gather(
+            analyze_and_retrieve(),
+            *[self.executor.run_io(self.vector_db.similarity_search, q) for q in prefetch_queries.values()]
+        )
+
+        return {
+            "query": query,
+            "query_analysis": query_analysis,
+            "relevant_docs": relevant_docs,
+            "specialists": specialists,
+            "specialist_docs": dict(zip(prefetch_queries, docs))
+        }
+
+    def _prepared(self, query):
+        """
+        Get the preparation received with the percept if it belongs to this query.
+
+        Args:
+            query (str): The current query
+
+        Returns:
+            dict: The preparation, or None
+        """
+        preparation = self.beliefs.get("prefetched")
+        if isinstance(preparation, dict) and preparation.get("query") == query:
+            return preparation
+        return None
+
     def generate_response(self):
         """
         Generate a comprehensive response by coordinating multiple specialized agents.
@@ -174,86 +333,223 @@ class GuideAgent(BDIAgent):
         1. Creates a unique problem ID
         2. Analyzes the query using NLP
         3. Retrieves relevant documents
-        4. Coordinates specialized agents
+        4. Coordinates specialized agents, waiting for a quorum of them or the soft deadline
         5. Combines their contributions
         
         Returns:
             str: The final consolidated response
         """
-        problem_id = str(uuid.uuid4())
-        self.blackboard.set_current_problem(problem_id)
         query = self.beliefs["current_query"]
-        self.stop_event.clear()
 
-        query_analysis = self.preprocess_query(query)
-        
-        search_query = f"{query_analysis['processed_text']} {' '.join(query_analysis['keywords'])}"
-        
-        relevant_docs = self.vector_db.similarity_search(search_query)
+        preparation = self._prepared(query) or self.prepare(query, prefetch_specialists=False)
+        query_analysis = preparation["query_analysis"]
+        relevant_docs = preparation["relevant_docs"]
         document_text = _convert_docs_to_string(relevant_docs)
 
-        future_to_agent = {
-            self.thread_pool.submit(
-                self.process_agent_query, agent, query, document_text
-            ): agent.specialization for agent in self.specialized_agents.values()
-        }
+        with self.blackboard.problem() as problem_id:
+            tokens = self._specialist_tokens(preparation["specialists"])
+            futures = [
+                self.executor.io.submit(
+                    self.process_agent_query, agent, query, document_text,
+                    preparation["specialist_docs"].get(key), tokens[key]
+                )
+                for key, agent in preparation["specialists"].items()
+            ]
+            for future in futures:
+                future.add_done_callback(lambda _: self.blackboard.notify(problem_id))
+
+            quorum = self._quorum_size(len(futures))
+            self.blackboard.wait_for(
+                problem_id,
+                lambda entries: len(_contributors(entries)) >= quorum or all(f.done() for f in futures),
+                timeout=self.soft_deadline
+            )
+            self._drop_late(futures, tokens.values())
+
+            contributions = self.blackboard.read(problem_id)
+        response = self.client.chat(
+            **self._synthesis_request(query, query_analysis, relevant_docs, contributions)
+        )
+
+        return response.choices[0].message.content
+
+    async def agenerate_response(self):
+        """
+        Asynchronous variant of generate_response, structured as a task graph.
+
+        Specialists only need the query, so they start right away and run concurrently
+        with the NLP analysis and retrieval chain (unless a speculative preparation was
+        received with the percept); the final synthesis waits for the preparation and
+        for a quorum of specialists or the soft deadline.
+        Specialists receive the turn's retrieved context as history instead of waiting
+        for the guide's own retrieval.
+
+        Returns:
+            str: The final consolidated response
+        """
+        query = self.beliefs["current_query"]
+        history = self.beliefs.get("history", "")
+
+        preparation = self._prepared(query)
+        if preparation is None:
+            specialists = await self.executor.run_cpu(self.select_specialists, query)
+            retrieval = asyncio.create_task(self.aprepare(query, prefetch_specialists=False))
+            specialist_docs = {}
+        else:
+            specialists = preparation["specialists"]
+            retrieval = asyncio.create_task(asyncio.sleep(0, preparation))
+            specialist_docs = preparation["specialist_docs"]
+
+        with self.blackboard.problem() as problem_id:
+            tokens = self._specialist_tokens(specialists)
+            specialists = [
+                asyncio.create_task(
+                    self.aprocess_agent_query(agent, query, history, specialist_docs.get(key), tokens[key])
+                )
+                for key, agent in specialists.items()
+            ]
+
+            await self._await_quorum(problem_id, specialists)
+            self._drop_late(specialists, tokens.values())
+
+            preparation = await retrieval
+            query_analysis = preparation["query_analysis"]
+            relevant_docs = preparation["relevant_docs"]
+            contributions = self.blackboard.read(problem_id)
+        response = await self.client.achat(
+            **self._synthesis_request(query, query_analysis, relevant_docs, contributions)
+        )
+
+        return response.choices[0].message.content
+
+    def _quorum_size(self, specialists):
+        """
+        Get how many specialists must answer before synthesis starts.
+
+        Args:
+            specialists (int): Number of specialists consulted
+
+        Returns:
+            int: Required number of contributors
+        """
+        return max(1, math.ceil(self.quorum * specialists))
 
+    async def _await_quorum(self, problem_id, specialists):
+        """
+        Wait until a quorum of specialists has contributed, every specialist has
+        finished, or the soft deadline expires, whichever comes first.
+
+        Args:
+            problem_id (str): The turn's blackboard problem
+            specialists (list): The specialist tasks
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        unsubscribe = self.blackboard.subscribe(
+            problem_id, lambda _: loop.call_soon_threadsafe(changed.set)
+        )
+        for task in specialists:
+            task.add_done_callback(lambda _: changed.set())
+
+        quorum = self._quorum_size(len(specialists))
+        deadline = loop.time() + self.soft_deadline
         try:
-            for future in as_completed(future_to_agent, timeout=120):
-                agent_type = future_to_agent[future]
+            while (len(_contributors(self.blackboard.read(problem_id))) < quorum
+                   and not all(task.done() for task in specialists)):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                changed.clear()
                 try:
-                    future.result()
-                except Exception as e:
-                    print(f"Agent {agent_type} generated an exception: {str(e)}")
-        except TimeoutError:
-            print("Some agents did not complete in time")
-            self.stop_event.set()
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            unsubscribe()
+
+    def _specialist_tokens(self, specialists):
+        """
+        Give each specialist its own cancellation token, bounded by the soft deadline
+        and by the deadline of the turn.
+
+        Args:
+            specialists (dict): The chosen specialized agents by specialization
+
+        Returns:
+            dict: Cancellation tokens by specialization
+        """
+        return {key: CancellationToken(self.soft_deadline, parent=current_token()) for key in specialists}
+
+    def _drop_late(self, pending, tokens):
+        """
+        Give up on the specialists that missed the quorum or the soft deadline.
+        Their tokens are cancelled, so their pending retrievals and LLM calls are
+        aborted instead of running on for nobody.
+
+        Args:
+            pending (list): Specialist futures or tasks
+            tokens (Iterable[CancellationToken]): Their cancellation tokens, in the same order
+        """
+        late = [(job, token) for job, token in zip(pending, tokens) if not job.done()]
+        for job, token in late:
+            token.cancel("late")
+            job.cancel()
+        if late:
+            print(f"{len(late)} especialistas no respondieron a tiempo, se sintetiza sin ellos")
+            self.metrics.increment("guide.late_specialists", len(late))
+
+    def _synthesis_request(self, query, query_analysis, relevant_docs, contributions):
+        """
+        Build the chat request that writes the final answer.
 
-        contributions = self.blackboard.read(problem_id)
+        Args:
+            query (str): The user's query
+            query_analysis (dict): Output of preprocess_query
+            relevant_docs (list): Documents retrieved for the query
+            contributions (list): Specialist contributions read from the blackboard
 
-        context = "\n".join([f"{c['agent']}: {c['contribution']}" for c in contributions])
+        Returns:
+            dict: Keyword arguments for client.chat / client.achat
+        """
         if not contributions:
-            response = self.client.chat(
-                model="mistral-medium",
-                messages=[{
+            documents = self.context_packer.pack(
+                query, [doc.page_content for doc in relevant_docs], model="mistral-medium"
+            )
+            return {
+                "task": "synthesis",
+                "hedge": True,
+                "messages": [{
                     "role": "user",
                     "content": f"""Based on these documents about {query}, provide a helpful response:
-                    Context documents: {[doc.page_content for doc in relevant_docs]}
+                    Context documents: {documents}
                     Detected entities: {query_analysis['entities']}
                     User sentiment: {query_analysis['sentiment']['sentiment']}"""
                 }]
-            )
-        else:
-            if len(context) > 130000:
-                context = context[:130000]
-            response = self.client.chat(
-                model="mistral-medium",
-                messages=[{
-                    "role": "user",                    
-                    "content": f"""You are an expert travel guide specializing in Cuban tourism, 
-                    with extensive knowledge of the country's culture, history, attractions, and tourist services. 
-                    Using this expertise and the following information, provide a comprehensive response:
-                    
-                    Question: {query}
-                    Detected entities: {query_analysis['entities']}
-                    User sentiment: {query_analysis['sentiment']['sentiment']}
-                    Specialized Information:
-                    {context}
-                    
-                    Please provide a well-organized response that integrates all relevant information.
-                    Adapt your tone to match the user's sentiment ({query_analysis['sentiment']['sentiment']}).
-                    Make sure to address all mentioned entities and maintain a friendly and knowledgeable tone,
-                    highlighting the unique aspects of Cuban tourism and culture in your response."""
-                }]
-            )
-        
-        self.blackboard.clear_problem(problem_id)
-        return response.choices[0].message.content
+            }
 
-    def __del__(self):
-        """
-        Cleanup method to ensure proper shutdown of thread pool when the agent is destroyed.
-        Sets the stop event and performs an orderly shutdown of all threads.
-        """
-        self.stop_event.set()
-        self.thread_pool.shutdown(wait=True)
\ No newline at end of file
+        context = self.context_packer.pack(
+            query,
+            [(c["agent"], c["contribution"]) for c in contributions],
+            model="mistral-medium"
+        )
+        return {
+            "task": "synthesis",
+            "hedge": True,
+            "messages": [{
+                "role": "user",                    
+                "content": f"""You are an expert travel guide specializing in Cuban tourism, 
+                with extensive knowledge of the country's culture, history, attractions, and tourist services. 
+                Using this expertise and the following information, provide a comprehensive response:
+                
+                Question: {query}
+                Detected entities: {query_analysis['entities']}
+                User sentiment: {query_analysis['sentiment']['sentiment']}
+                Specialized Information:
+                {context}
+                
+                Please provide a well-organized response that integrates all relevant information.
+                Adapt your tone to match the user's sentiment ({query_analysis['sentiment']['sentiment']}).
+                Make sure to address all mentioned entities and maintain a friendly and knowledgeable tone,
+                highlighting the unique aspects of Cuban tourism and culture in your response."""
+            }]
+        }
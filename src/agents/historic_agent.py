@@ -1,33 +1,44 @@
+import asyncio
+from runtime.executor import get_executor_service
 from .bdi_agent import BDIAgent
 from .blackboard import Blackboard
 from datetime import datetime
 
 class HistoricAgent(BDIAgent):
+    KNOWLEDGE = {
+        "architectural_styles": (
+            "colonial",
+            "neoclassical",
+            "art_deco",
+            "modern"
+        ),
+        "site_types": (
+            "museum",
+            "church",
+            "plaza",
+            "monument",
+            "historic_building",
+            "cultural_center"
+        )
+    }
+
+    structured_topic = "sitios históricos"
+    preferences_schema = {
+        "type": "object",
+        "required": ["site_type"],
+        "properties": {
+            "site_type": {
+                "type": "string",
+                "enum": ["museum", "church", "plaza", "monument", "historic_building", "cultural_center", "any"]
+            }
+        }
+    }
+
     def __init__(self, name, vector_db=None):
         super().__init__(name, vector_db)
         self.specialization = "historic"
         self.blackboard = Blackboard()
-
-        self.beliefs = {
-            "historic_sites": {},
-            "architectural_styles": [
-                "colonial", 
-                "neoclassical",
-                "art_deco",
-                "modern"
-            ],
-            "site_types": [
-                "museum",
-                "church",
-                "plaza",
-                "monument",
-                "historic_building",
-                "cultural_center"
-            ],
-            "current_query": None,
-            "destination": None
-        }
-
+        
         self.desires = [
             "process_user_query",
             "recommend_historic_sites"
@@ -46,6 +57,21 @@ class HistoricAgent(BDIAgent):
             }
         }
 
+    def initial_beliefs(self):
+        """
+        Build the beliefs a historic sites request starts with, including its per-request result cache.
+
+        Returns:
+            dict: Fresh, request-owned beliefs
+        """
+        return {
+            **super().initial_beliefs(),
+            "historic_sites": {},
+            "cultural_events": {},
+            "current_query": None,
+            "destination": None
+        }
+
     def search_historic_sites(self, query, relevant_docs=None):
         """
         Search for historic sites matching the provided query.
@@ -57,6 +83,39 @@ class HistoricAgent(BDIAgent):
         Returns:
             str: Formatted string containing historic sites search results
         """
+        classified_sites = self._collect_historic_sites(query, relevant_docs)
+        response = self.client.chat(**self._location_request(query))
+        return self._record_historic_sites(response, classified_sites)
+
+    async def asearch_historic_sites(self, query, relevant_docs=None):
+        """
+        Asynchronous variant of search_historic_sites. Retrieval and location
+        extraction are independent, so they run concurrently.
+
+        Args:
+            query (str): The search query string
+            relevant_docs (list, optional): Pre-filtered relevant documents
+
+        Returns:
+            str: Formatted string containing historic sites search results
+        """
+        classified_sites, response = await asyncio.gather(
+            get_executor_service().run_io(self._collect_historic_sites, query, relevant_docs),
+            self.client.achat(**self._location_request(query))
+        )
+        return self._record_historic_sites(response, classified_sites)
+
+    def _collect_historic_sites(self, query, relevant_docs=None):
+        """
+        Retrieve and classify the historic sites relevant to a query.
+
+        Args:
+            query (str): The search query string
+            relevant_docs (list, optional): Pre-filtered relevant documents
+
+        Returns:
+            dict: Sites classified by type
+        """
         if relevant_docs is None:
             relevant_docs = self.vector_db.similarity_search(
                 self._build_historic_query(query)
@@ -64,21 +123,22 @@ class HistoricAgent(BDIAgent):
         
         processed_results = []
         for doc in relevant_docs:
-            if any(site_type in doc.page_content.lower() for site_type in self.beliefs["site_types"]):
+            if any(site_type in doc.page_content.lower() for site_type in self.knowledge["site_types"]):
                 processed_results.append(doc.page_content)
                 
-        classified_sites = self._classify_historic_sites(processed_results)
-          
-        system_prompt = """Extract the destination/location from this query. Return ONLY the location name, nothing else.
-        If no location is found, return 'unknown'."""
-        
-        response = self.client.chat(
-            model="mistral-medium",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ]
-        )
+        return self._classify_historic_sites(processed_results)
+
+    def _record_historic_sites(self, response, classified_sites):
+        """
+        Update beliefs with the sites found for the extracted location.
+
+        Args:
+            response (ChatCompletionResponse): Location extraction response
+            classified_sites (dict): Sites classified by type
+
+        Returns:
+            str: Formatted string containing historic sites search results
+        """
         location = response.choices[0].message.content.strip()
         
         if location and location.lower() != 'unknown':
@@ -92,6 +152,21 @@ class HistoricAgent(BDIAgent):
             
         return self._format_historic_results(classified_sites)
 
+    def _structured_context(self, query, relevant_docs=None):
+        return self._format_historic_results(self._collect_historic_sites(query, relevant_docs))
+
+    def prefetch_query(self, query):
+        """
+        Get the historic sites retrieval query run for a user query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            str: The retrieval query
+        """
+        return self._build_historic_query(query)
+
     def _build_historic_query(self, location, site_type=None):
         """
         Build an optimized search query for historic sites.
@@ -106,7 +181,7 @@ class HistoricAgent(BDIAgent):
         query_parts = [f"historic and cultural attractions in {location}"]
         
         if site_type:
-            if site_type in self.beliefs["site_types"]:
+            if site_type in self.knowledge["site_types"]:
                 query_parts.append(f"focusing on {site_type}")
                 
         return " ".join(query_parts)
@@ -225,7 +300,7 @@ class HistoricAgent(BDIAgent):
         
         details_prompt = f"""
         Based on this information about {site_name}:
-        {[doc.page_content for doc in relevant_docs]}
+        {self.context_packer.pack(f"{site_name} {location}", [doc.page_content for doc in relevant_docs])}
         
         Provide a detailed description including:
         - Historical significance
@@ -235,7 +310,7 @@ class HistoricAgent(BDIAgent):
         """
         
         details = self.client.chat(
-            model="mistral-medium",
+            task="site_details",
             messages=[{
                 "role": "user",
                 "content": details_prompt
@@ -267,10 +342,10 @@ class HistoricAgent(BDIAgent):
         La respuesta debe ser detallada pero concisa."""
         
         response = self.client.chat(
-            model="mistral-medium",
+            task="specialist_recommendations",
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Información sobre sitios históricos: {historic_results}"}
+                {"role": "user", "content": f"Información sobre sitios históricos: {self.context_packer.pack(f'sitios históricos {destination}', [historic_results])}"}
             ]
         )        
         
@@ -310,11 +385,29 @@ class HistoricAgent(BDIAgent):
         """Ejecuta una acción específica"""
         if action == "search_historic_sites":
             query = self.beliefs["current_query"]
-            return self.search_historic_sites(query)
+            if self.structured_output:
+                answer = self.structured_query(query, self.beliefs.get("prefetched"))
+                if answer:
+                    return answer
+            return self.search_historic_sites(query, self.beliefs.get("prefetched"))
             
         elif action == "get_recommendations":
             return self.get_recommendations(self.beliefs["destination"])
 
+    async def _aperform_action(self, action):
+        """Ejecuta una acción específica sin bloquear el bucle de eventos"""
+        if action == "search_historic_sites":
+            if self.structured_output:
+                answer = await self.astructured_query(
+                    self.beliefs["current_query"], self.beliefs.get("prefetched")
+                )
+                if answer:
+                    return answer
+            return await self.asearch_historic_sites(
+                self.beliefs["current_query"], self.beliefs.get("prefetched")
+            )
+        return await super()._aperform_action(action)
+
     def get_recommendations(self, destination):
         """Obtiene recomendaciones usando el ciclo BDI"""
         percept = {"destination": destination}
@@ -340,7 +433,7 @@ class HistoricAgent(BDIAgent):
         La respuesta debe ser detallada pero concisa."""
         
         response = self.client.chat(
-            model="mistral-medium",
+            task="site_details",
             messages=[
                 {"role": "system", "content": details_prompt},
                 {"role": "user", "content": f"Buscar información histórica de {site_name}"}
@@ -2,20 +2,27 @@ from .bdi_agent import BDIAgent
 from .blackboard import Blackboard
 
 class LodgingAgent(BDIAgent):
+    KNOWLEDGE = {
+        "accommodation_types": ("hotel", "hostal", "casa_particular", "resort"),
+        "amenities": (),
+        "price_ranges": ("economic", "moderate", "luxury")
+    }
+
+    structured_topic = "alojamientos"
+    preferences_schema = {
+        "type": "object",
+        "required": ["accommodation_type", "price_range"],
+        "properties": {
+            "accommodation_type": {"type": "string", "enum": ["hotel", "hostal", "casa_particular", "resort", "any"]},
+            "price_range": {"type": "string", "enum": ["economic", "moderate", "luxury", "any"]}
+        }
+    }
+
     def __init__(self, name, vector_db=None):
         super().__init__(name, vector_db)
         self.specialization = "lodging"
         self.blackboard = Blackboard()
         
-        self.beliefs = {
-            "accommodation_types": ["hotel", "hostal", "casa_particular", "resort"],
-            "locations": {},
-            "amenities": [],
-            "price_ranges": ["economic", "moderate", "luxury"],
-            "has_results": False, 
-            "needs_recommendations": False 
-        }
-        
         self.desires = [
             "buscar_alojamientos", 
             "recomendar_hospedaje", 
@@ -34,6 +41,20 @@ class LodgingAgent(BDIAgent):
             }
         }
 
+    def initial_beliefs(self):
+        """
+        Build the beliefs a lodging request starts with, including its per-request result cache.
+
+        Returns:
+            dict: Fresh, request-owned beliefs
+        """
+        return {
+            **super().initial_beliefs(),
+            "locations": {},
+            "has_results": False,
+            "needs_recommendations": False
+        }
+
     def search_accommodations(self, query, relevant_docs=None):
         """
         Search for accommodations matching the provided query.
@@ -52,7 +73,7 @@ class LodgingAgent(BDIAgent):
             
         processed_results = []
         for doc in relevant_docs:
-            if any(acc_type in doc.page_content.lower() for acc_type in self.beliefs["accommodation_types"]):
+            if any(acc_type in doc.page_content.lower() for acc_type in self.knowledge["accommodation_types"]):
                 processed_results.append(doc.page_content)
                 
         classified_results = self._classify_accommodations(processed_results)
@@ -66,6 +87,21 @@ class LodgingAgent(BDIAgent):
         
         return self._format_accommodation_results(classified_results)
         
+    def _structured_context(self, query, relevant_docs=None):
+        return self.search_accommodations(query, relevant_docs)
+
+    def prefetch_query(self, query):
+        """
+        Get the accommodations retrieval query run for a user query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            str: The retrieval query
+        """
+        return self._build_accommodation_query(query)
+
     def _build_accommodation_query(self, location, preferences=None):
         """
         Build an optimized search query based on location and user preferences.
@@ -155,7 +191,7 @@ class LodgingAgent(BDIAgent):
         
         suggestion_prompt = f"""
         Based on these accommodations in {location}:
-        {results}
+        {self.context_packer.pack(f"{location} {budget} {' '.join(preferences)}", [results])}
         
         Suggest the best option for a traveler with:
         - Budget: {budget}
@@ -163,7 +199,7 @@ class LodgingAgent(BDIAgent):
         """
         
         suggestion = self.client.chat(
-            model="mistral-medium",
+            task="specialist_suggestion",
             messages=[{
                 "role": "user", 
                 "content": suggestion_prompt
@@ -195,10 +231,10 @@ class LodgingAgent(BDIAgent):
         La respuesta debe ser detallada pero concisa."""
         
         response = self.client.chat(
-            model="mistral-medium",
+            task="specialist_recommendations",
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Información sobre alojamientos: {lodging_results}"}
+                {"role": "user", "content": f"Información sobre alojamientos: {self.context_packer.pack(f'alojamientos {destination}', [lodging_results])}"}
             ]
         )
         return response.choices[0].message.content
@@ -293,7 +329,11 @@ class LodgingAgent(BDIAgent):
         """
         if action == "buscar_en_db":
             query = self.beliefs.get("current_query", self.beliefs.get("destination", ""))
-            return self.search_accommodations(query)
+            if self.structured_output and self.beliefs.get("current_query"):
+                answer = self.structured_query(query, self.beliefs.get("prefetched"))
+                if answer:
+                    return answer
+            return self.search_accommodations(query, self.beliefs.get("prefetched"))
         elif action == "generar_recomendaciones":
             preferences = self.beliefs.get("preferences", {})
             result = self.get_accommodation_suggestion(
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+from threading import Lock
+from telemetry.metrics import MetricsRegistry
+from .places import PlaceRecord
+from .recommendation_cache import normalize_destination
+
+MATERIALIZED_DIR = Path(
+    os.getenv("GPTUR_MATERIALIZED_DIR", Path(__file__).parent.parent / "vector_db" / "materialized")
+)
+# Seconds after which a city's materialization is no longer served
+MATERIALIZED_MAX_AGE = float(os.getenv("GPTUR_MATERIALIZED_MAX_AGE", str(7 * 24 * 3600)))
+# Generations kept on disk besides the current one
+MATERIALIZED_KEEP = 2
+# Seconds between checks for a newly published generation
+RELOAD_INTERVAL = 30
+
+
+class MaterializedRecommendations:
+    """
+    Read side of the nightly materialization: place recommendations precomputed per
+    city and specialist category, stored as versioned generation files next to the
+    vector store. A CURRENT file names the generation in use; readers pick up a newly
+    published one within RELOAD_INTERVAL seconds.
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(MaterializedRecommendations, cls).__new__(cls)
+                    cls._instance.directory = MATERIALIZED_DIR
+                    cls._instance.max_age = MATERIALIZED_MAX_AGE
+                    cls._instance.metrics = MetricsRegistry()
+                    cls._instance._generation = {"version": 0, "cities": {}}
+                    cls._instance._checked_at = 0.0
+                    cls._instance._reload_lock = Lock()
+        return cls._instance
+
+    def _current_version(self):
+        try:
+            return int((self.directory / "CURRENT").read_text().strip())
+        except (OSError, ValueError):
+            return 0
+
+    def _path(self, version):
+        return self.directory / f"recommendations.{version}.json"
+
+    def generation(self):
+        """
+        Get the generation in use, reloading it if a newer one was published.
+
+        Returns:
+            dict: version, generated_at and cities, each with display name, fingerprint,
+                generated_at and the places of every category as dicts
+        """
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_INTERVAL:
+            return self._generation
+        with self._reload_lock:
+            if now - self._checked_at < RELOAD_INTERVAL:
+                return self._generation
+            self._checked_at = now
+            version = self._current_version()
+            if version and version != self._generation["version"]:
+                try:
+                    with open(self._path(version), "r", encoding="utf-8") as f:
+                        self._generation = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error cargando las recomendaciones precalculadas v{version}: {str(e)}")
+        return self._generation
+
+    def get(self, category, destination):
+        """
+        Get the precomputed places of a category in a destination.
+
+        Args:
+            category (str): Specialist category, e.g. "gastronomy"
+            destination (str): Destination as written by the user or the LLM
+
+        Returns:
+            List[PlaceRecord]: The places, or None if the city is unknown or too old
+        """
+        city = self.generation()["cities"].get(normalize_destination(destination))
+        if city is None or time.time() - city["generated_at"] > self.max_age:
+            self.metrics.increment("materialized.miss")
+            return None
+        places = city["categories"].get(category)
+        if not places:
+            self.metrics.increment("materialized.miss")
+            return None
+        self.metrics.increment("materialized.hit")
+        return [PlaceRecord.from_dict(place) for place in places]
+
+    def find_destination(self, text):
+        """
+        Find a materialized city mentioned in a text.
+
+        Args:
+            text (str): A user query
+
+        Returns:
+            str: The city's key, or None if no materialized city is mentioned
+        """
+        normalized = f" {normalize_destination(text)} "
+        matches = [city for city in self.generation()["cities"] if f" {city} " in normalized]
+        return max(matches, key=len) if matches else None
+
+    def freshness(self):
+        """
+        Get the age of each city's materialization.
+
+        Returns:
+            dict: Seconds since generation by city key
+        """
+        now = time.time()
+        return {key: now - city["generated_at"] for key, city in self.generation()["cities"].items()}
+
+    def publish(self, generation):
+        """
+        Write a new generation and make it current. Readers never see a partial file:
+        the generation is written first and CURRENT is replaced atomically after it.
+
+        Args:
+            generation (dict): generated_at and cities, as returned by generation()
+
+        Returns:
+            int: The published version
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        version = self._current_version() + 1
+        generation = {**generation, "version": version}
+        path = self._path(version)
+        with open(path.with_suffix(".tmp"), "w", encoding="utf-8") as f:
+            json.dump(generation, f, ensure_ascii=False, indent=2)
+        os.replace(path.with_suffix(".tmp"), path)
+        current = self.directory / "CURRENT.tmp"
+        current.write_text(str(version))
+        os.replace(current, self.directory / "CURRENT")
+
+        for old in self.directory.glob("recommendations.*.json"):
+            match = re.fullmatch(r"recommendations\.(\d+)\.json", old.name)
+            if match and int(match.group(1)) < version - MATERIALIZED_KEEP:
+                old.unlink()
+
+        with self._reload_lock:
+            self._generation = generation
+            self._checked_at = time.monotonic()
+        return version
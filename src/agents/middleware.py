@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from threading import BoundedSemaphore, Lock
+from runtime.cancellation import OperationCancelled, cancellation_scope, run_cancellable
+from runtime.executor import ServiceBusyError
+from telemetry.metrics import MetricsRegistry
+
+
+class Middleware:
+    """
+    Wraps the handling of a task by an agent. Subclasses override handle and ahandle,
+    doing their work around call_next(task, context), which runs the rest of the chain
+    and finally the agent. The default implementations just pass the task on.
+    """
+
+    def handle(self, task, context, call_next):
+        """
+        Handle a task synchronously.
+
+        Args:
+            task (dict): The task
+            context: The task's context
+            call_next (callable): Runs the rest of the chain
+
+        Returns:
+            Any: The result of the task
+        """
+        return call_next(task, context)
+
+    async def ahandle(self, task, context, call_next):
+        """
+        Asynchronous variant of handle; call_next returns an awaitable.
+        """
+        return await call_next(task, context)
+
+
+class TimingMiddleware(Middleware):
+    """
+    Records the duration of each task as "agent.{type}.seconds" and its failures
+    as "agent.{type}.errors".
+    """
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+
+    def _record(self, task, start, failed):
+        task_type = task.get("type")
+        self.metrics.observe(f"agent.{task_type}.seconds", time.perf_counter() - start)
+        if failed:
+            self.metrics.increment(f"agent.{task_type}.errors")
+
+    def handle(self, task, context, call_next):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = call_next(task, context)
+            failed = False
+            return result
+        finally:
+            self._record(task, start, failed)
+
+    async def ahandle(self, task, context, call_next):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = await call_next(task, context)
+            failed = False
+            return result
+        finally:
+            self._record(task, start, failed)
+
+
+class CacheMiddleware(Middleware):
+    """
+    Caches results keyed by the task payload. The context is not part of the key, so
+    it suits tasks whose payload determines the result, such as retrieval.
+    """
+
+    def __init__(self, ttl=300, max_entries=512, version=None):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (float, optional): Seconds a result is reused. Defaults to 300
+            max_entries (int, optional): Maximum number of cached results. Defaults to 512
+            version (callable, optional): Returns the version of the underlying data;
+                results computed for another version are not reused
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version or (lambda: None)
+        self.metrics = MetricsRegistry()
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _key(self, task):
+        return json.dumps(task, sort_keys=True, ensure_ascii=False, default=str), self.version()
+
+    def _get(self, task):
+        key = self._key(task)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.metrics.increment(f"agent.{task.get('type')}.cache_hits")
+                return key, entry
+        self.metrics.increment(f"agent.{task.get('type')}.cache_misses")
+        return key, None
+
+    def _put(self, key, result):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def handle(self, task, context, call_next):
+        key, entry = self._get(task)
+        if entry is not None:
+            return entry[0]
+        result = call_next(task, context)
+        self._put(key, result)
+        return result
+
+    async def ahandle(self, task, context, call_next):
+        key, entry = self._get(task)
+        if entry is not None:
+            return entry[0]
+        result = await call_next(task, context)
+        self._put(key, result)
+        return result
+
+
+class TimeoutMiddleware(Middleware):
+    """
+    Gives each task a deadline. It is enforced through a cancellation token: the LLM
+    calls of an overdue task are aborted, and its retrievals are not started.
+    """
+
+    def __init__(self, seconds):
+        """
+        Initialize the middleware.
+
+        Args:
+            seconds (float): Deadline of each task
+        """
+        self.seconds = seconds
+
+    def handle(self, task, context, call_next):
+        with cancellation_scope(timeout=self.seconds):
+            return call_next(task, context)
+
+    async def ahandle(self, task, context, call_next):
+        with cancellation_scope(timeout=self.seconds):
+            return await run_cancellable(call_next(task, context), f"agent.{task.get('type')}")
+
+
+class RetryMiddleware(Middleware):
+    """
+    Retries failed tasks with exponential backoff. Cancellations and load shedding
+    are never retried.
+    """
+
+    def __init__(self, attempts=2, backoff=0.5, retry_on=(Exception,)):
+        """
+        Initialize the middleware.
+
+        Args:
+            attempts (int, optional): Total number of attempts. Defaults to 2
+            backoff (float, optional): Seconds before the first retry, doubled after each. Defaults to 0.5
+            retry_on (tuple, optional): Exception types worth retrying. Defaults to any Exception
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.retry_on = retry_on
+        self.metrics = MetricsRegistry()
+
+    def _should_retry(self, error, attempt):
+        if isinstance(error, (OperationCancelled, ServiceBusyError)) or not isinstance(error, self.retry_on):
+            return False
+        return attempt < self.attempts - 1
+
+    def _log_retry(self, task, error, attempt):
+        print(f"Reintentando {task.get('type')} ({attempt + 1}/{self.attempts - 1}) tras error: {str(error)}")
+        self.metrics.increment(f"agent.{task.get('type')}.retries")
+
+    def handle(self, task, context, call_next):
+        for attempt in range(self.attempts):
+            try:
+                return call_next(task, context)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                self._log_retry(task, e, attempt)
+                time.sleep(self.backoff * 2 ** attempt)
+
+    async def ahandle(self, task, context, call_next):
+        for attempt in range(self.attempts):
+            try:
+                return await call_next(task, context)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                self._log_retry(task, e, attempt)
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+
+class ConcurrencyLimitMiddleware(Middleware):
+    """
+    Caps how many tasks run at once. Synchronous and asynchronous dispatches are
+    limited separately, since async waiters must not block the event loop.
+    """
+
+    def __init__(self, limit):
+        """
+        Initialize the middleware.
+
+        Args:
+            limit (int): Maximum number of concurrent tasks
+        """
+        self.limit = limit
+        self.metrics = MetricsRegistry()
+        self._semaphore = BoundedSemaphore(limit)
+        self._async_semaphore = None
+
+    def handle(self, task, context, call_next):
+        start = time.perf_counter()
+        with self._semaphore:
+            self.metrics.observe(f"agent.{task.get('type')}.queue_seconds", time.perf_counter() - start)
+            return call_next(task, context)
+
+    async def ahandle(self, task, context, call_next):
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.limit)
+        start = time.perf_counter()
+        async with self._async_semaphore:
+            self.metrics.observe(f"agent.{task.get('type')}.queue_seconds", time.perf_counter() - start)
+            return await call_next(task, context)
@@ -1,45 +1,58 @@
-from .bdi_agent import BDIAgent
+import asyncio
+from runtime.executor import get_executor_service
+from .bdi_agent import BDIAgent, per_request
 from .blackboard import Blackboard
 from datetime import datetime, time
 
 class NightlifeAgent(BDIAgent):
+    KNOWLEDGE = {
+        "venue_types": (
+            "bar",
+            "club",
+            "live_music",
+            "dance_hall",
+            "cultural_center",
+            "cafe"
+        ),
+        "music_types": (
+            "traditional",
+            "salsa",
+            "jazz",
+            "contemporary",
+            "mixed"
+        ),
+        "price_ranges": ("economic", "moderate", "luxury"),
+        "operating_hours": {
+            "standard": {
+                "open": time(20, 0),
+                "close": time(2, 0)
+            },
+            "late": {
+                "open": time(22, 0),
+                "close": time(6, 0)
+            }
+        }
+    }
+
+    structured_topic = "lugares de vida nocturna"
+    preferences_schema = {
+        "type": "object",
+        "required": ["venue", "music", "price_range"],
+        "properties": {
+            "venue": {
+                "type": "string",
+                "enum": ["bar", "club", "live_music", "dance_hall", "cultural_center", "cafe", "any"]
+            },
+            "music": {"type": "string", "enum": ["traditional", "salsa", "jazz", "contemporary", "mixed", "any"]},
+            "price_range": {"type": "string", "enum": ["economic", "moderate", "luxury", "any"]}
+        }
+    }
+
     def __init__(self, name, vector_db=None):
         super().__init__(name, vector_db)
         self.specialization = "nightlife"
         self.blackboard = Blackboard()
         
-        self.beliefs = {
-            "venues": {},
-            "venue_types": [
-                "bar",
-                "club",
-                "live_music",
-                "dance_hall",
-                "cultural_center",
-                "cafe"
-            ],
-            "music_types": [
-                "traditional",
-                "salsa",
-                "jazz",
-                "contemporary",
-                "mixed"
-            ],
-            "price_ranges": ["economic", "moderate", "luxury"],
-            "operating_hours": {
-                "standard": {
-                    "open": time(20, 0), 
-                    "close": time(2, 0) 
-                },
-                "late": {
-                    "open": time(22, 0),
-                    "close": time(6, 0)
-                }
-            },
-            "current_query": None,
-            "destination": None
-        }
-        
         self.desires = [
             "process_user_query",
             "recommend_nightlife"
@@ -57,7 +70,21 @@ class NightlifeAgent(BDIAgent):
                 "acciones": ["get_recommendations"]
             }
         }
-        
+
+    def initial_beliefs(self):
+        """
+        Build the beliefs a nightlife request starts with, including its per-request result cache.
+
+        Returns:
+            dict: Fresh, request-owned beliefs
+        """
+        return {
+            **super().initial_beliefs(),
+            "venues": {},
+            "current_query": None,
+            "destination": None
+        }
+
     def _is_plan_relevant(self, plan) -> bool:
         """
         Check if a plan is relevant for the current state.
@@ -108,11 +135,29 @@ class NightlifeAgent(BDIAgent):
         """Ejecuta una acción específica"""
         if action == "search_nightlife":
             query = self.beliefs["current_query"]
-            return self.search_nightlife(query)
+            if self.structured_output:
+                answer = self.structured_query(query, self.beliefs.get("prefetched"))
+                if answer:
+                    return answer
+            return self.search_nightlife(query, self.beliefs.get("prefetched"))
             
         elif action == "get_recommendations":
             return self.get_recommendations(self.beliefs["destination"])
 
+    async def _aperform_action(self, action):
+        """Ejecuta una acción específica sin bloquear el bucle de eventos"""
+        if action == "search_nightlife":
+            if self.structured_output:
+                answer = await self.astructured_query(
+                    self.beliefs["current_query"], self.beliefs.get("prefetched")
+                )
+                if answer:
+                    return answer
+            return await self.asearch_nightlife(
+                self.beliefs["current_query"], self.beliefs.get("prefetched")
+            )
+        return await super()._aperform_action(action)
+
     def search_nightlife(self, query, relevant_docs=None):
         """
         Search for nightlife venues matching the provided query.
@@ -124,6 +169,39 @@ class NightlifeAgent(BDIAgent):
         Returns:
             str: Formatted string containing nightlife venue search results
         """
+        classified_venues = self._collect_venues(query, relevant_docs)
+        response = self.client.chat(**self._location_request(query))
+        return self._record_venues(response, classified_venues)
+
+    async def asearch_nightlife(self, query, relevant_docs=None):
+        """
+        Asynchronous variant of search_nightlife. Retrieval and location
+        extraction are independent, so they run concurrently.
+
+        Args:
+            query (str): The search query string
+            relevant_docs (list, optional): Pre-filtered relevant documents
+
+        Returns:
+            str: Formatted string containing nightlife venue search results
+        """
+        classified_venues, response = await asyncio.gather(
+            get_executor_service().run_io(self._collect_venues, query, relevant_docs),
+            self.client.achat(**self._location_request(query))
+        )
+        return self._record_venues(response, classified_venues)
+
+    def _collect_venues(self, query, relevant_docs=None):
+        """
+        Retrieve and classify the nightlife venues relevant to a query.
+
+        Args:
+            query (str): The search query string
+            relevant_docs (list, optional): Pre-filtered relevant documents
+
+        Returns:
+            dict: Venues classified by type
+        """
         if relevant_docs is None:
             relevant_docs = self.vector_db.similarity_search(
                 self._build_nightlife_query(query)
@@ -131,21 +209,22 @@ class NightlifeAgent(BDIAgent):
             
         processed_results = []
         for doc in relevant_docs:
-            if any(venue in doc.page_content.lower() for venue in self.beliefs["venue_types"]):
+            if any(venue in doc.page_content.lower() for venue in self.knowledge["venue_types"]):
                 processed_results.append(doc.page_content)
                 
-        classified_venues = self._classify_venues(processed_results)
-        
-        system_prompt = """Extract the destination/location from this query. Return ONLY the location name, nothing else.
-        If no location is found, return 'unknown'."""
-        
-        response = self.client.chat(
-            model="mistral-medium",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ]
-        )
+        return self._classify_venues(processed_results)
+
+    def _record_venues(self, response, classified_venues):
+        """
+        Update beliefs with the venues found for the extracted location.
+
+        Args:
+            response (ChatCompletionResponse): Location extraction response
+            classified_venues (dict): Venues classified by type
+
+        Returns:
+            str: Formatted string containing nightlife venue search results
+        """
         location = response.choices[0].message.content.strip()
         
         if location and location.lower() != 'unknown':
@@ -154,6 +233,21 @@ class NightlifeAgent(BDIAgent):
             
         return self._format_venue_results(classified_venues)
 
+    def _structured_context(self, query, relevant_docs=None):
+        return self._format_venue_results(self._collect_venues(query, relevant_docs))
+
+    def prefetch_query(self, query):
+        """
+        Get the nightlife venues retrieval query run for a user query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            str: The retrieval query
+        """
+        return self._build_nightlife_query(query)
+
     def _build_nightlife_query(self, location, filters=None):
         """
         Build an optimized search query based on location and filters.
@@ -169,11 +263,11 @@ class NightlifeAgent(BDIAgent):
         
         if filters:
             for filter_type, value in filters.items():
-                if filter_type == "venue" and value in self.beliefs["venue_types"]:
+                if filter_type == "venue" and value in self.knowledge["venue_types"]:
                     query_parts.append(f"focusing on {value}")
-                elif filter_type == "music" and value in self.beliefs["music_types"]:
+                elif filter_type == "music" and value in self.knowledge["music_types"]:
                     query_parts.append(f"with {value} music")
-                elif filter_type == "price" and value in self.beliefs["price_ranges"]:
+                elif filter_type == "price" and value in self.knowledge["price_ranges"]:
                     query_parts.append(f"with {value} prices")
                     
         return " ".join(query_parts)
@@ -257,15 +351,16 @@ class NightlifeAgent(BDIAgent):
         La respuesta debe ser detallada pero concisa."""
         
         response = self.client.chat(
-            model="mistral-medium",
+            task="specialist_recommendations",
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Lugares nocturnos en {destination}: {nightlife_results}"}
+                {"role": "user", "content": f"Lugares nocturnos en {destination}: {self.context_packer.pack(f'vida nocturna {destination}', [nightlife_results])}"}
             ]
         )
         
         return response.choices[0].message.content
 
+    @per_request
     def process_query(self, query):
         """
         Process a user query to extract venue preferences and get recommendations.
@@ -0,0 +1,63 @@
+from dataclasses import dataclass, asdict
+from llm.structured import validate
+
+PLACE_SCHEMA = {
+    "type": "object",
+    "required": ["name", "type", "cost", "rating", "description"],
+    "properties": {
+        "name": {"type": "string"},
+        "type": {"type": "string"},
+        "cost": {"type": "number", "minimum": 0},
+        "rating": {"type": "number", "minimum": 1, "maximum": 10},
+        "description": {"type": "string"}
+    }
+}
+
+PLACES_SCHEMA = {
+    "type": "object",
+    "required": ["places"],
+    "properties": {
+        "places": {"type": "array", "items": PLACE_SCHEMA}
+    }
+}
+
+
+@dataclass
+class PlaceRecord:
+    """
+    A place recommended by a specialist agent.
+    Cost is the average spend per visit (per night for lodging) in USD.
+    """
+    name: str
+    type: str
+    cost: float
+    rating: float
+    description: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a record from a dictionary that follows PLACE_SCHEMA.
+
+        Args:
+            data (dict): Place data
+
+        Returns:
+            PlaceRecord: The record
+
+        Raises:
+            ValueError: If the data does not follow PLACE_SCHEMA
+        """
+        errors = validate(data, PLACE_SCHEMA)
+        if errors:
+            raise ValueError("; ".join(errors))
+        return cls(
+            name=data["name"].strip(),
+            type=data["type"].strip(),
+            cost=float(data["cost"]),
+            rating=float(data["rating"]),
+            description=data["description"].strip()
+        )
+
+    def to_dict(self):
+        return asdict(self)
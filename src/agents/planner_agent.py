@@ -1,7 +1,8 @@
 from .bdi_agent import BDIAgent
+from .places import PlaceRecord
+from runtime.executor import get_executor_service
 import math
 import random
-import re
 import time
 import numpy as np
 from scipy.stats import truncnorm
@@ -108,113 +109,32 @@ class TravelPlannerAgent(BDIAgent):
         Returns:
             Dict[str, List[Place]]: Places categorized by type (gastronomy, nightlife, lodging)
         """
-        places = {
-            "gastronomicos": [],
-            "nocturnos": [],
-            "alojamientos": []
-        }
-        
-        percept = {"destination": destination}
+        sources = [
+            ("gastronomicos", self.gastronomy_agent, "restaurant", 20.0),
+            ("nocturnos", self.nightlife_agent, "nightlife", 30.0),
+            ("alojamientos", self.lodging_agent, "lodging", 50.0)
+        ]
         
-        gastro_response = self.gastronomy_agent.action(percept)
-        for place in self._parse_agent_response(gastro_response):
-            places["gastronomicos"].append(Place(
-                name=place["name"],
-                city=destination,
-                cost=StochasticPrice(base_price=place.get("cost", 20)),
-                final_cost=0.0,
-                rating=place.get("rating", 7),
-                type="restaurant",
-                description=place.get("description", "")
-            ))
-
-        night_response = self.nightlife_agent.action(percept)
-        for place in self._parse_agent_response(night_response):
-            places["nocturnos"].append(Place(
-                name=place["name"],
-                city=destination,
-                cost=StochasticPrice(base_price=place.get("cost", 30)),
-                final_cost=0.0,
-                rating=place.get("rating", 7),
-                type="nightlife",
-                description=place.get("description", "")
-            ))
-
-        lodging_response = self.lodging_agent.action(percept)
-        for place in self._parse_agent_response(lodging_response):
-            places["alojamientos"].append(Place(
-                name=place["name"],
-                city=destination,
-                cost=StochasticPrice(base_price=place.get("cost", 50)),
-                final_cost=0.0,
-                rating=place.get("rating", 7),
-                type="lodging",
-                description=place.get("description", "")
-            ))
+        places = {}
+        for category, agent, place_type, default_cost in sources:
+            records = agent.recommend_places(destination)
+            if not records:
+                print(f"Sin recomendaciones de {agent.name} para {destination}, usando un lugar genérico")
+                records = [PlaceRecord("Lugar Genérico", place_type, 25.0, 7.0, "Lugar típico")]
+            places[category] = [
+                Place(
+                    name=record.name,
+                    city=destination,
+                    cost=StochasticPrice(base_price=record.cost if record.cost > 0 else default_cost),
+                    final_cost=0.0,
+                    rating=record.rating,
+                    type=place_type,
+                    description=record.description
+                )
+                for record in records
+            ]
 
         return places
-
-    def _parse_cost(self, cost_str: str) -> float:
-        """
-        Extract and process cost value from a string representation.
-
-        Args:
-            cost_str (str): String containing cost information
-
-        Returns:
-            float: Processed cost value
-        """
-        if isinstance(cost_str, (int, float)):
-            return float(cost_str)
-            
-        numbers = re.findall(r'\d+', str(cost_str))
-        if not numbers:
-            return 25.0
-            
-        if len(numbers) >= 2:
-            return (float(numbers[0]) + float(numbers[1])) / 2
-            
-        return float(numbers[0])
-
-    def _parse_agent_response(self, response: str) -> List[Dict[str, Any]]:
-        """
-        Parse agent responses into structured data.
-
-        Args:
-            response (str): Raw response from an agent
-
-        Returns:
-            List[Dict[str, Any]]: List of parsed place information
-        """
-        try:
-            system_prompt = """Extrae la información de los lugares mencionados en el texto.
-            Por cada lugar devuelve un diccionario con:
-            - name: nombre del lugar
-            - cost: costo estimado (como string con el formato "$X-Y USD" o "$X USD")
-            - rating: valoración de 1-10 (como número)
-            - description: breve descripción
-            Responde como lista de diccionarios."""
-            
-            parsed = self.client.chat(
-                model="mistral-small",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": response[:130000]}
-                ]
-            )
-            result = eval(parsed.choices[0].message.content)
-            
-            for item in result:
-                if "cost" in item:
-                    item["cost"] = self._parse_cost(item["cost"])
-                if "rating" in item:
-                    item["rating"] = float(item["rating"])
-            
-            return result
-        except:
-            return [
-                {"name": "Lugar Genérico", "cost": 25.0, "rating": 7.0, "description": "Lugar típico"}
-            ]
     
     def get_price_means(self, sol, n):
         means = []
@@ -385,12 +305,13 @@ class TravelPlannerAgent(BDIAgent):
             itinerary += f"💰 Total del día: ${total_day}\n\n"
             
         response = self.client.chat(
-            model="mistral-medium",
+            task="format_itinerary",
             messages=[
                 {"role": "system", "content": """Como experto en turismo, genera una descripción detallada, atractiva y en buen formato
                 del itinerario proporcionado. de forma rápida"""},
                 {"role": "user", "content": f"Por favor, genera un itinerario atractivo basado en esta información: {itinerary}"}
-            ]
+            ],
+            hedge=True
         )
         
         formatted_itinerary = response.choices[0].message.content
@@ -418,12 +339,13 @@ class TravelPlannerAgent(BDIAgent):
         print("budget:", budget)
         print("places:", places)
         
-        solution = self.simulated_annealing_csp(
+        solution = get_executor_service().cpu.submit(
+            self.simulated_annealing_csp,
             days=days,
             places=places,
             budget_per_day=budget,
             destination=destination
-        )
+        ).result()
         
         if not solution:
             return "Lo siento, no se pudo generar un itinerario con las condiciones dadas."
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+from runtime.event_loop import get_event_loop
+from runtime.executor import ServiceBusyError, background_context, get_executor_service
+from runtime.single_flight import SingleFlight
+from telemetry.metrics import MetricsRegistry
+
+# Seconds during which cached recommendations are served without refreshing them
+RECOMMENDATION_TTL = float(os.getenv("GPTUR_RECOMMENDATION_TTL", "21600"))
+# Seconds during which expired recommendations are still served while a refresh runs
+RECOMMENDATION_MAX_STALE = float(os.getenv("GPTUR_RECOMMENDATION_MAX_STALE", "86400"))
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("GPTUR_RECOMMENDATION_CACHE_SIZE", "1024"))
+# Destinations whose recommendations are computed when the application starts
+WARM_DESTINATIONS = [
+    destination.strip()
+    for destination in os.getenv(
+        "GPTUR_WARM_DESTINATIONS", "La Habana,Varadero,Trinidad,Viñales,Santiago de Cuba"
+    ).split(",")
+    if destination.strip()
+]
+
+
+def normalize_destination(destination):
+    """
+    Reduce a destination to the form used in cache keys.
+    Case, accents, punctuation and a leading article are ignored, so
+    "La Habana", "habana" and "Habana." share an entry.
+
+    Args:
+        destination (str): Destination as written by the user or the LLM
+
+    Returns:
+        str: The normalized destination
+    """
+    text = unicodedata.normalize("NFKD", destination.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = " ".join(re.findall(r"\w+", text))
+    return re.sub(r"^(la|el|los|las) ", "", text)
+
+
+def index_version(agent):
+    """
+    Get the version of the index an agent retrieves from.
+
+    Args:
+        agent (BDIAgent): The agent
+
+    Returns:
+        int: The vector database's index version, 0 if it has none
+    """
+    return getattr(agent.vector_db, "index_version", 0)
+
+
+class RecommendationCache:
+    """
+    Process-wide cache of specialist recommendations, keyed by agent, normalized
+    destination and preference bucket. Entries are fresh for RECOMMENDATION_TTL seconds
+    and for the index version they were computed from. After that, for up to
+    RECOMMENDATION_MAX_STALE seconds, the old value is returned while one background
+    refresh replaces it (stale-while-revalidate). Concurrent misses share one computation.
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(RecommendationCache, cls).__new__(cls)
+                    cls._instance.ttl = RECOMMENDATION_TTL
+                    cls._instance.max_stale = RECOMMENDATION_MAX_STALE
+                    cls._instance.max_entries = RECOMMENDATION_CACHE_SIZE
+                    cls._instance.metrics = MetricsRegistry()
+                    cls._instance.single_flight = SingleFlight("recommendations")
+                    cls._instance._entries = OrderedDict()
+                    cls._instance._refreshing = set()
+                    cls._instance._entries_lock = Lock()
+        return cls._instance
+
+    def _key(self, agent, destination, bucket):
+        return agent.name, normalize_destination(destination), bucket
+
+    def _lookup(self, key, version):
+        """
+        Find the cached value of a key.
+
+        Args:
+            key (tuple): Cache key
+            version (int): Current index version
+
+        Returns:
+            tuple: (value, state) where state is "fresh", "stale" or "miss"
+        """
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return None, "miss"
+        value, stored_at, entry_version = entry
+        age = time.monotonic() - stored_at
+        if entry_version == version and age < self.ttl:
+            return value, "fresh"
+        if age < self.max_stale:
+            return value, "stale"
+        return None, "miss"
+
+    def _store(self, key, version, value):
+        if not value:
+            return
+        with self._entries_lock:
+            self._entries[key] = (value, time.monotonic(), version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics.increment("recommendation_cache.evicted")
+
+    def _claim_refresh(self, key):
+        with self._entries_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key):
+        with self._entries_lock:
+            self._refreshing.discard(key)
+
+    def _refresh(self, key, version, compute):
+        try:
+            self._store(key, version, compute())
+            self.metrics.increment("recommendation_cache.refreshed")
+        except Exception as e:
+            print(f"Error actualizando recomendaciones de {key[0]} para {key[1]}: {str(e)}")
+        finally:
+            self._release_refresh(key)
+
+    async def _arefresh(self, key, version, acompute):
+        try:
+            self._store(key, version, await acompute())
+            self.metrics.increment("recommendation_cache.refreshed")
+        except Exception as e:
+            print(f"Error actualizando recomendaciones de {key[0]} para {key[1]}: {str(e)}")
+        finally:
+            self._release_refresh(key)
+
+    def _revalidate(self, key, version, compute):
+        """
+        Refresh a stale entry in the background, outside the request that found it,
+        so the request's deadline and cancellation do not apply to the refresh.
+        """
+        if not self._claim_refresh(key):
+            return
+        try:
+            background_context().run(get_executor_service().io.submit, self._refresh, key, version, compute)
+        except ServiceBusyError:
+            self._release_refresh(key)
+            self.metrics.increment("recommendation_cache.refresh_shed")
+
+    def _arevalidate(self, key, version, acompute):
+        if not self._claim_refresh(key):
+            return
+        background_context().run(
+            asyncio.run_coroutine_threadsafe, self._arefresh(key, version, acompute), get_event_loop()
+        )
+
+    def get(self, agent, destination, bucket, compute):
+        """
+        Get an agent's recommendations for a destination, computing them on a miss.
+
+        Args:
+            agent (BDIAgent): The specialist producing the recommendations
+            destination (str): Target destination
+            bucket (str): Preference bucket, e.g. the number of places requested
+            compute (callable): Produces the recommendations; empty results are not cached
+
+        Returns:
+            Any: The cached or computed recommendations
+        """
+        version = index_version(agent)
+        key = self._key(agent, destination, bucket)
+        value, state = self._lookup(key, version)
+        self.metrics.increment(f"recommendation_cache.{state}")
+        if state == "stale":
+            self._revalidate(key, version, compute)
+        if value is not None:
+            return value
+        value = self.single_flight.do((key, version), compute)
+        self._store(key, version, value)
+        return value
+
+    async def aget(self, agent, destination, bucket, acompute):
+        """
+        Asynchronous variant of get.
+
+        Args:
+            agent (BDIAgent): The specialist producing the recommendations
+            destination (str): Target destination
+            bucket (str): Preference bucket, e.g. the number of places requested
+            acompute (callable): Coroutine function producing the recommendations
+
+        Returns:
+            Any: The cached or computed recommendations
+        """
+        version = index_version(agent)
+        key = self._key(agent, destination, bucket)
+        value, state = self._lookup(key, version)
+        self.metrics.increment(f"recommendation_cache.{state}")
+        if state == "stale":
+            self._arevalidate(key, version, acompute)
+        if value is not None:
+            return value
+        value = await self.single_flight.ado((key, version), acompute)
+        self._store(key, version, value)
+        return value
+
+    def warm_up(self, agents, destinations=None, n=8):
+        """
+        Compute the place recommendations of popular destinations in the background,
+        behind any interactive work.
+
+        Args:
+            agents (Iterable[BDIAgent]): Specialists to warm up
+            destinations (list, optional): Destinations to warm up. Defaults to WARM_DESTINATIONS
+            n (int, optional): Number of places per recommendation. Defaults to 8
+
+        Returns:
+            int: Number of warm-up jobs scheduled
+        """
+        scheduled = 0
+        context = background_context()
+        for destination in destinations or WARM_DESTINATIONS:
+            for agent in agents:
+                try:
+                    context.run(get_executor_service().io.submit, agent.recommend_places, destination, n)
+                except ServiceBusyError:
+                    self.metrics.increment("recommendation_cache.warm_up_shed")
+                    return scheduled
+                scheduled += 1
+        return scheduled
+
+    def clear(self):
+        """
+        Drop every cached recommendation.
+        """
+        with self._entries_lock:
+            self._entries.clear()
@@ -1,21 +1,11 @@
 from .base_agent import BaseAgent
 
 class RetrieverAgent(BaseAgent):
+    task_types = ("retrieve",)
+
     def __init__(self, vector_db):
         self.vector_db = vector_db
 
-    def can_handle(self, task):
-        """
-        Check if the agent can handle the given task.
-
-        Args:
-            task (dict): The task to be evaluated
-
-        Returns:
-            bool: True if the task is of type 'retrieve', False otherwise
-        """
-        return task.get("type") == "retrieve"
-
     def handle(self, task, context):
         """
         Process the retrieval task and fetch relevant documents.
@@ -0,0 +1,165 @@
+import math
+import os
+import re
+import unicodedata
+from threading import Lock
+from telemetry.metrics import MetricsRegistry
+
+# Minimum relevance for a specialist to be consulted, and maximum consulted per turn
+ROUTER_THRESHOLD = float(os.getenv("GPTUR_ROUTER_THRESHOLD", "0.3"))
+ROUTER_MAX_FANOUT = int(os.getenv("GPTUR_ROUTER_MAX_FANOUT", "2"))
+
+# Keywords matched against the query words and their lemmas. Stems of six or more
+# characters match as prefixes; shorter ones match whole words and their plurals.
+SPECIALIST_KEYWORDS = {
+    "lodging": [
+        "hotel", "hostal", "alojamiento", "alojar", "hosped", "casa particular", "resort",
+        "dormir", "habitacion", "noche en", "accommodation", "lodging", "stay"
+    ],
+    "historic": [
+        "museo", "histor", "iglesia", "catedral", "plaza", "monumento", "colonial", "patrimonio",
+        "arquitect", "fortaleza", "castillo", "cultura", "museum", "church", "heritage"
+    ],
+    "nightlife": [
+        "bar", "discoteca", "club", "fiesta", "noche", "nocturn", "salsa", "baile", "bailar",
+        "musica", "concierto", "cabaret", "trago", "coctel", "nightlife", "party"
+    ],
+    "gastronomy": [
+        "restaurante", "comer", "comida", "cena", "cenar", "almuerz", "desayun", "paladar",
+        "plato", "cocina", "gastronom", "marisco", "vegetarian", "vegan", "food", "restaurant"
+    ]
+}
+
+# Descriptions of each specialist's domain, embedded once and compared with the query
+SPECIALIST_PROTOTYPES = {
+    "lodging": "Dónde alojarse: hoteles, hostales, casas particulares y resorts, precios por noche y ubicación.",
+    "historic": "Sitios históricos y culturales: museos, iglesias, plazas, monumentos y arquitectura colonial.",
+    "nightlife": "Vida nocturna: bares, discotecas, clubes, música en vivo, salsa y espectáculos de noche.",
+    "gastronomy": "Gastronomía: restaurantes, paladares, comida cubana, platos típicos y precios de comidas."
+}
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^\w\s]", " ", text)
+
+
+def _matches(stem, terms):
+    if len(stem) >= 6:
+        return f" {stem}" in terms
+    return any(f" {stem}{suffix} " in terms for suffix in ("", "s", "es"))
+
+
+class SpecialistRouter:
+    """
+    Scores how relevant each specialist is to a query and picks the ones to consult.
+    The score mixes keyword matches on the query words and their spaCy lemmas with
+    the embedding similarity between the query and each specialist's prototype.
+    """
+
+    def __init__(self, embeddings=None, nlp_processor=None, threshold=None, max_fanout=None,
+                 keyword_weight=0.5, embedding_weight=0.5, temperature=0.05):
+        """
+        Initialize the router.
+
+        Args:
+            embeddings (optional): Embeddings model with embed_query/embed_documents
+            nlp_processor (NLPProcessor, optional): Processor providing lemmas
+            threshold (float, optional): Minimum score to consult a specialist. Defaults to ROUTER_THRESHOLD
+            max_fanout (int, optional): Maximum specialists per query. Defaults to ROUTER_MAX_FANOUT
+            keyword_weight (float, optional): Weight of the keyword score. Defaults to 0.5
+            embedding_weight (float, optional): Weight of the embedding score. Defaults to 0.5
+            temperature (float, optional): Softmax temperature over prototype similarities. Defaults to 0.05
+        """
+        self.embeddings = embeddings
+        self.nlp_processor = nlp_processor
+        self.threshold = ROUTER_THRESHOLD if threshold is None else threshold
+        self.max_fanout = ROUTER_MAX_FANOUT if max_fanout is None else max_fanout
+        self.keyword_weight = keyword_weight
+        self.embedding_weight = embedding_weight
+        self.temperature = temperature
+        self.metrics = MetricsRegistry()
+        self._prototypes = None
+        self._lock = Lock()
+
+    def _terms(self, query):
+        words = _normalize(query).split()
+        if self.nlp_processor is not None:
+            words += [_normalize(token.lemma_) for token in self.nlp_processor.nlp(query)]
+        return " " + " ".join(words) + " "
+
+    def _keyword_scores(self, query):
+        terms = self._terms(query)
+        scores = {}
+        for key, stems in SPECIALIST_KEYWORDS.items():
+            matches = sum(1 for stem in stems if _matches(stem, terms))
+            scores[key] = min(1.0, 0.6 + 0.2 * (matches - 1)) if matches else 0.0
+        return scores
+
+    def _prototype_vectors(self):
+        if self._prototypes is None:
+            with self._lock:
+                if self._prototypes is None:
+                    keys = list(SPECIALIST_PROTOTYPES)
+                    vectors = self.embeddings.embed_documents(
+                        [f"query: {SPECIALIST_PROTOTYPES[key]}" for key in keys]
+                    )
+                    self._prototypes = dict(zip(keys, vectors))
+        return self._prototypes
+
+    def _embedding_scores(self, query):
+        if self.embeddings is None:
+            return {}
+        query_vector = self.embeddings.embed_query(f"query: {query}")
+        similarities = {
+            key: sum(a * b for a, b in zip(query_vector, vector))
+            for key, vector in self._prototype_vectors().items()
+        }
+        top = max(similarities.values())
+        weights = {key: math.exp((sim - top) / self.temperature) for key, sim in similarities.items()}
+        total = sum(weights.values())
+        return {key: weight / total for key, weight in weights.items()}
+
+    def scores(self, query):
+        """
+        Score the relevance of every specialist to a query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            dict: Score in [0, 1] by specialization
+        """
+        keyword_scores = self._keyword_scores(query)
+        embedding_scores = self._embedding_scores(query)
+        keyword_weight = self.keyword_weight if embedding_scores else 1.0
+        return {
+            key: keyword_weight * keyword_scores.get(key, 0.0)
+                 + self.embedding_weight * embedding_scores.get(key, 0.0)
+            for key in SPECIALIST_KEYWORDS
+        }
+
+    def route(self, query, available):
+        """
+        Choose the specialists to consult for a query. Those above the threshold are
+        chosen, best first, up to the maximum fan-out; if none qualifies, the best
+        scored ones are consulted instead.
+
+        Args:
+            query (str): The user's query
+            available (iterable): Specializations that can be consulted
+
+        Returns:
+            list: The chosen specializations
+        """
+        available = list(available)
+        scores = self.scores(query)
+        ranked = sorted(available, key=lambda key: scores.get(key, 0.0), reverse=True)
+        selected = [key for key in ranked if scores.get(key, 0.0) >= self.threshold]
+        selected = (selected or ranked)[:self.max_fanout]
+
+        self.metrics.observe("router.fanout", len(selected))
+        for key in selected:
+            self.metrics.increment(f"router.selected.{key}")
+        return selected
@@ -0,0 +1,71 @@
+import time
+from telemetry.metrics import MetricsRegistry
+
+
+class Speculation:
+    """
+    Work started before knowing whether it will be needed.
+    Wraps a concurrent.futures.Future or an asyncio.Task and records in the metrics
+    registry how much latency it saved when committed and how much work it wasted
+    when discarded.
+    """
+
+    def __init__(self, name, future):
+        """
+        Initialize the speculation.
+
+        Args:
+            name (str): Name used for the metrics, e.g. "guide_preparation"
+            future: The running concurrent.futures.Future or asyncio.Task
+        """
+        self.name = name
+        self.future = future
+        self.metrics = MetricsRegistry()
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.metrics.increment(f"speculation.{name}.started")
+        future.add_done_callback(self._mark_finished)
+
+    def _mark_finished(self, _):
+        self.finished_at = time.perf_counter()
+
+    def _record_commit(self, decided_at):
+        end = min(self.finished_at or decided_at, decided_at)
+        self.metrics.increment(f"speculation.{self.name}.committed")
+        self.metrics.observe(f"speculation.{self.name}.saved_seconds", end - self.started_at)
+
+    def commit(self, decided_at):
+        """
+        Use the speculative result, waiting for it if still running.
+
+        Args:
+            decided_at (float): time.perf_counter() when the work was known to be needed
+
+        Returns:
+            Any: The result of the speculative work
+        """
+        self._record_commit(decided_at)
+        return self.future.result()
+
+    async def acommit(self, decided_at):
+        """
+        Asynchronous variant of commit for asyncio tasks.
+
+        Args:
+            decided_at (float): time.perf_counter() when the work was known to be needed
+
+        Returns:
+            Any: The result of the speculative work
+        """
+        self._record_commit(decided_at)
+        return await self.future
+
+    def discard(self):
+        """
+        Drop the speculative work, cancelling it if it has not finished.
+        Work that already ran is recorded as wasted.
+        """
+        self.future.cancel()
+        end = self.finished_at or time.perf_counter()
+        self.metrics.increment(f"speculation.{self.name}.discarded")
+        self.metrics.observe(f"speculation.{self.name}.wasted_seconds", end - self.started_at)
@@ -0,0 +1,130 @@
+"""
+Headless HTTP API of GPTur, serving chat sessions and trip planning over the same
+agent graph as the Streamlit app:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000     # from src
+    python api.py --port 8000
+
+Sessions live in GPTUR_SESSION_STORE, so several instances can serve the same
+sessions behind a load balancer. Endpoints:
+
+    POST /sessions                          create a session
+    GET  /sessions/{id}                     messages and pending follow-ups
+    POST /sessions/{id}/messages            chat turn; {"stream": true} returns NDJSON events
+    POST /plan                              itinerary from explicit preferences
+    GET  /health, GET /metrics
+"""
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from chatbot.application import create_application
+from chatbot.service import ChatService, TIMEOUT_MESSAGE
+from chatbot.sessions import SessionNotFound, create_session_store
+from runtime.cancellation import OperationCancelled
+from runtime.executor import BUSY_MESSAGE, ServiceBusyError
+from telemetry.metrics import MetricsRegistry
+
+# Seconds clients are asked to wait before retrying a request shed under load
+RETRY_AFTER = "5"
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1)
+    stream: bool = False
+
+
+class PlanRequest(BaseModel):
+    destino: str = "Cuba"
+    dias: int = Field(5, ge=1, le=15)
+    presupuesto: float = Field(100, gt=0)
+    intereses: str = ""
+
+
+@asynccontextmanager
+async def lifespan(app):
+    application = await asyncio.to_thread(create_application)
+    app.state.service = ChatService(application, create_session_store())
+    yield
+
+
+app = FastAPI(title="GPTur", lifespan=lifespan)
+
+
+@app.exception_handler(ServiceBusyError)
+async def service_busy(request, exc):
+    return JSONResponse({"detail": BUSY_MESSAGE}, status_code=503, headers={"Retry-After": RETRY_AFTER})
+
+
+@app.exception_handler(OperationCancelled)
+async def operation_cancelled(request, exc):
+    return JSONResponse({"detail": TIMEOUT_MESSAGE}, status_code=504)
+
+
+@app.exception_handler(SessionNotFound)
+async def session_not_found(request, exc):
+    return JSONResponse({"detail": "Sesión no encontrada"}, status_code=404)
+
+
+@app.get("/health")
+def health():
+    vector_db = app.state.service.application.chatbot.vector_db
+    return {"status": "ok", "index_version": vector_db.index_version, "last_update": vector_db.last_update}
+
+
+@app.get("/metrics")
+def metrics():
+    return MetricsRegistry().snapshot()
+
+
+@app.post("/sessions", status_code=201)
+def create_session():
+    return {"session_id": app.state.service.create_session()}
+
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    return {"session_id": session_id, **app.state.service.session(session_id)}
+
+
+@app.post("/sessions/{session_id}/messages")
+async def post_message(session_id: str, request: ChatRequest):
+    service = app.state.service
+    await asyncio.to_thread(service.session, session_id)
+    events = service.astream(session_id, request.message)
+
+    if request.stream:
+        async def ndjson():
+            async for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    async for event in events:
+        if event["event"] == "done":
+            return event
+        if event["event"] == "error":
+            headers = {"Retry-After": RETRY_AFTER} if event["status"] == 503 else None
+            raise HTTPException(event["status"], event["detail"], headers=headers)
+    raise HTTPException(500, "Turno interrumpido")
+
+
+@app.post("/plan")
+async def plan(request: PlanRequest):
+    preferences = request.model_dump()
+    preferences["intereses"] = preferences["intereses"] or f"Viaje a {request.destino}"
+    return {"itinerary": await app.state.service.aplan(preferences)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API HTTP de GPTur")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
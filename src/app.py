@@ -1,19 +1,7 @@
 import streamlit as st
 from sympy import false
-from chatbot.core import CubaChatbot
-from chatbot.gap_detector import GapDetector
-from crawlers.dynamic_crawler import DynamicCrawler
-from agents.retriever_agent import RetrieverAgent
-from agents.generator_agent import GeneratorAgent
-from agents.gap_detector_agent import GapDetectorAgent
-from agents.updater_agent import UpdaterAgent
-from agents.agent_manager import AgentManager
-from agents.guide_agent import GuideAgent
-from agents.planner_agent import TravelPlannerAgent
-from agents.gastronomy_agent import GastronomyAgent
-from agents.historic_agent import HistoricAgent
-from agents.lodging_agent import LodgingAgent
-from agents.nightlife_agent import NightlifeAgent
+from chatbot.api_client import create_chat_client
+from chatbot.sessions import SessionNotFound
 from pathlib import Path
 import time
 import random
@@ -45,110 +33,76 @@ with columns[2]:
     st.image(logo_path, use_container_width=True)
 st.markdown("<h3 style='text-align: center;'>Asistente Turístico de Cuba</h3>", unsafe_allow_html=True)
 
-# try:
-if "chatbot" not in st.session_state:
-    st.session_state.chatbot = CubaChatbot()
-    
-if not st.session_state.chatbot.vector_db.get_documents():
-    print("\nCargando datos iniciales...\n")
-    try:
-        st.session_state.chatbot.vector_db.reload_data()
-        if not st.session_state.chatbot.vector_db.get_documents():
-            st.error("Error: No se pudieron cargar los datos iniciales")
-            st.stop()
-    except Exception as e:
-        st.error(f"Error crítico: {str(e)}")
-        st.stop()
-
-detector = GapDetector(st.session_state.chatbot.vector_db)
-updater = DynamicCrawler()
-
-guide_agent = GuideAgent(st.session_state.chatbot.vector_db)
-planner_agent = TravelPlannerAgent(st.session_state.chatbot.vector_db)
-
-historic_agent = HistoricAgent("HistoricAgent", st.session_state.chatbot.vector_db)
-gastronomy_agent = GastronomyAgent("GastronomyAgent", st.session_state.chatbot.vector_db)
-lodging_agent = LodgingAgent("LodgingAgent", st.session_state.chatbot.vector_db)
-nightlife_agent = NightlifeAgent("NightlifeAgent", st.session_state.chatbot.vector_db)
-
-planner_agent.set_specialized_agents(
-    historic=historic_agent,
-    gastronomy=gastronomy_agent,
-    lodging=lodging_agent,
-    nightlife=nightlife_agent
-)
-
-retriever_agent = RetrieverAgent(st.session_state.chatbot.vector_db)
-generator_agent = GeneratorAgent(guide_agent, planner_agent)
-gap_detector_agent = GapDetectorAgent(detector)
-updater_agent = UpdaterAgent(updater)
+@st.cache_resource(show_spinner="Cargando GPTur...")
+def get_client():
+    """
+    Build the chat client once per process: the GPTur API when GPTUR_API_URL is set,
+    otherwise the service graph in-process. Reruns and sessions reuse it.
+    """
+    return create_chat_client()
 
-manager = AgentManager([
-    retriever_agent,
-    generator_agent,
-    gap_detector_agent,
-    updater_agent
-])
+try:
+    client = get_client()
+except Exception as e:
+    st.error(f"Error crítico: {str(e)}")
+    st.stop()
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "update_triggered" not in st.session_state:
-    st.session_state.update_triggered = False
+def load_session():
+    """
+    Get the messages of the browser session, starting a new one if it expired.
+    """
+    if "session_id" in st.session_state:
+        try:
+            return client.session(st.session_state.session_id)
+        except SessionNotFound:
+            pass
+    st.session_state.session_id = client.create_session()
+    return client.session(st.session_state.session_id)
+
+session = load_session()
+st.session_state.shown_messages = len(session["messages"])
+
+for msg in session["messages"]:
+    content = f"🔄 Información actualizada:\n\n{msg['content']}" if msg.get("follow_up") else msg["content"]
+    st.chat_message(msg["role"]).write(content)
+
+@st.fragment(run_every=3)
+def watch_follow_ups():
+    """
+    Rerun the page when a background update has delivered a follow-up message.
+    """
+    try:
+        current = client.session(st.session_state.session_id)
+    except SessionNotFound:
+        return
+    if current["pending_follow_ups"]:
+        st.caption("🔄 Buscando información actualizada...")
+    if len(current["messages"]) > st.session_state.shown_messages:
+        st.rerun()
 
-for msg in st.session_state.messages:   
-    st.chat_message(msg["role"]).write(msg["content"])
+watch_follow_ups()
 
 try:
     if prompt := st.chat_input("Pregunta sobre lugares turísticos"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
         st.chat_message("user").write(prompt)
 
-        retrieval_task = {"type": "retrieve", "query": prompt}
-        context = manager.dispatch(retrieval_task, {})
-
-        generate_task = {"type": "generate", "prompt": prompt}
-        response, intent = manager.dispatch(generate_task, context)
-        
-        detector_response = {}
-        
-        if intent == "PLANNING":
-            needs_update = False
-        else:
-            detect_task = {"type": "detect_gap", "prompt": prompt, "response": response}
-            detector_response = manager.dispatch(detect_task, context)
-            needs_update = detector_response["gap_detected"]
-        
-        print("Respuesta dada:", response)
-
-        if needs_update:
-            with st.status("🔄 Actualizando información...", expanded=True) as status:
-                sources, new_context = detector.identify_outdated_sources(prompt, detector_response["duckduckgo_links"])
-                update_task = {"type": "update_sources", "sources": sources}
-                manager.dispatch(update_task, context)
-                st.session_state.chatbot.vector_db.update_index()
-                
-                current_response = str(response) if not hasattr(response, 'choices') else " ".join([choice.message.content for choice in response.choices])
-                
-                enhanced_response = st.session_state.chatbot.mistral_client.chat(
-                    model="mistral-medium",
-                    messages=[
-                        {"role": "system", "content": "Eres un asistente turístico especializado en Cuba. Debes mejorar una respuesta previa incorporando nueva información, manteniendo el estilo y estructura de la respuesta original."},
-                        {"role": "user", "content": f"Pregunta original: {prompt}\n\nRespuesta actual: {current_response}\n\nNueva información para incorporar: {new_context}\n\nPor favor, mejora la respuesta anterior incorporando la nueva información pero manteniendo el mismo estilo y estructura."}
-                    ],
-                    temperature=0.7
-                )
-                
-                response = enhanced_response
-                status.update(label="✅ Actualización completada", state="complete")
-
-        if hasattr(response, "choices"):
-            response_text = " ".join([choice.message.content for choice in response.choices])
+        status = None
+        result = None
+        for event in client.stream(st.session_state.session_id, prompt):
+            if event["event"] == "updating":
+                status = st.status("🔄 Actualizando información...", expanded=True)
+            elif event["event"] in ("done", "error"):
+                result = event
+        if status is not None:
+            status.update(label="✅ Actualización completada", state="complete")
+
+        if result is None or result["event"] == "error":
+            message = result["detail"] if result else "Se interrumpió la consulta. Inténtalo de nuevo."
+            st.chat_message("assistant").write(message)
         else:
-            response_text = str(response)
-        
-        st.session_state.messages.append({"role": "assistant", "content": response_text})
-        human_typing(response_text, role="assistant", min_delay=0.03, max_delay=0.12)
+            human_typing(result["text"], role="assistant", min_delay=0.03, max_delay=0.12)
+        st.session_state.shown_messages = len(client.session(st.session_state.session_id)["messages"])
 
 except Exception as e:
     print(f"Error en la aplicación: {str(e)}")
-    st.rerun()
\ No newline at end of file
+    st.rerun()
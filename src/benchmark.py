@@ -0,0 +1,185 @@
+"""
+End-to-end latency and throughput benchmark of the chat pipeline.
+
+Runs the same turn pipeline as app.py over a list of questions and reports the
+latency of each of its stages. Combined with the replay backend it needs no network:
+
+    GPTUR_LLM_MODE=record python benchmark.py          # capture fixtures once
+    GPTUR_LLM_MODE=replay python benchmark.py -c 4     # offline, deterministic
+    GPTUR_LLM_MODE=replay python benchmark.py -c 4 --async
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from telemetry.metrics import MetricsRegistry
+
+DEFAULT_QUESTIONS = Path(__file__).parent / "experiments" / "final_evaluation" / "questions.csv"
+
+
+def load_questions(path, limit=None):
+    """
+    Load benchmark questions from a CSV file with a 'pregunta' column.
+
+    Args:
+        path (str | Path): CSV file
+        limit (int, optional): Maximum number of questions
+
+    Returns:
+        list: Questions
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        questions = [row["pregunta"] for row in csv.DictReader(f) if row.get("pregunta")]
+    return questions[:limit] if limit else questions
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Summarize turn latencies.
+
+    Args:
+        latencies (list): Successful turn latencies in seconds
+        errors (int): Number of failed turns
+        elapsed (float): Wall time of the whole run in seconds
+
+    Returns:
+        dict: Latency percentiles and throughput
+    """
+    summary = {
+        "turns": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(len(latencies) / elapsed, 3) if elapsed else 0.0
+    }
+    if latencies:
+        values = np.array(latencies)
+        summary.update({
+            "mean_s": round(float(values.mean()), 3),
+            "p50_s": round(float(np.percentile(values, 50)), 3),
+            "p95_s": round(float(np.percentile(values, 95)), 3),
+            "p99_s": round(float(np.percentile(values, 99)), 3),
+            "max_s": round(float(values.max()), 3)
+        })
+    return summary
+
+
+def run_benchmark(questions, concurrency=1, repeat=1):
+    """
+    Run every question through the pipeline and measure it.
+    All worker threads share one agent graph, as the app's sessions do.
+
+    Args:
+        questions (list): Questions to ask
+        concurrency (int, optional): Number of concurrent sessions. Defaults to 1
+        repeat (int, optional): Times the question list is replayed. Defaults to 1
+
+    Returns:
+        dict: Benchmark summary
+    """
+    from chatbot.core import CubaChatbot
+    from chatbot.pipeline import build_pipeline, run_turn
+
+    chatbot = CubaChatbot()
+    if not chatbot.vector_db.get_documents():
+        chatbot.vector_db.reload_data()
+
+    manager, detector = build_pipeline(chatbot.vector_db)
+
+    def timed_turn(prompt):
+        start = time.perf_counter()
+        try:
+            run_turn(manager, detector, chatbot, prompt)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    prompts = list(questions) * repeat
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="GPTur_Bench") as pool:
+        for latency, error in pool.map(timed_turn, prompts):
+            if error is None:
+                latencies.append(latency)
+            else:
+                errors += 1
+                print(f"Error en turno: {error}")
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def run_async_benchmark(questions, concurrency=1, repeat=1):
+    """
+    Run every question through the asynchronous pipeline on a single event loop.
+    All concurrent sessions share one agent graph, as the app's sessions do.
+
+    Args:
+        questions (list): Questions to ask
+        concurrency (int, optional): Number of concurrent sessions. Defaults to 1
+        repeat (int, optional): Times the question list is replayed. Defaults to 1
+
+    Returns:
+        dict: Benchmark summary
+    """
+    from chatbot.core import CubaChatbot
+    from chatbot.pipeline import build_pipeline, arun_turn
+
+    chatbot = CubaChatbot()
+    if not chatbot.vector_db.get_documents():
+        chatbot.vector_db.reload_data()
+
+    manager, detector = build_pipeline(chatbot.vector_db)
+    prompts = list(questions) * repeat
+    latencies, errors = [], 0
+
+    async def session(queue):
+        nonlocal errors
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            turn_start = time.perf_counter()
+            try:
+                await arun_turn(manager, detector, chatbot, prompt)
+                latencies.append(time.perf_counter() - turn_start)
+            except Exception as e:
+                errors += 1
+                print(f"Error en turno: {e}")
+
+    async def main():
+        queue = asyncio.Queue()
+        for prompt in prompts:
+            queue.put_nowait(prompt)
+        await asyncio.gather(*[session(queue) for _ in range(concurrency)])
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de GPTur")
+    parser.add_argument("-q", "--questions", default=str(DEFAULT_QUESTIONS))
+    parser.add_argument("-n", "--limit", type=int, default=None)
+    parser.add_argument("-c", "--concurrency", type=int, default=1)
+    parser.add_argument("-r", "--repeat", type=int, default=1)
+    parser.add_argument("-o", "--output", default=None)
+    parser.add_argument("--async", dest="use_async", action="store_true")
+    args = parser.parse_args()
+
+    runner = run_async_benchmark if args.use_async else run_benchmark
+    result = runner(
+        load_questions(args.questions, args.limit),
+        concurrency=args.concurrency,
+        repeat=args.repeat
+    )
+    from chatbot.pipeline import TURN_PIPELINE
+    metrics = MetricsRegistry()
+    result["stages"] = {
+        stage: metrics.summary(f"pipeline.{TURN_PIPELINE.name}.{stage}.seconds") for stage in TURN_PIPELINE.stages
+    }
+    result["metrics"] = metrics.snapshot()
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
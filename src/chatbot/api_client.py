@@ -0,0 +1,90 @@
+import json
+import os
+import urllib.error
+import urllib.request
+from .sessions import SessionNotFound
+
+# Base URL of a GPTur API server; when empty, clients run the pipeline in-process
+API_URL = os.getenv("GPTUR_API_URL", "")
+# Seconds a client waits for the API before giving up
+API_TIMEOUT = float(os.getenv("GPTUR_API_TIMEOUT", "180"))
+
+
+class HttpChatClient:
+    """
+    Client of the GPTur HTTP API with the same interface as ChatService, so the
+    Streamlit app can use either.
+    """
+
+    def __init__(self, base_url, timeout=API_TIMEOUT):
+        """
+        Initialize the client.
+
+        Args:
+            base_url (str): API base URL, e.g. "http://127.0.0.1:8000"
+            timeout (float, optional): Seconds to wait for a response. Defaults to API_TIMEOUT
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}", data=data, method=method,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise SessionNotFound(path) from e
+            raise
+
+    def _request(self, method, path, payload=None):
+        with self._open(method, path, payload) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def create_session(self):
+        return self._request("POST", "/sessions")["session_id"]
+
+    def session(self, session_id):
+        return self._request("GET", f"/sessions/{session_id}")
+
+    def stream(self, session_id, prompt):
+        """
+        Run a chat turn, yielding the events streamed by the API.
+
+        Args:
+            session_id (str): The session id
+            prompt (str): The user's message
+
+        Yields:
+            dict: The turn's events, as documented in ChatService
+        """
+        with self._open("POST", f"/sessions/{session_id}/messages", {"message": prompt, "stream": True}) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line.decode("utf-8"))
+
+    def plan(self, preferences):
+        return self._request("POST", "/plan", preferences)["itinerary"]
+
+
+def create_chat_client(api_url=API_URL):
+    """
+    Build the chat client of a UI: the HTTP API when api_url is set, otherwise an
+    in-process ChatService with sessions in GPTUR_SESSION_STORE.
+
+    Args:
+        api_url (str, optional): API base URL. Defaults to GPTUR_API_URL
+
+    Returns:
+        HttpChatClient | ChatService: The client
+    """
+    if api_url:
+        return HttpChatClient(api_url)
+    from .application import create_application
+    from .service import ChatService
+    from .sessions import create_session_store
+
+    return ChatService(create_application(), create_session_store())
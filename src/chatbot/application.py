@@ -0,0 +1,60 @@
+from agents.guide_agent import create_specialists
+from agents.recommendation_cache import RecommendationCache
+from vector_db.shared_index import INDEX_MODE
+from .core import CubaChatbot
+from .pipeline import build_pipeline
+
+
+class Application:
+    """
+    The shared service graph of the assistant: vector database, LLM client, agents and
+    gap detector. It is built once per process and used by every session; per-session
+    state (messages, follow-ups) lives with the session.
+    """
+
+    def __init__(self, chatbot, manager, detector, specialists):
+        """
+        Initialize the application.
+
+        Args:
+            chatbot (CubaChatbot): Holder of the vector database and the LLM client
+            manager (AgentManager): Manager dispatching the tasks
+            detector (GapDetector): Gap detector used to fetch new sources
+            specialists (dict): Specialized agents by specialization
+        """
+        self.chatbot = chatbot
+        self.manager = manager
+        self.detector = detector
+        self.specialists = specialists
+
+
+def create_application():
+    """
+    Build the application, loading the initial data if the vector database is empty.
+    In shared index mode the data is owned by index_writer.py, so the application
+    waits for its first generation instead. The recommendations of popular
+    destinations are warmed up in the background.
+
+    Returns:
+        Application: The service graph
+
+    Raises:
+        RuntimeError: If the initial data could not be loaded, or no generation was
+            published in time in shared mode
+    """
+    chatbot = CubaChatbot()
+    if INDEX_MODE == "shared":
+        if not chatbot.vector_db.wait_for_generation() or not chatbot.vector_db.count():
+            raise RuntimeError("No hay ninguna generación del índice publicada; arranca index_writer.py")
+    elif not chatbot.vector_db.count():
+        print("\nCargando datos iniciales...\n")
+        chatbot.vector_db.reload_data()
+        if not chatbot.vector_db.count():
+            raise RuntimeError("No se pudieron cargar los datos iniciales")
+
+    specialists = create_specialists(chatbot.vector_db)
+    manager, detector = build_pipeline(chatbot.vector_db, specialists)
+    RecommendationCache().warm_up(
+        [specialists["gastronomy"], specialists["nightlife"], specialists["lodging"]]
+    )
+    return Application(chatbot, manager, detector, specialists)
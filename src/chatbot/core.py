@@ -1,7 +1,9 @@
-from mistralai.client import MistralClient
+from llm.client import get_llm_client
 from vector_db.chroma_storage import VectorStorage
+from vector_db.shared_index import INDEX_MODE, SharedVectorStorage
 
 class CubaChatbot:
     def __init__(self):
-        self.vector_db = VectorStorage()
-        self.mistral_client = MistralClient(api_key="XEV0fCx3MqiG9HqVkGc4Hy5qyD3WwPHr")
\ No newline at end of file
+        # Shared-mode workers read the published generations and never open the Chroma store
+        self.vector_db = SharedVectorStorage() if INDEX_MODE == "shared" else VectorStorage()
+        self.mistral_client = get_llm_client()
\ No newline at end of file
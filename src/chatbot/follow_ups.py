@@ -0,0 +1,173 @@
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from threading import Lock
+from llm.accounting import turn_accounting
+from runtime.event_loop import get_event_loop
+from runtime.executor import ServiceBusyError, background_priority, get_executor_service
+from telemetry.metrics import MetricsRegistry
+from .pipeline import aenrich_turn, response_to_text
+
+# "background" delivers enriched answers as follow-up messages; "blocking" waits for them
+GAP_MODE = os.getenv("GPTUR_GAP_MODE", "background")
+# Seconds during which a topic already checked for gaps is not checked again
+GAP_TOPIC_TTL = float(os.getenv("GPTUR_GAP_TOPIC_TTL", "3600"))
+
+
+def topic_key(prompt):
+    """
+    Reduce a prompt to the topic used to dedupe gap detection.
+    Accents, punctuation, word order and short words are ignored.
+
+    Args:
+        prompt (str): The user's message
+
+    Returns:
+        str: The topic key
+    """
+    text = unicodedata.normalize("NFKD", prompt.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = {word for word in re.findall(r"\w+", text) if len(word) > 3}
+    return " ".join(sorted(words))
+
+
+class GapTopics:
+    """
+    Topics whose gaps are being chased or were chased recently, shared by all sessions.
+    """
+
+    def __init__(self, ttl=GAP_TOPIC_TTL):
+        self.ttl = ttl
+        self._claimed = {}
+        self._lock = Lock()
+
+    def claim(self, topic):
+        """
+        Claim a topic for gap detection.
+
+        Args:
+            topic (str): Topic key
+
+        Returns:
+            bool: True if the topic was free, False if it was checked within the TTL
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._claimed = {t: at for t, at in self._claimed.items() if now - at < self.ttl}
+            if topic in self._claimed:
+                return False
+            self._claimed[topic] = now
+            return True
+
+
+gap_topics = GapTopics()
+
+
+class FollowUpService:
+    """
+    Runs gap detection and source updating for a session after its answer has been
+    delivered. Enriched answers are queued as follow-up messages for the session, or
+    handed to a deliver callback, e.g. one writing them to a session store.
+    """
+
+    def __init__(self, topics=None, deliver=None, on_finished=None):
+        """
+        Initialize the service.
+
+        Args:
+            topics (GapTopics, optional): Topic registry. Defaults to the process-wide one
+            deliver (callable, optional): Receives each enriched answer's text instead of pop()
+            on_finished (callable, optional): Called without arguments when a job ends,
+                whether or not it produced an answer
+        """
+        self.topics = topics or gap_topics
+        self.deliver = deliver
+        self.on_finished = on_finished
+        self.metrics = MetricsRegistry()
+        self._pending = []
+        self._running = 0
+        self._lock = Lock()
+
+    def submit(self, manager, detector, chatbot, prompt, turn):
+        """
+        Schedule gap detection for a delivered turn on the shared event loop.
+
+        Args:
+            manager (AgentManager): Manager dispatching the tasks
+            detector (GapDetector): Gap detector used to fetch new sources
+            chatbot (CubaChatbot): Holder of the vector database and the LLM client
+            prompt (str): The user's message
+            turn (dict): Result of agenerate_turn
+
+        Returns:
+            bool: True if a job was scheduled, False if the topic was recently checked
+        """
+        if turn["intent"] == "PLANNING":
+            return False
+        if not self.topics.claim(topic_key(prompt)):
+            self.metrics.increment("follow_up.deduped")
+            return False
+        with self._lock:
+            self._running += 1
+        asyncio.run_coroutine_threadsafe(
+            self._run(manager, detector, chatbot, prompt, turn), get_event_loop()
+        )
+        return True
+
+    async def _run(self, manager, detector, chatbot, prompt, turn):
+        try:
+            with background_priority(), turn_accounting(f"{prompt[:40]} (seguimiento)"):
+                get_executor_service().admit()
+                detect_task = {"type": "detect_gap", "prompt": prompt, "response": turn["response"]}
+                gap = await manager.adispatch(detect_task, turn["context"])
+                if not gap["gap_detected"]:
+                    return
+                self.metrics.increment("follow_up.gaps")
+                response = await aenrich_turn(manager, detector, chatbot, prompt, {**turn, "gap": gap})
+            if self.deliver is not None:
+                self.deliver(response_to_text(response))
+            else:
+                with self._lock:
+                    self._pending.append(response_to_text(response))
+        except ServiceBusyError:
+            self.metrics.increment("follow_up.shed")
+        except Exception as e:
+            print(f"Error en la actualización en segundo plano: {str(e)}")
+        finally:
+            with self._lock:
+                self._running -= 1
+            if self.on_finished is not None:
+                self.on_finished()
+
+    def busy(self):
+        """
+        Check whether the session has follow-ups running or waiting to be shown.
+
+        Returns:
+            bool: True if a job is running or a message is pending
+        """
+        with self._lock:
+            return self._running > 0 or bool(self._pending)
+
+    def ready(self):
+        """
+        Check whether follow-up messages are waiting to be shown.
+
+        Returns:
+            bool: True if pop would return messages
+        """
+        with self._lock:
+            return bool(self._pending)
+
+    def pop(self):
+        """
+        Take the follow-up messages that are ready.
+
+        Returns:
+            list: Enriched answers, oldest first
+        """
+        with self._lock:
+            ready, self._pending = self._pending, []
+        return ready
@@ -1,18 +1,16 @@
-from mistralai.client import MistralClient
 from mistralai.models.chat_completion import ChatMessage
-from langchain_community.retrievers import BM25Retriever
 import json
 import os
 from datetime import datetime
 import requests
 from bs4 import BeautifulSoup
 from vector_db.chroma_storage import VectorStorage
+from llm.client import get_llm_client
 
 class GapDetector:
     def __init__(self, vector_db: VectorStorage):
         self.vector_db = vector_db
-        self.bm25_retriever = BM25Retriever.from_documents(self.vector_db.get_documents())
-        self.client = MistralClient(api_key="XEV0fCx3MqiG9HqVkGc4Hy5qyD3WwPHr")
+        self.client = get_llm_client()
         self.base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
     def _load_json_file(self, filepath):
@@ -107,7 +105,7 @@ class GapDetector:
 
         try:
             api_response = self.client.chat(
-                model="mistral-small",
+                task="check_accuracy",
                 messages=messages,
                 temperature=0.0 
             )
@@ -140,7 +138,7 @@ class GapDetector:
             messages = [ChatMessage(role="user", content=city_prompt)]
             try:
                 api_response = self.client.chat(
-                    model="mistral-small",
+                    task="extract_city",
                     messages=messages,
                     temperature=0.0
                 )
@@ -0,0 +1,332 @@
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from chatbot.gap_detector import GapDetector
+from crawlers.dynamic_crawler import DynamicCrawler
+from agents.retriever_agent import RetrieverAgent
+from agents.generator_agent import GeneratorAgent
+from agents.gap_detector_agent import GapDetectorAgent
+from agents.updater_agent import UpdaterAgent
+from agents.agent_manager import AgentManager
+from agents.middleware import (
+    CacheMiddleware, ConcurrencyLimitMiddleware, RetryMiddleware, TimeoutMiddleware, TimingMiddleware
+)
+from agents.guide_agent import GuideAgent, create_specialists
+from agents.planner_agent import TravelPlannerAgent
+from agents.speculation import Speculation
+from llm.accounting import turn_accounting
+from llm.hedging import hedge_budget
+from runtime.cancellation import cancellation_scope
+from runtime.dag import Pipeline, Stage
+from runtime.event_loop import run_coroutine
+from runtime.executor import get_executor_service
+
+# Duplicate LLM requests a single turn may send to cut tail latency
+TURN_HEDGE_BUDGET = int(os.getenv("GPTUR_LLM_HEDGE_BUDGET", "1"))
+# Seconds after which every retrieval and LLM call still pending for a turn is aborted
+TURN_DEADLINE = float(os.getenv("GPTUR_TURN_DEADLINE", "120"))
+# Seconds a retrieval result is reused for the same query, within one index version
+RETRIEVAL_CACHE_TTL = float(os.getenv("GPTUR_RETRIEVAL_CACHE_TTL", "300"))
+# Seconds a gap detection may take before it is abandoned
+DETECT_GAP_TIMEOUT = float(os.getenv("GPTUR_DETECT_GAP_TIMEOUT", "45"))
+# Source updates allowed to crawl and write to the index at the same time
+UPDATE_CONCURRENCY = int(os.getenv("GPTUR_UPDATE_CONCURRENCY", "1"))
+# Seconds an intent classification is reused for the same prompt
+INTENT_MEMO_TTL = float(os.getenv("GPTUR_INTENT_MEMO_TTL", "600"))
+
+
+def build_pipeline(vector_db, specialists=None):
+    """
+    Build the agent graph that serves a chat turn.
+
+    Args:
+        vector_db (VectorStorage): The shared vector database
+        specialists (dict, optional): Specialized agents by specialization. Defaults to a new set
+
+    Returns:
+        tuple: (AgentManager, GapDetector)
+    """
+    detector = GapDetector(vector_db)
+    updater = DynamicCrawler()
+
+    specialists = specialists or create_specialists(vector_db)
+    guide_agent = GuideAgent(vector_db, specialists)
+    planner_agent = TravelPlannerAgent(vector_db)
+    planner_agent.set_specialized_agents(**specialists)
+
+    manager = AgentManager([
+        RetrieverAgent(vector_db),
+        GeneratorAgent(guide_agent, planner_agent),
+        GapDetectorAgent(detector),
+        UpdaterAgent(updater)
+    ], middleware=[TimingMiddleware()])
+    manager.use(CacheMiddleware(RETRIEVAL_CACHE_TTL, version=lambda: vector_db.index_version), "retrieve")
+    manager.use(TimeoutMiddleware(DETECT_GAP_TIMEOUT), "detect_gap")
+    manager.use(RetryMiddleware(attempts=2), "detect_gap", "update_sources")
+    manager.use(ConcurrencyLimitMiddleware(UPDATE_CONCURRENCY), "update_sources")
+    return manager, detector
+
+
+def response_to_text(response):
+    """
+    Convert an agent or LLM response into plain text.
+
+    Args:
+        response: A string or a chat completion response
+
+    Returns:
+        str: The response text
+    """
+    if hasattr(response, "choices"):
+        return " ".join([choice.message.content for choice in response.choices])
+    return str(response)
+
+
+def _enhancement_request(prompt, current_response, new_context):
+    """
+    Build the chat request that enriches a response with newly crawled information.
+
+    Args:
+        prompt (str): The user's message
+        current_response (str): The response given so far
+        new_context: Information gathered from the new sources
+
+    Returns:
+        dict: Keyword arguments for client.chat / client.achat
+    """
+    return {
+        "task": "enhance_response",
+        "messages": [
+            {"role": "system", "content": "Eres un asistente turístico especializado en Cuba. Debes mejorar una respuesta previa incorporando nueva información, manteniendo el estilo y estructura de la respuesta original."},
+            {"role": "user", "content": f"Pregunta original: {prompt}\n\nRespuesta actual: {current_response}\n\nNueva información para incorporar: {new_context}\n\nPor favor, mejora la respuesta anterior incorporando la nueva información pero manteniendo el mismo estilo y estructura."}
+        ],
+        "temperature": 0.7,
+        "hedge": True
+    }
+
+
+async def _retrieve(manager, prompt):
+    return await manager.adispatch({"type": "retrieve", "query": prompt}, {})
+
+
+async def _classify_intent(manager, prompt):
+    return await manager.adispatch({"type": "classify_intent", "prompt": prompt})
+
+
+async def _prepare(manager, prompt):
+    # Returns at once: generation commits the running preparation on INFO and discards it on PLANNING
+    return Speculation(
+        "guide_preparation",
+        asyncio.create_task(manager.adispatch({"type": "prepare", "prompt": prompt}))
+    )
+
+
+async def _generate(manager, prompt, context, intent, preparation):
+    if intent == "PLANNING":
+        preparation.discard()
+        preparation = None
+    else:
+        try:
+            preparation = await preparation.acommit(time.perf_counter())
+        except Exception as e:
+            print(f"Error en la preparación especulativa: {str(e)}")
+            preparation = None
+    generate_task = {"type": "generate", "prompt": prompt, "intent": intent, "preparation": preparation}
+    response, _ = await manager.adispatch(generate_task, context)
+    print("Respuesta dada:", response)
+    return response
+
+
+async def _detect_gap(manager, prompt, response, context):
+    detect_task = {"type": "detect_gap", "prompt": prompt, "response": response}
+    return await manager.adispatch(detect_task, context)
+
+
+async def _enrich(manager, detector, chatbot, prompt, response, context, gap):
+    executor = get_executor_service()
+    sources, new_context = await executor.run_io(
+        detector.identify_outdated_sources, prompt, gap["duckduckgo_links"]
+    )
+    update_task = {"type": "update_sources", "sources": sources}
+    await manager.adispatch(update_task, context)
+    await executor.run_cpu(chatbot.vector_db.update_index)
+
+    return await chatbot.mistral_client.achat(
+        **_enhancement_request(prompt, response_to_text(response), new_context)
+    )
+
+
+# The chat turn. Retrieval, intent classification and the guide's preparation only
+# depend on the prompt and run concurrently. The preparation is speculative: the
+# prepare stage only starts it, and generation awaits it on INFO or cancels it on PLANNING.
+TURN_PIPELINE = Pipeline("turn", [
+    Stage("retrieve", _retrieve, inputs=("manager", "prompt"), outputs=("context",)),
+    Stage(
+        "classify_intent", _classify_intent, inputs=("manager", "prompt"), outputs=("intent",),
+        memo_key=lambda inputs: inputs["prompt"], memo_ttl=INTENT_MEMO_TTL
+    ),
+    Stage("prepare", _prepare, inputs=("manager", "prompt"), outputs=("preparation",)),
+    Stage(
+        "generate", _generate,
+        inputs=("manager", "prompt", "context", "intent", "preparation"), outputs=("response",)
+    ),
+    Stage(
+        "detect_gap", _detect_gap,
+        inputs=("manager", "prompt", "response", "context", "intent", "detect_gaps"), outputs=("gap",),
+        when=lambda inputs: inputs["detect_gaps"] and inputs["intent"] != "PLANNING",
+        default={"gap_detected": False}
+    ),
+    Stage(
+        "enrich", _enrich,
+        inputs=("manager", "detector", "chatbot", "prompt", "response", "context", "gap"),
+        outputs=("enriched_response",),
+        when=lambda inputs: inputs["gap"]["gap_detected"]
+    )
+])
+
+
+async def agenerate_turn(manager, prompt, detect_gaps=True, on_stage=None):
+    """
+    Asynchronous critical path of a turn: retrieval, generation and gap detection.
+    Retrieval, intent classification and the guide's speculative preparation run concurrently.
+
+    Args:
+        manager (AgentManager): Manager dispatching the tasks
+        prompt (str): The user's message
+        detect_gaps (bool, optional): Run gap detection on the critical path. Defaults to True
+        on_stage (callable, optional): Called with the name, status and seconds of each finished stage
+
+    Returns:
+        dict: context, response, intent, gap detection result, LLM call summary and
+            per-stage timings of the turn
+
+    Raises:
+        ServiceBusyError: If the worker pools are saturated
+        OperationCancelled: If the turn runs past TURN_DEADLINE
+    """
+    get_executor_service().admit()
+    with (
+        cancellation_scope(timeout=TURN_DEADLINE) as token,
+        hedge_budget(TURN_HEDGE_BUDGET),
+        turn_accounting(prompt[:40]) as ledger
+    ):
+        try:
+            result = await TURN_PIPELINE.run(
+                {"manager": manager, "prompt": prompt, "detect_gaps": detect_gaps},
+                targets=("context", "response", "intent", "gap"),
+                on_stage=on_stage
+            )
+        except BaseException:
+            # Stops the work the failed turn left running, such as a speculative preparation
+            token.cancel("turn_failed")
+            raise
+
+    return {
+        "context": result["context"],
+        "response": result["response"],
+        "intent": result["intent"],
+        "gap": result["gap"],
+        "llm_calls": ledger.summary(),
+        "timings": result.breakdown()
+    }
+
+
+async def aenrich_turn(manager, detector, chatbot, prompt, turn):
+    """
+    Update the sources behind a detected gap and enrich the turn's response.
+
+    Args:
+        manager (AgentManager): Manager dispatching the tasks
+        detector (GapDetector): Gap detector used to fetch new sources
+        chatbot (CubaChatbot): Holder of the vector database and the LLM client
+        prompt (str): The user's message
+        turn (dict): Result of agenerate_turn
+
+    Returns:
+        The enriched response
+    """
+    with (
+        cancellation_scope(timeout=TURN_DEADLINE),
+        hedge_budget(TURN_HEDGE_BUDGET),
+        turn_accounting(f"{prompt[:40]} (actualización)")
+    ):
+        values = {key: turn[key] for key in ("context", "response", "intent", "gap")}
+        result = await TURN_PIPELINE.run(
+            {**values, "manager": manager, "detector": detector, "chatbot": chatbot, "prompt": prompt},
+            targets=("enriched_response",)
+        )
+        return result["enriched_response"]
+
+
+async def aplan_trip(manager, preferences):
+    """
+    Plan an itinerary from explicit preferences, without classifying a message.
+
+    Args:
+        manager (AgentManager): Manager dispatching the tasks
+        preferences (dict): destino, dias, presupuesto and intereses
+
+    Returns:
+        str: The formatted itinerary
+
+    Raises:
+        ServiceBusyError: If the worker pools are saturated
+        OperationCancelled: If planning runs past TURN_DEADLINE
+    """
+    get_executor_service().admit()
+    with (
+        cancellation_scope(timeout=TURN_DEADLINE),
+        hedge_budget(TURN_HEDGE_BUDGET),
+        turn_accounting(f"plan {preferences.get('destino', 'Cuba')}")
+    ):
+        return response_to_text(await manager.adispatch({"type": "plan", "preferences": preferences}))
+
+
+async def arun_turn(manager, detector, chatbot, prompt):
+    """
+    Run a full chat turn: retrieve, generate, detect gaps and update if needed.
+
+    Args:
+        manager (AgentManager): Manager dispatching the tasks
+        detector (GapDetector): Gap detector used to fetch new sources
+        chatbot (CubaChatbot): Holder of the vector database and the LLM client
+        prompt (str): The user's message
+
+    Returns:
+        str: The final response text
+    """
+    turn = await agenerate_turn(manager, prompt)
+    response = turn["response"]
+    if turn["gap"]["gap_detected"]:
+        response = await aenrich_turn(manager, detector, chatbot, prompt, turn)
+    return response_to_text(response)
+
+
+def run_turn(manager, detector, chatbot, prompt, update_status=None):
+    """
+    Synchronous variant of arun_turn; the turn runs on the shared event loop.
+
+    Args:
+        manager (AgentManager): Manager dispatching the tasks
+        detector (GapDetector): Gap detector used to fetch new sources
+        chatbot (CubaChatbot): Holder of the vector database and the LLM client
+        prompt (str): The user's message
+        update_status (callable, optional): Returns a context manager shown while
+            sources are updated; it may expose ``update(label=..., state=...)``
+
+    Returns:
+        str: The final response text
+
+    Raises:
+        ServiceBusyError: If the worker pools are saturated
+        OperationCancelled: If the turn runs past TURN_DEADLINE
+    """
+    turn = run_coroutine(agenerate_turn(manager, prompt))
+    response = turn["response"]
+    if turn["gap"]["gap_detected"]:
+        with (update_status() if update_status else nullcontext()) as status:
+            response = run_coroutine(aenrich_turn(manager, detector, chatbot, prompt, turn))
+            if status is not None:
+                status.update(label="✅ Actualización completada", state="complete")
+    return response_to_text(response)
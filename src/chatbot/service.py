@@ -0,0 +1,215 @@
+import asyncio
+import queue
+from runtime.cancellation import OperationCancelled
+from runtime.event_loop import arun_coroutine, get_event_loop, run_coroutine
+from runtime.executor import BUSY_MESSAGE, ServiceBusyError, get_executor_service
+from .follow_ups import FollowUpService, GAP_MODE
+from .pipeline import aenrich_turn, agenerate_turn, aplan_trip, response_to_text
+from .sessions import SessionNotFound
+
+TIMEOUT_MESSAGE = "La consulta tardó demasiado y se canceló. Prueba a reformularla o inténtalo de nuevo."
+ERROR_MESSAGE = "Se produjo un error al procesar la consulta. Inténtalo de nuevo."
+
+
+class ChatService:
+    """
+    Chat sessions over the shared service graph, independent of any UI. The HTTP API
+    and the in-process Streamlit client both go through it.
+
+    A turn runs on the shared event loop and reports its progress as events:
+
+        {"event": "stage", "stage": ..., "status": ..., "seconds": ...}   a pipeline stage finished
+        {"event": "response", "text": ..., "intent": ...}                  the answer is ready
+        {"event": "updating"}                                              sources are being updated
+        {"event": "updated", "text": ...}                                  the answer was enriched
+        {"event": "done", "text": ..., "intent": ..., "timings": ..., "follow_up": ...}
+        {"event": "error", "status": ..., "detail": ...}
+
+    Every turn ends with exactly one "done" or "error" event.
+    """
+
+    def __init__(self, application, store):
+        """
+        Initialize the service.
+
+        Args:
+            application (Application): The shared service graph
+            store (MemorySessionStore | RedisSessionStore): Where sessions are kept
+        """
+        self.application = application
+        self.store = store
+
+    def create_session(self):
+        """
+        Create a chat session.
+
+        Returns:
+            str: The session id
+        """
+        return self.store.create()
+
+    def session(self, session_id):
+        """
+        Get a session's messages and number of follow-ups still running.
+
+        Args:
+            session_id (str): The session id
+
+        Returns:
+            dict: messages and pending_follow_ups
+
+        Raises:
+            SessionNotFound: If the session does not exist or has expired
+        """
+        return self.store.get(session_id)
+
+    def _deliver_follow_up(self, session_id, text):
+        self.store.append(session_id, {"role": "assistant", "content": text, "follow_up": True})
+
+    def _schedule_follow_up(self, session_id, prompt, turn):
+        """
+        Chase the turn's gaps in the background, delivering the enriched answer to the session.
+
+        Returns:
+            bool: True if a follow-up was scheduled
+        """
+        application = self.application
+        self.store.add_pending(session_id, 1)
+        follow_ups = FollowUpService(
+            deliver=lambda text: self._deliver_follow_up(session_id, text),
+            on_finished=lambda: self.store.add_pending(session_id, -1)
+        )
+        if follow_ups.submit(application.manager, application.detector, application.chatbot, prompt, turn):
+            return True
+        self.store.add_pending(session_id, -1)
+        return False
+
+    async def _turn(self, session_id, prompt, emit):
+        """
+        Run a chat turn for a session on the shared event loop.
+
+        Args:
+            session_id (str): The session id
+            prompt (str): The user's message
+            emit (callable): Receives each event; must be safe to call from the loop's thread
+
+        Returns:
+            dict: The final "done" or "error" event
+        """
+        application = self.application
+        executor = get_executor_service()
+        try:
+            await executor.run_io(self.store.append, session_id, {"role": "user", "content": prompt})
+            blocking = GAP_MODE == "blocking"
+            turn = await agenerate_turn(
+                application.manager, prompt, detect_gaps=blocking,
+                on_stage=lambda stage, status, seconds: emit(
+                    {"event": "stage", "stage": stage, "status": status, "seconds": round(seconds, 4)}
+                )
+            )
+            text = response_to_text(turn["response"])
+            emit({"event": "response", "text": text, "intent": turn["intent"]})
+
+            if blocking and turn["gap"]["gap_detected"]:
+                emit({"event": "updating"})
+                text = response_to_text(
+                    await aenrich_turn(application.manager, application.detector, application.chatbot, prompt, turn)
+                )
+                emit({"event": "updated", "text": text})
+
+            await executor.run_io(self.store.append, session_id, {"role": "assistant", "content": text})
+            follow_up = False
+            if not blocking:
+                follow_up = await executor.run_io(self._schedule_follow_up, session_id, prompt, turn)
+            result = {
+                "event": "done",
+                "text": text,
+                "intent": turn["intent"],
+                "timings": turn["timings"],
+                "follow_up": follow_up
+            }
+        except SessionNotFound:
+            result = {"event": "error", "status": 404, "detail": "Sesión no encontrada"}
+        except ServiceBusyError:
+            result = {"event": "error", "status": 503, "detail": BUSY_MESSAGE}
+        except OperationCancelled:
+            result = {"event": "error", "status": 504, "detail": TIMEOUT_MESSAGE}
+        except Exception as e:
+            print(f"Error en el turno de la sesión {session_id}: {str(e)}")
+            result = {"event": "error", "status": 500, "detail": ERROR_MESSAGE}
+        if result["event"] == "error" and result["status"] in (503, 504):
+            try:
+                await executor.run_io(self.store.append, session_id, {"role": "assistant", "content": result["detail"]})
+            except Exception as e:
+                print(f"Error guardando el mensaje de la sesión {session_id}: {str(e)}")
+        emit(result)
+        return result
+
+    def stream(self, session_id, prompt):
+        """
+        Run a chat turn, yielding its events as they happen. For synchronous callers
+        such as the Streamlit script; abandoning the iterator cancels the turn.
+
+        Args:
+            session_id (str): The session id
+            prompt (str): The user's message
+
+        Yields:
+            dict: The turn's events
+        """
+        events = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._turn(session_id, prompt, events.put), get_event_loop())
+        future.add_done_callback(lambda _: events.put(None))
+        try:
+            while (event := events.get()) is not None:
+                yield event
+        finally:
+            future.cancel()
+
+    async def astream(self, session_id, prompt):
+        """
+        Asynchronous variant of stream, for callers on another event loop such as the
+        HTTP server's.
+
+        Args:
+            session_id (str): The session id
+            prompt (str): The user's message
+
+        Yields:
+            dict: The turn's events
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def put(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        future = asyncio.run_coroutine_threadsafe(self._turn(session_id, prompt, put), get_event_loop())
+        future.add_done_callback(lambda _: put(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            future.cancel()
+
+    def plan(self, preferences):
+        """
+        Plan an itinerary from explicit preferences.
+
+        Args:
+            preferences (dict): destino, dias, presupuesto and intereses
+
+        Returns:
+            str: The formatted itinerary
+
+        Raises:
+            ServiceBusyError: If the worker pools are saturated
+            OperationCancelled: If planning takes too long
+        """
+        return run_coroutine(aplan_trip(self.application.manager, preferences))
+
+    async def aplan(self, preferences):
+        """
+        Asynchronous variant of plan, for callers on another event loop.
+        """
+        return await arun_coroutine(aplan_trip(self.application.manager, preferences))
@@ -0,0 +1,175 @@
+import json
+import os
+import time
+import uuid
+from threading import Lock
+
+# "memory" keeps sessions in this process; "redis://host:port/db" shares them between instances
+SESSION_STORE_URL = os.getenv("GPTUR_SESSION_STORE", "memory")
+# Seconds of inactivity after which a session is forgotten
+SESSION_TTL = float(os.getenv("GPTUR_SESSION_TTL", "86400"))
+# Messages kept per session, oldest dropped first
+SESSION_MAX_MESSAGES = int(os.getenv("GPTUR_SESSION_MAX_MESSAGES", "200"))
+
+
+class SessionNotFound(KeyError):
+    """
+    Raised when a session does not exist or has expired.
+    """
+
+
+class MemorySessionStore:
+    """
+    Sessions of this process only. Suitable for a single instance and for the
+    Streamlit app running the pipeline in-process.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_messages=SESSION_MAX_MESSAGES):
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._sessions = {}
+        self._lock = Lock()
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None or time.monotonic() - session["touched_at"] > self.ttl:
+            self._sessions.pop(session_id, None)
+            raise SessionNotFound(session_id)
+        session["touched_at"] = time.monotonic()
+        return session
+
+    def create(self):
+        """
+        Create an empty session.
+
+        Returns:
+            str: The new session id
+        """
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            now = time.monotonic()
+            self._sessions = {k: s for k, s in self._sessions.items() if now - s["touched_at"] <= self.ttl}
+            self._sessions[session_id] = {"messages": [], "pending_follow_ups": 0, "touched_at": now}
+        return session_id
+
+    def get(self, session_id):
+        """
+        Get a session.
+
+        Args:
+            session_id (str): The session id
+
+        Returns:
+            dict: messages, oldest first, and number of pending_follow_ups
+
+        Raises:
+            SessionNotFound: If the session does not exist or has expired
+        """
+        with self._lock:
+            session = self._session(session_id)
+            return {"messages": list(session["messages"]), "pending_follow_ups": session["pending_follow_ups"]}
+
+    def append(self, session_id, message):
+        """
+        Add a message to a session.
+
+        Args:
+            session_id (str): The session id
+            message (dict): role and content, and follow_up for enriched answers
+
+        Raises:
+            SessionNotFound: If the session does not exist or has expired
+        """
+        with self._lock:
+            messages = self._session(session_id)["messages"]
+            messages.append(message)
+            del messages[:-self.max_messages]
+
+    def add_pending(self, session_id, delta):
+        """
+        Count follow-ups scheduled (delta=1) or finished (delta=-1) for a session.
+
+        Args:
+            session_id (str): The session id
+            delta (int): Change in the number of pending follow-ups
+        """
+        with self._lock:
+            try:
+                session = self._session(session_id)
+            except SessionNotFound:
+                return
+            session["pending_follow_ups"] = max(0, session["pending_follow_ups"] + delta)
+
+
+class RedisSessionStore:
+    """
+    Sessions kept in Redis, shared by every instance behind a load balancer.
+    Each session is a list of JSON messages and a pending follow-up counter,
+    both expiring after SESSION_TTL seconds of inactivity.
+    """
+
+    def __init__(self, url, ttl=SESSION_TTL, max_messages=SESSION_MAX_MESSAGES):
+        """
+        Initialize the store.
+
+        Args:
+            url (str): Redis URL, e.g. "redis://localhost:6379/0"
+            ttl (float, optional): Seconds of inactivity before a session expires
+            max_messages (int, optional): Messages kept per session
+        """
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = int(ttl)
+        self.max_messages = max_messages
+
+    def _keys(self, session_id):
+        return f"gptur:session:{session_id}", f"gptur:session:{session_id}:pending"
+
+    def create(self):
+        session_id = uuid.uuid4().hex
+        self.redis.set(self._keys(session_id)[1], 0, ex=self.ttl)
+        return session_id
+
+    def get(self, session_id):
+        key, pending = self._keys(session_id)
+        with self.redis.pipeline() as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.get(pending)
+            pipe.expire(key, self.ttl)
+            pipe.expire(pending, self.ttl)
+            messages, count, _, _ = pipe.execute()
+        if count is None:
+            raise SessionNotFound(session_id)
+        return {"messages": [json.loads(message) for message in messages], "pending_follow_ups": max(0, int(count))}
+
+    def append(self, session_id, message):
+        key, pending = self._keys(session_id)
+        if not self.redis.exists(pending):
+            raise SessionNotFound(session_id)
+        with self.redis.pipeline() as pipe:
+            pipe.rpush(key, json.dumps(message, ensure_ascii=False))
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(pending, self.ttl)
+            pipe.execute()
+
+    def add_pending(self, session_id, delta):
+        pending = self._keys(session_id)[1]
+        if self.redis.exists(pending):
+            self.redis.incrby(pending, delta)
+
+
+def create_session_store(url=SESSION_STORE_URL):
+    """
+    Build the session store named by a URL.
+
+    Args:
+        url (str, optional): "memory" or a redis:// URL. Defaults to GPTUR_SESSION_STORE
+
+    Returns:
+        MemorySessionStore | RedisSessionStore: The store
+    """
+    if url.startswith(("redis://", "rediss://")):
+        return RedisSessionStore(url)
+    return MemorySessionStore()
@@ -0,0 +1,83 @@
+"""
+Single writer of the vector index for multi-process deployments.
+
+Owns the Chroma store: it is the only process running update_index / reload_data,
+and after every change it publishes a new generation of memory-mapped artifacts
+(embeddings, texts and metadata) read by the request workers started
+with GPTUR_INDEX_MODE=shared:
+
+    python index_writer.py                # publish if needed, then serve update requests
+    python index_writer.py --reload       # rebuild from normalized_data.json first
+    python index_writer.py --once         # publish and exit
+"""
+import argparse
+import time
+import numpy as np
+from telemetry.metrics import MetricsRegistry
+from vector_db.chroma_storage import VectorStorage
+from vector_db.shared_index import INDEX_DIR, current_version, publish_generation, take_requests
+
+
+def export_generation(vector_db):
+    """
+    Publish the contents of the Chroma store as a new generation.
+
+    Args:
+        vector_db (VectorStorage): The writer's vector database
+
+    Returns:
+        int: The published version
+    """
+    start = time.perf_counter()
+    collection = vector_db.client.get_collection(vector_db.collection_name)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    keep = [i for i, doc_id in enumerate(data["ids"]) if doc_id != "dummy_id"]
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+    version = publish_generation(
+        embeddings,
+        [data["documents"][i] or "" for i in keep],
+        [data["metadatas"][i] or {} for i in keep],
+        last_update=vector_db.last_update or time.time()
+    )
+    MetricsRegistry().observe("index_writer.publish_seconds", time.perf_counter() - start)
+    print(f"Generación {version} publicada con {len(keep)} documentos en {time.perf_counter() - start:.1f}s")
+    return version
+
+
+def serve(vector_db, interval):
+    """
+    Apply the changes requested by the workers and publish the result, until interrupted.
+
+    Args:
+        vector_db (VectorStorage): The writer's vector database
+        interval (float): Seconds between checks for requests
+    """
+    print(f"Escritor del índice atendiendo peticiones en {INDEX_DIR}")
+    while True:
+        requests = take_requests()
+        if requests:
+            try:
+                if "reload" in requests:
+                    vector_db.reload_data()
+                else:
+                    vector_db.update_index()
+                export_generation(vector_db)
+            except Exception as e:
+                print(f"Error actualizando el índice: {str(e)}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escritor del índice compartido de GPTur")
+    parser.add_argument("--reload", action="store_true")
+    parser.add_argument("--once", action="store_true")
+    parser.add_argument("--interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    vector_db = VectorStorage()
+    if args.reload or not vector_db.count():
+        vector_db.reload_data()
+    if args.reload or not current_version():
+        export_generation(vector_db)
+    if not args.once:
+        serve(vector_db, args.interval)
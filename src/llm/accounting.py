@@ -0,0 +1,159 @@
+import os
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from telemetry.metrics import MetricsRegistry
+
+_turn_ledger = ContextVar("llm_ledger", default=None)
+_LLM_PACKAGE = os.path.dirname(os.path.abspath(__file__))
+
+
+def call_site(depth=2):
+    """
+    Find the agent and method that issued an LLM call.
+    Frames inside the llm package are skipped.
+
+    Args:
+        depth (int, optional): Frames to skip before searching. Defaults to 2
+
+    Returns:
+        tuple: (agent, method), where agent is the caller's class name or module name
+    """
+    frame = sys._getframe(depth)
+    while frame is not None and os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _LLM_PACKAGE:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown", "unknown"
+    owner = frame.f_locals.get("self")
+    agent = type(owner).__name__ if owner is not None else frame.f_globals.get("__name__", "unknown")
+    return agent, frame.f_code.co_name
+
+
+class TurnLedger:
+    """
+    LLM calls made while serving one turn.
+    """
+
+    def __init__(self, label="turn"):
+        self.label = label
+        self.calls = []
+        self._lock = Lock()
+
+    def record(self, call):
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self):
+        """
+        Aggregate the turn's calls per (agent, method, model).
+
+        Returns:
+            dict: Totals and per call site breakdown, most expensive first
+        """
+        with self._lock:
+            calls = list(self.calls)
+        sites = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0})
+        for call in calls:
+            site = sites[(call["agent"], call["method"], call["model"])]
+            site["calls"] += 1
+            site["prompt_tokens"] += call["prompt_tokens"]
+            site["completion_tokens"] += call["completion_tokens"]
+            site["seconds"] += call["seconds"]
+        breakdown = [
+            {"agent": agent, "method": method, "model": model, **values}
+            for (agent, method, model), values in sites.items()
+        ]
+        breakdown.sort(key=lambda site: site["seconds"], reverse=True)
+        return {
+            "label": self.label,
+            "calls": len(calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "seconds": sum(c["seconds"] for c in calls),
+            "sites": breakdown
+        }
+
+
+def record_call(agent, method, model, response, seconds):
+    """
+    Account one backend call in the metrics and in the current turn, if any.
+
+    Args:
+        agent (str): Class or module that issued the call
+        method (str): Method that issued the call
+        model (str): Model name
+        response (ChatCompletionResponse): The model response
+        seconds (float): Wall time of the call
+    """
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+    metrics = MetricsRegistry()
+    site = f"{agent}.{method}.{model}"
+    metrics.increment(f"llm.calls.{site}")
+    metrics.increment(f"llm.prompt_tokens.{site}", prompt_tokens)
+    metrics.increment(f"llm.completion_tokens.{site}", completion_tokens)
+    metrics.observe(f"llm.call_seconds.{site}", seconds)
+
+    ledger = _turn_ledger.get()
+    if ledger is not None:
+        ledger.record({
+            "agent": agent,
+            "method": method,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "seconds": seconds
+        })
+
+
+def format_summary(summary):
+    """
+    Render a turn summary as a short report.
+
+    Args:
+        summary (dict): Output of TurnLedger.summary
+
+    Returns:
+        str: One header line plus one line per call site
+    """
+    lines = [
+        f"[LLM] {summary['label']}: {summary['calls']} llamadas, "
+        f"{summary['prompt_tokens']}+{summary['completion_tokens']} tokens, {summary['seconds']:.2f}s"
+    ]
+    for site in summary["sites"]:
+        lines.append(
+            f"  {site['agent']}.{site['method']} ({site['model']}): {site['calls']}x, "
+            f"{site['prompt_tokens']}+{site['completion_tokens']} tokens, {site['seconds']:.2f}s"
+        )
+    return "\n".join(lines)
+
+
+@contextmanager
+def turn_accounting(label="turn"):
+    """
+    Attribute every LLM call made in the scope to one turn.
+    On exit the turn summary is printed and its totals are added to the histograms
+    llm.turn.calls, llm.turn.tokens and llm.turn.seconds.
+
+    Args:
+        label (str, optional): Name shown in the summary. Defaults to "turn"
+
+    Yields:
+        TurnLedger: The turn's ledger
+    """
+    ledger = TurnLedger(label)
+    token = _turn_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _turn_ledger.reset(token)
+        summary = ledger.summary()
+        metrics = MetricsRegistry()
+        metrics.observe("llm.turn.calls", summary["calls"])
+        metrics.observe("llm.turn.tokens", summary["prompt_tokens"] + summary["completion_tokens"])
+        metrics.observe("llm.turn.seconds", summary["seconds"])
+        print(format_summary(summary))
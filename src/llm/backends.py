@@ -0,0 +1,216 @@
+import asyncio
+import math
+import random
+import time
+import uuid
+from threading import Lock
+from mistralai.client import MistralClient
+from mistralai.async_client import MistralAsyncClient
+from mistralai.models.chat_completion import ChatCompletionResponse
+from .fixtures import canonical_request, request_key, FixtureNotFoundError
+
+# Synthetic latency, in seconds, used by the replay backend when no profile is given.
+DEFAULT_LATENCY_PROFILES = {
+    "mistral-small": {"distribution": "lognormal", "median": 0.8, "sigma": 0.35},
+    "mistral-medium": {"distribution": "lognormal", "median": 2.5, "sigma": 0.5},
+    "default": {"distribution": "lognormal", "median": 1.0, "sigma": 0.4}
+}
+
+
+class LatencyModel:
+    """
+    Per-model synthetic latency distributions for the replay backend.
+    Samples are drawn from a seeded generator so benchmark runs are reproducible.
+    """
+
+    def __init__(self, profiles=None, seed=0):
+        """
+        Initialize the latency model.
+
+        Args:
+            profiles (dict, optional): Model name -> distribution spec. Supported
+                distributions: constant (value), uniform (low, high),
+                normal (mean, std) and lognormal (median, sigma)
+            seed (int, optional): Random seed. Defaults to 0
+        """
+        self.profiles = profiles if profiles is not None else DEFAULT_LATENCY_PROFILES
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def sample(self, model):
+        """
+        Draw a latency for a call to the given model.
+
+        Args:
+            model (str): Model name
+
+        Returns:
+            float: Latency in seconds
+        """
+        profile = self.profiles.get(model, self.profiles.get("default"))
+        if not profile:
+            return 0.0
+        distribution = profile.get("distribution", "constant")
+        with self._lock:
+            if distribution == "uniform":
+                value = self._random.uniform(profile["low"], profile["high"])
+            elif distribution == "normal":
+                value = self._random.gauss(profile["mean"], profile["std"])
+            elif distribution == "lognormal":
+                value = self._random.lognormvariate(math.log(profile["median"]), profile["sigma"])
+            else:
+                value = profile.get("value", 0.0)
+        return max(0.0, value)
+
+
+class MistralBackend:
+    """
+    Live backend calling the Mistral API.
+    """
+
+    def __init__(self, api_key, endpoint=None, timeout=120):
+        """
+        Initialize the backend.
+
+        Args:
+            api_key (str): Mistral API key
+            endpoint (str, optional): API endpoint, e.g. a replay server URL
+            timeout (int, optional): Request timeout in seconds. Defaults to 120
+        """
+        kwargs = {"api_key": api_key, "timeout": timeout}
+        if endpoint:
+            kwargs["endpoint"] = endpoint
+        self.client = MistralClient(**kwargs)
+        self.async_client = MistralAsyncClient(**kwargs)
+
+    def chat(self, model, messages, **kwargs):
+        return self.client.chat(model=model, messages=messages, **kwargs)
+
+    async def achat(self, model, messages, **kwargs):
+        return await self.async_client.chat(model=model, messages=messages, **kwargs)
+
+
+class RecordingBackend:
+    """
+    Backend that forwards calls to another backend and records every
+    request/response pair into a fixture store.
+    """
+
+    def __init__(self, inner, store):
+        """
+        Initialize the backend.
+
+        Args:
+            inner: Backend performing the real calls
+            store (FixtureStore): Store where the pairs are recorded
+        """
+        self.inner = inner
+        self.store = store
+
+    def _record(self, model, messages, response, **kwargs):
+        request = canonical_request(model, messages, **kwargs)
+        self.store.save(request_key(request), request, response.model_dump(mode="json"))
+
+    def chat(self, model, messages, **kwargs):
+        response = self.inner.chat(model=model, messages=messages, **kwargs)
+        self._record(model, messages, response, **kwargs)
+        return response
+
+    async def achat(self, model, messages, **kwargs):
+        response = await self.inner.achat(model=model, messages=messages, **kwargs)
+        self._record(model, messages, response, **kwargs)
+        return response
+
+
+def synthetic_response(model, content):
+    """
+    Build a serialized chat completion response with the given content.
+
+    Args:
+        model (str): Model name
+        content (str): Assistant message content
+
+    Returns:
+        dict: Response in the Mistral API format
+    """
+    return {
+        "id": f"replay-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+class ReplayBackend:
+    """
+    Offline backend serving recorded responses with synthetic latency.
+    """
+
+    def __init__(self, store, latency=None, strict=True, fallback_content="OK"):
+        """
+        Initialize the backend.
+
+        Args:
+            store (FixtureStore): Store with the recorded pairs
+            latency (LatencyModel, optional): Latency model. Defaults to no delay
+            strict (bool, optional): Raise FixtureNotFoundError on unrecorded requests
+                instead of answering with fallback_content. Defaults to True
+            fallback_content (str, optional): Content served for unrecorded requests
+                when not strict. Defaults to "OK"
+        """
+        self.store = store
+        self.latency = latency
+        self.strict = strict
+        self.fallback_content = fallback_content
+
+    def respond(self, model, messages, **kwargs):
+        """
+        Look up the serialized response for a request, without delay.
+
+        Args:
+            model (str): Model name
+            messages (list): Chat messages
+            **kwargs: Remaining chat parameters
+
+        Returns:
+            dict: Serialized chat completion response
+
+        Raises:
+            FixtureNotFoundError: If the request was never recorded and the backend is strict
+        """
+        request = canonical_request(model, messages, **kwargs)
+        key = request_key(request)
+        fixture = self.store.get(key)
+        if fixture is not None:
+            return fixture["response"]
+        if self.strict:
+            raise FixtureNotFoundError(key)
+        return synthetic_response(model, self.fallback_content)
+
+    def delay(self, model):
+        """
+        Get the synthetic latency for a call to the given model.
+
+        Args:
+            model (str): Model name
+
+        Returns:
+            float: Latency in seconds
+        """
+        return self.latency.sample(model) if self.latency else 0.0
+
+    def chat(self, model, messages, **kwargs):
+        data = self.respond(model, messages, **kwargs)
+        time.sleep(self.delay(model))
+        return ChatCompletionResponse.model_validate(data)
+
+    async def achat(self, model, messages, **kwargs):
+        data = self.respond(model, messages, **kwargs)
+        await asyncio.sleep(self.delay(model))
+        return ChatCompletionResponse.model_validate(data)
@@ -0,0 +1,213 @@
+import contextvars
+import json
+import os
+import time
+from pathlib import Path
+from threading import Lock
+from .backends import MistralBackend, RecordingBackend, ReplayBackend, LatencyModel
+from .accounting import call_site, record_call
+from .fixtures import FixtureStore, canonical_request, request_key
+from .hedging import Hedger, latency_metric
+from .routing import ModelRouter, load_routes
+from runtime.cancellation import OperationCancelled, check_cancelled, run_cancellable
+from runtime.event_loop import run_coroutine
+from runtime.executor import ServiceBusyError
+from runtime.single_flight import SingleFlight
+from telemetry.metrics import MetricsRegistry
+
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "XEV0fCx3MqiG9HqVkGc4Hy5qyD3WwPHr")
+DEFAULT_FIXTURES_DIR = Path(__file__).parent.parent / "data" / "llm_fixtures"
+
+
+class LLMClient:
+    """
+    Gateway used by every component that talks to an LLM.
+    Exposes the same chat interface as MistralClient on top of a pluggable backend.
+    Concurrent identical requests are coalesced into a single backend call, and
+    requests marked with hedge=True may be duplicated when they run slow.
+    Requests naming a task are routed to the model configured for it.
+    Every backend call is accounted to the agent and method that issued it.
+    Calls are bounded by the current cancellation token: none starts once the token
+    is cancelled or expired, and running ones are aborted as soon as it is. Every
+    call, synchronous or not, runs on the shared event loop.
+    """
+
+    def __init__(self, backend, coalesce=True, hedger=None, router=None):
+        """
+        Initialize the client.
+
+        Args:
+            backend: Backend performing the calls (live, recording or replay)
+            coalesce (bool, optional): Share in-flight identical requests. Defaults to True
+            hedger (Hedger, optional): Hedging policy. Defaults to hedging at the p95 latency
+            router (ModelRouter, optional): Task routing table. Defaults to DEFAULT_ROUTES
+        """
+        self.backend = backend
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight("llm")
+        self.hedger = hedger or Hedger()
+        self.router = router or ModelRouter()
+        self.metrics = MetricsRegistry()
+
+    def _record(self, site, task, model, response, seconds):
+        self.metrics.observe(latency_metric(model), seconds)
+        if task:
+            self.metrics.observe(latency_metric(model, task), seconds)
+        record_call(*site, model, response, seconds)
+
+    async def _asend(self, site, task, model, messages, kwargs):
+        start = time.perf_counter()
+        response = await self.backend.achat(model=model, messages=messages, **kwargs)
+        self._record(site, task, model, response, time.perf_counter() - start)
+        return response
+
+    async def _acall(self, site, task, model, messages, hedge, kwargs):
+        if hedge:
+            return await self.hedger.arun(model, lambda: self._asend(site, task, model, messages, kwargs), task)
+        return await self._asend(site, task, model, messages, kwargs)
+
+    async def _achat(self, site, task, model, messages, hedge, kwargs):
+        if not self.coalesce:
+            return await self._acall(site, task, model, messages, hedge, kwargs)
+        key = request_key(canonical_request(model, messages, **kwargs))
+        return await self.single_flight.ado(key, self._acall, site, task, model, messages, hedge, kwargs)
+
+    async def _abounded(self, timeout, site, task, model, messages, hedge, kwargs):
+        return await run_cancellable(self._achat(site, task, model, messages, hedge, kwargs), "llm", timeout)
+
+    def _routed(self, task, kwargs):
+        route = self.router.resolve(task)
+        if route["max_tokens"] and "max_tokens" not in kwargs:
+            kwargs = {**kwargs, "max_tokens": route["max_tokens"]}
+        return route, kwargs
+
+    def _fall_back(self, task, route, error):
+        if not route["fallback"]:
+            raise error
+        print(f"[LLM] {task} con {route['model']} falló ({error!r}), usando {route['fallback']}")
+        self.metrics.increment(f"llm.route.{task}.fallback")
+        return route["fallback"]
+
+    async def _aroute(self, site, model, messages, task, hedge, kwargs):
+        check_cancelled("llm")
+        if task is None:
+            return await self._abounded(None, site, task, model, messages, hedge, kwargs)
+
+        route, kwargs = self._routed(task, kwargs)
+        start = time.perf_counter()
+        try:
+            response = await self._abounded(route["timeout"], site, task, route["model"], messages, hedge, kwargs)
+        except (ServiceBusyError, OperationCancelled):
+            raise
+        except Exception as e:
+            self.router.observe(task, route["model"], None)
+            fallback = self._fall_back(task, route, e)
+        else:
+            self.router.observe(task, route["model"], time.perf_counter() - start)
+            return response
+        check_cancelled("llm")
+        return await self._abounded(route["timeout"], site, task, fallback, messages, hedge, kwargs)
+
+    def chat(self, model=None, messages=None, task=None, hedge=False, **kwargs):
+        """
+        Send a chat completion request. The call runs on the shared event loop in the
+        caller's context, so an expired deadline or a cancelled token aborts the HTTP
+        request instead of leaving it running in a thread.
+
+        Args:
+            model (str, optional): Model name, ignored when a task is given
+            messages (list): Chat messages (dicts or ChatMessage objects)
+            task (str, optional): Logical task name resolved by the router to a model,
+                token limit, timeout and fallback model
+            hedge (bool, optional): Allow a duplicate request if this one runs slow. Defaults to False
+            **kwargs: Extra parameters accepted by MistralAsyncClient.chat
+
+        Returns:
+            ChatCompletionResponse: The model response
+        """
+        site = call_site()
+        check_cancelled("llm")
+        return run_coroutine(
+            self._aroute(site, model, messages, task, hedge, kwargs), context=contextvars.copy_context()
+        )
+
+    async def achat(self, model=None, messages=None, task=None, hedge=False, **kwargs):
+        """
+        Send a chat completion request without blocking the event loop.
+
+        Args:
+            model (str, optional): Model name, ignored when a task is given
+            messages (list): Chat messages (dicts or ChatMessage objects)
+            task (str, optional): Logical task name resolved by the router to a model,
+                token limit, timeout and fallback model
+            hedge (bool, optional): Allow a duplicate request if this one runs slow. Defaults to False
+            **kwargs: Extra parameters accepted by MistralAsyncClient.chat
+
+        Returns:
+            ChatCompletionResponse: The model response
+        """
+        return await self._aroute(call_site(), model, messages, task, hedge, kwargs)
+
+def create_backend(mode=None, fixtures_dir=None, latency_file=None, strict=None):
+    """
+    Build an LLM backend from arguments or environment variables.
+
+    Environment:
+        GPTUR_LLM_MODE: live (default), record or replay
+        GPTUR_LLM_FIXTURES: fixture directory
+        GPTUR_LLM_LATENCY: JSON file with per-model latency profiles for replay
+        GPTUR_LLM_STRICT: "0" to answer unrecorded requests with a placeholder in replay
+        GPTUR_MISTRAL_ENDPOINT: alternative API endpoint, e.g. a replay server
+
+    Returns:
+        The configured backend
+    """
+    mode = mode or os.getenv("GPTUR_LLM_MODE", "live")
+    fixtures_dir = fixtures_dir or os.getenv("GPTUR_LLM_FIXTURES", str(DEFAULT_FIXTURES_DIR))
+    latency_file = latency_file or os.getenv("GPTUR_LLM_LATENCY")
+    if strict is None:
+        strict = os.getenv("GPTUR_LLM_STRICT", "1") != "0"
+
+    if mode == "replay":
+        profiles = None
+        if latency_file:
+            with open(latency_file, "r", encoding="utf-8") as f:
+                profiles = json.load(f)
+        return ReplayBackend(
+            FixtureStore(fixtures_dir),
+            latency=LatencyModel(profiles),
+            strict=strict
+        )
+
+    live = MistralBackend(MISTRAL_API_KEY, endpoint=os.getenv("GPTUR_MISTRAL_ENDPOINT"))
+    if mode == "record":
+        return RecordingBackend(live, FixtureStore(fixtures_dir))
+    return live
+
+
+_client = None
+_client_lock = Lock()
+
+
+def get_llm_client():
+    """
+    Get the process-wide LLM client, creating it on first use.
+    Set GPTUR_LLM_COALESCE=0 to disable coalescing of identical requests and
+    GPTUR_LLM_HEDGE_PERCENTILE to change the latency percentile that triggers a hedge.
+    GPTUR_LLM_ROUTES may point to a JSON file overriding the task routing table.
+
+    Returns:
+        LLMClient: The shared client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                routes_file = os.getenv("GPTUR_LLM_ROUTES")
+                _client = LLMClient(
+                    create_backend(),
+                    coalesce=os.getenv("GPTUR_LLM_COALESCE", "1") != "0",
+                    hedger=Hedger(percentile=float(os.getenv("GPTUR_LLM_HEDGE_PERCENTILE", "95"))),
+                    router=ModelRouter(load_routes(routes_file) if routes_file else None)
+                )
+    return _client
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from threading import Lock
+
+
+def _normalize_message(message):
+    """
+    Convert a chat message into a plain dictionary.
+
+    Args:
+        message (dict | ChatMessage): Message as passed to the client
+
+    Returns:
+        dict: Message with role and content
+    """
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    return {"role": message.role, "content": message.content}
+
+
+def canonical_request(model, messages, **kwargs):
+    """
+    Build the canonical form of a chat request, used as the fixture identity.
+
+    Args:
+        model (str): Model name
+        messages (list): Chat messages (dicts or ChatMessage objects)
+        **kwargs: Remaining chat parameters; None values are ignored
+
+    Returns:
+        dict: JSON serializable request
+    """
+    request = {
+        "model": model,
+        "messages": [_normalize_message(m) for m in messages]
+    }
+    for name, value in sorted(kwargs.items()):
+        if value is not None:
+            request[name] = value
+    return request
+
+
+def request_key(request):
+    """
+    Compute a stable key for a canonical request.
+
+    Args:
+        request (dict): Canonical request from canonical_request
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FixtureNotFoundError(KeyError):
+    """Raised in strict replay mode when no recording exists for a request."""
+
+
+class FixtureStore:
+    """
+    Directory of recorded request/response pairs, one JSON file per request.
+    """
+
+    def __init__(self, directory):
+        """
+        Initialize the store.
+
+        Args:
+            directory (str | Path): Directory holding the fixture files
+        """
+        self.directory = Path(directory)
+        self._lock = Lock()
+        self._cache = {}
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        """
+        Load the recorded response for a request key.
+
+        Args:
+            key (str): Request key
+
+        Returns:
+            dict: The recorded fixture ({"request", "response"}) or None if missing
+        """
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        path = self._path(key)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+        with self._lock:
+            self._cache[key] = fixture
+        return fixture
+
+    def save(self, key, request, response):
+        """
+        Record a request/response pair.
+
+        Args:
+            key (str): Request key
+            request (dict): Canonical request
+            response (dict): Serialized chat completion response
+        """
+        fixture = {"request": request, "response": response}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path(key).with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._cache[key] = fixture
+
+    def __len__(self):
+        return len(list(self.directory.glob("*.json"))) if self.directory.exists() else 0
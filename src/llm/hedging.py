@@ -0,0 +1,141 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from telemetry.metrics import MetricsRegistry
+
+_turn_budget = ContextVar("hedge_budget", default=None)
+
+
+class HedgeBudget:
+    """
+    Number of duplicate requests a turn may still send.
+    """
+
+    def __init__(self, hedges):
+        self.remaining = hedges
+        self._lock = Lock()
+
+    def take(self):
+        """
+        Consume one hedge if any is left.
+
+        Returns:
+            bool: True if the hedge may be sent
+        """
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+@contextmanager
+def hedge_budget(hedges):
+    """
+    Scope a per-turn hedge budget. Requests outside any scope are never hedged.
+
+    Args:
+        hedges (int): Maximum duplicate requests in the scope
+    """
+    token = _turn_budget.set(HedgeBudget(hedges))
+    try:
+        yield
+    finally:
+        _turn_budget.reset(token)
+
+
+def latency_metric(model, task=None):
+    """
+    Name of the histogram holding a model's observed call latencies.
+
+    Args:
+        model (str): Model name
+        task (str, optional): Logical task name, for the latencies of that task only
+
+    Returns:
+        str: Histogram name
+    """
+    if task:
+        return f"llm.latency_seconds.{task}.{model}"
+    return f"llm.latency_seconds.{model}"
+
+
+class Hedger:
+    """
+    Sends a duplicate of a slow request once it exceeds a percentile of the latency
+    observed for its task on that model, and returns whichever copy answers first.
+    """
+
+    def __init__(self, percentile=95, min_samples=20):
+        """
+        Initialize the hedger.
+
+        Args:
+            percentile (float, optional): Latency percentile after which a duplicate is sent. Defaults to 95
+            min_samples (int, optional): Observations needed before hedging a model. Defaults to 20
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.metrics = MetricsRegistry()
+
+    def hedge_delay(self, model, task=None):
+        """
+        Get how long to wait before hedging a call to a model.
+
+        Args:
+            model (str): Model name
+            task (str, optional): Logical task name. Defaults to the model's latency across tasks
+
+        Returns:
+            float: Delay in seconds, or None if there are not enough observations
+        """
+        name = latency_metric(model, task)
+        if self.metrics.count(name) < self.min_samples:
+            return None
+        return self.metrics.percentile(name, self.percentile)
+
+    def _eligible(self, model, task):
+        budget = _turn_budget.get()
+        delay = self.hedge_delay(model, task)
+        if budget is None or delay is None:
+            return None, None
+        self.metrics.increment("llm.hedge.eligible")
+        return budget, delay
+
+    def _record_hedge(self, backup_won):
+        self.metrics.increment("llm.hedge.sent")
+        if backup_won:
+            self.metrics.increment("llm.hedge.backup_wins")
+
+    async def arun(self, model, send, task=None):
+        """
+        Run a request with hedging.
+
+        Args:
+            model (str): Model name
+            send (callable): Coroutine function performing one copy of the request
+            task (str, optional): Logical task name whose latency sets the delay
+
+        Returns:
+            Any: The first successful response
+        """
+        budget, delay = self._eligible(model, task)
+        if budget is None:
+            return await send()
+
+        primary = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not budget.take():
+            return await primary
+
+        backup = asyncio.ensure_future(send())
+        pending = {primary, backup}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None or not pending:
+                    for other in pending:
+                        other.cancel()
+                    self._record_hedge(backup_won=task is backup)
+                    return task.result()
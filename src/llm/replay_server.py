@@ -0,0 +1,97 @@
+"""
+HTTP stand-in for the Mistral chat completions API serving recorded fixtures.
+
+Usage:
+    python -m llm.replay_server --fixtures data/llm_fixtures --port 8765
+
+Then point the live backend at it with
+GPTUR_MISTRAL_ENDPOINT=http://127.0.0.1:8765.
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .backends import ReplayBackend, LatencyModel
+from .client import DEFAULT_FIXTURES_DIR
+from .fixtures import FixtureStore, FixtureNotFoundError
+
+# Fields added by MistralClient that call sites never pass explicitly
+_TRANSPORT_FIELDS = {"model", "messages", "stream", "safe_prompt", "safe_mode"}
+
+
+def make_handler(backend):
+    """
+    Build a request handler class bound to a replay backend.
+
+    Args:
+        backend (ReplayBackend): Backend serving the fixtures
+
+    Returns:
+        type: BaseHTTPRequestHandler subclass
+    """
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self._send_json(404, {"message": f"Unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            kwargs = {k: v for k, v in request.items() if k not in _TRANSPORT_FIELDS}
+            try:
+                data = backend.respond(request.get("model"), request.get("messages", []), **kwargs)
+            except FixtureNotFoundError as e:
+                self._send_json(404, {"message": f"No fixture recorded for request {e}"})
+                return
+            time.sleep(backend.delay(request.get("model")))
+            self._send_json(200, data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+
+def serve(fixtures_dir, host="127.0.0.1", port=8765, latency_file=None, strict=True):
+    """
+    Run the replay server until interrupted.
+
+    Args:
+        fixtures_dir (str): Directory with the recorded fixtures
+        host (str, optional): Bind address. Defaults to "127.0.0.1"
+        port (int, optional): Port. Defaults to 8765
+        latency_file (str, optional): JSON file with per-model latency profiles
+        strict (bool, optional): Return 404 for unrecorded requests. Defaults to True
+    """
+    profiles = None
+    if latency_file:
+        with open(latency_file, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+    backend = ReplayBackend(FixtureStore(fixtures_dir), latency=LatencyModel(profiles), strict=strict)
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    print(f"Replay server escuchando en http://{host}:{port} ({len(backend.store)} fixtures)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de reproducción de respuestas LLM")
+    parser.add_argument("--fixtures", default=str(DEFAULT_FIXTURES_DIR))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default=None)
+    parser.add_argument("--lenient", action="store_true")
+    args = parser.parse_args()
+    serve(args.fixtures, args.host, args.port, args.latency, strict=not args.lenient)
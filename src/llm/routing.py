@@ -0,0 +1,180 @@
+import json
+import time
+from collections import deque
+from itertools import count
+from threading import Lock
+import numpy as np
+from telemetry.metrics import MetricsRegistry
+
+# Logical LLM tasks and how they are served.
+#   model: model used while it meets the SLO
+#   max_tokens: completion limit, None for no limit
+#   timeout: seconds before the call is cancelled and retried on the fallback with the same limit, None to wait
+#   fallback: faster model used on timeout, error or SLO breach, None for no fallback
+#   slo: p95 latency in seconds above which the task is demoted to the fallback
+DEFAULT_ROUTES = {
+    "classify_intent": {"model": "mistral-small", "max_tokens": 10, "timeout": 15, "fallback": None, "slo": None},
+    "extract_location": {"model": "mistral-small", "max_tokens": 20, "timeout": 15, "fallback": None, "slo": None},
+    "extract_travel_params": {"model": "mistral-small", "max_tokens": 100, "timeout": 15, "fallback": None, "slo": None},
+    "extract_preferences": {"model": "mistral-small", "max_tokens": 150, "timeout": 15, "fallback": None, "slo": None},
+    "extract_city": {"model": "mistral-small", "max_tokens": 20, "timeout": 15, "fallback": None, "slo": None},
+    "check_accuracy": {"model": "mistral-small", "max_tokens": 10, "timeout": 15, "fallback": None, "slo": None},
+    "search_query": {"model": "mistral-small", "max_tokens": 50, "timeout": 15, "fallback": None, "slo": None},
+    "recommend_places": {"model": "mistral-medium", "max_tokens": None, "timeout": 60, "fallback": "mistral-small", "slo": 25},
+    "specialist_suggestion": {"model": "mistral-medium", "max_tokens": None, "timeout": 45, "fallback": "mistral-small", "slo": 20},
+    "specialist_recommendations": {"model": "mistral-medium", "max_tokens": None, "timeout": 45, "fallback": "mistral-small", "slo": 20},
+    "specialist_structured": {"model": "mistral-medium", "max_tokens": None, "timeout": 60, "fallback": "mistral-small", "slo": 25},
+    "repair_json": {"model": "mistral-small", "max_tokens": None, "timeout": 30, "fallback": None, "slo": None},
+    "site_details": {"model": "mistral-medium", "max_tokens": None, "timeout": 45, "fallback": "mistral-small", "slo": 20},
+    "synthesis": {"model": "mistral-medium", "max_tokens": None, "timeout": 60, "fallback": "mistral-small", "slo": 30},
+    "format_itinerary": {"model": "mistral-medium", "max_tokens": None, "timeout": 60, "fallback": "mistral-small", "slo": 30},
+    "enhance_response": {"model": "mistral-medium", "max_tokens": None, "timeout": 60, "fallback": "mistral-small", "slo": 30},
+}
+DEFAULT_ROUTE = {"model": "mistral-medium", "max_tokens": None, "timeout": None, "fallback": None, "slo": None}
+
+
+def load_routes(path):
+    """
+    Load route overrides from a JSON file mapping task names to partial routes.
+
+    Args:
+        path (str): Path to the JSON file
+
+    Returns:
+        dict: Overrides to merge over DEFAULT_ROUTES
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ModelRouter:
+    """
+    Resolves logical task names to the model and limits used to serve them.
+    Each task's latency on its primary model is kept over a short time window; when
+    its percentile breaches the SLO the task is demoted to the fallback model. One
+    call in probe_every still goes to the primary, and the task is restored once
+    recover_after consecutive probes meet the SLO.
+    """
+
+    def __init__(self, routes=None, percentile=95, min_samples=20, probe_every=10,
+                 window_seconds=300, recover_after=3):
+        """
+        Initialize the router.
+
+        Args:
+            routes (dict, optional): Per-task overrides merged over DEFAULT_ROUTES
+            percentile (float, optional): Latency percentile compared to the SLO. Defaults to 95
+            min_samples (int, optional): Observations in the window needed before demoting. Defaults to 20
+            probe_every (int, optional): While demoted, every n-th call probes the primary. Defaults to 10
+            window_seconds (float, optional): Age of the oldest latency considered. Defaults to 300
+            recover_after (int, optional): Consecutive probes within the SLO that restore
+                the primary model. Defaults to 3
+        """
+        self.routes = {task: dict(route) for task, route in DEFAULT_ROUTES.items()}
+        for task, route in (routes or {}).items():
+            self.routes[task] = {**self.routes.get(task, DEFAULT_ROUTE), **route}
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.window_seconds = window_seconds
+        self.recover_after = recover_after
+        self.metrics = MetricsRegistry()
+        self._lock = Lock()
+        self._counters = {}
+        self._latencies = {}
+        self._probes = {}
+        self._demoted = set()
+
+    def route(self, task):
+        """
+        Get the configured route of a task.
+
+        Args:
+            task (str): Logical task name
+
+        Returns:
+            dict: The route, or DEFAULT_ROUTE for unknown tasks
+        """
+        return self.routes.get(task, DEFAULT_ROUTE)
+
+    def _window(self, task):
+        # Caller holds self._lock
+        window = self._latencies.setdefault(task, deque())
+        horizon = time.monotonic() - self.window_seconds
+        while window and window[0][0] < horizon:
+            window.popleft()
+        return window
+
+    def observe(self, task, model, seconds):
+        """
+        Record the outcome of a routed call. Only calls served by the task's primary
+        model count towards its SLO.
+
+        Args:
+            task (str): Logical task name
+            model (str): Model that served the call
+            seconds (float): Latency of the call, or None if the model failed
+        """
+        route = self.route(task)
+        if model != route["model"] or route["slo"] is None:
+            return
+        seconds = float("inf") if seconds is None else seconds
+        with self._lock:
+            self._window(task).append((time.monotonic(), seconds))
+            if task in self._demoted:
+                self._probes.setdefault(task, deque(maxlen=self.recover_after)).append(seconds)
+
+    def breaches_slo(self, task):
+        """
+        Check whether a task is currently demoted from its primary model, updating
+        the decision from the latencies observed since the last call.
+
+        Args:
+            task (str): Logical task name
+
+        Returns:
+            bool: True if the task should be served by its fallback model
+        """
+        route = self.route(task)
+        if not route["fallback"] or route["slo"] is None:
+            return False
+        with self._lock:
+            if task in self._demoted:
+                probes = self._probes.get(task, ())
+                if len(probes) < self.recover_after or max(probes) > route["slo"]:
+                    return True
+                self._demoted.discard(task)
+                self._probes.pop(task, None)
+                self._latencies.pop(task, None)
+                recovered = True
+            else:
+                latencies = [seconds for _, seconds in self._window(task)]
+                if len(latencies) < self.min_samples or np.percentile(latencies, self.percentile) <= route["slo"]:
+                    return False
+                self._demoted.add(task)
+                recovered = False
+        self.metrics.increment(f"llm.route.{task}.{'recovered' if recovered else 'breached'}")
+        return not recovered
+
+    def _probe(self, task):
+        with self._lock:
+            calls = self._counters.setdefault(task, count(1))
+            return next(calls) % self.probe_every == 0
+
+    def resolve(self, task):
+        """
+        Decide how a call for a task is served right now.
+
+        Args:
+            task (str): Logical task name
+
+        Returns:
+            dict: model, max_tokens, timeout and fallback for this call
+        """
+        route = self.route(task)
+        if self.breaches_slo(task) and not self._probe(task):
+            self.metrics.increment(f"llm.route.{task}.demoted")
+            return {"model": route["fallback"], "max_tokens": route["max_tokens"],
+                    "timeout": route["timeout"], "fallback": None}
+        return {"model": route["model"], "max_tokens": route["max_tokens"],
+                "timeout": route["timeout"], "fallback": route["fallback"]}
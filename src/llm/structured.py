@@ -0,0 +1,189 @@
+import json
+import re
+
+JSON_MODE = {"type": "json_object"}
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool
+}
+
+
+class StructuredOutputError(ValueError):
+    """
+    Raised when a model answer cannot be parsed and repaired into the expected schema.
+    """
+
+
+def parse_json(text):
+    """
+    Parse the JSON object in a model answer, tolerating code fences and surrounding text.
+
+    Args:
+        text (str): Model answer
+
+    Returns:
+        Any: The parsed value
+
+    Raises:
+        json.JSONDecodeError: If no JSON object can be parsed
+    """
+    text = _FENCE.sub("", text.strip())
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+def validate(value, schema, path="$"):
+    """
+    Validate a value against a JSON Schema subset: type, properties, required,
+    enum, items, minimum and maximum.
+
+    Args:
+        value (Any): Parsed value
+        schema (dict): Schema to check against
+        path (str, optional): Location of the value, used in error messages
+
+    Returns:
+        list: Human readable errors, empty if the value is valid
+    """
+    expected = schema.get("type")
+    if expected:
+        python_type = _TYPES[expected]
+        if not isinstance(value, python_type) or (expected in ("number", "integer") and isinstance(value, bool)):
+            return [f"{path}: se esperaba {expected}"]
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: debe ser uno de {schema['enum']}")
+    if "minimum" in schema and isinstance(value, (int, float)) and value < schema["minimum"]:
+        errors.append(f"{path}: debe ser >= {schema['minimum']}")
+    if "maximum" in schema and isinstance(value, (int, float)) and value > schema["maximum"]:
+        errors.append(f"{path}: debe ser <= {schema['maximum']}")
+    if isinstance(value, dict):
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name}: campo obligatorio")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in value:
+                errors.extend(validate(value[name], subschema, f"{path}.{name}"))
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def schema_instructions(schema):
+    """
+    Describe the expected answer format for the system prompt.
+
+    Args:
+        schema (dict): Expected schema
+
+    Returns:
+        str: Instructions including the schema
+    """
+    return (
+        "Responde ÚNICAMENTE con un objeto JSON válido, sin texto adicional, "
+        f"que cumpla este esquema JSON:\n{json.dumps(schema, ensure_ascii=False)}"
+    )
+
+
+def _content(response):
+    return response.choices[0].message.content
+
+
+def _check(text, schema):
+    """
+    Parse and validate an answer.
+
+    Returns:
+        tuple: (value, errors); value is None when the text is not JSON
+    """
+    try:
+        value = parse_json(text)
+    except json.JSONDecodeError as e:
+        return None, [f"JSON inválido: {e}"]
+    return value, validate(value, schema)
+
+
+def _repair_request(messages, answer, errors, schema):
+    return {
+        "task": "repair_json",
+        "response_format": JSON_MODE,
+        "messages": [
+            *messages,
+            {"role": "assistant", "content": answer},
+            {"role": "user", "content": (
+                "La respuesta anterior no cumple el formato requerido:\n- " + "\n- ".join(errors) +
+                "\n\nCorrígela. " + schema_instructions(schema)
+            )}
+        ]
+    }
+
+
+def structured_chat(client, task, messages, schema, repairs=1):
+    """
+    Ask for a JSON answer in JSON mode, validate it against a schema and ask the
+    model to repair it when it does not conform.
+
+    Args:
+        client (LLMClient): Client used for the calls
+        task (str): Routing task of the main call
+        messages (list): Chat messages; the schema is expected in the prompt
+        schema (dict): Expected schema
+        repairs (int, optional): Repair attempts after the first answer. Defaults to 1
+
+    Returns:
+        Any: The validated value
+
+    Raises:
+        StructuredOutputError: If the answer is still invalid after the repairs
+    """
+    answer = _content(client.chat(task=task, messages=messages, response_format=JSON_MODE))
+    value, errors = _check(answer, schema)
+    for _ in range(repairs):
+        if not errors:
+            break
+        answer = _content(client.chat(**_repair_request(messages, answer, errors, schema)))
+        value, errors = _check(answer, schema)
+    if errors:
+        raise StructuredOutputError("; ".join(errors))
+    return value
+
+
+async def astructured_chat(client, task, messages, schema, repairs=1):
+    """
+    Asynchronous variant of structured_chat.
+
+    Args:
+        client (LLMClient): Client used for the calls
+        task (str): Routing task of the main call
+        messages (list): Chat messages; the schema is expected in the prompt
+        schema (dict): Expected schema
+        repairs (int, optional): Repair attempts after the first answer. Defaults to 1
+
+    Returns:
+        Any: The validated value
+
+    Raises:
+        StructuredOutputError: If the answer is still invalid after the repairs
+    """
+    answer = _content(await client.achat(task=task, messages=messages, response_format=JSON_MODE))
+    value, errors = _check(answer, schema)
+    for _ in range(repairs):
+        if not errors:
+            break
+        answer = _content(await client.achat(**_repair_request(messages, answer, errors, schema)))
+        value, errors = _check(answer, schema)
+    if errors:
+        raise StructuredOutputError("; ".join(errors))
+    return value
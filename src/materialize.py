@@ -0,0 +1,145 @@
+"""
+Nightly precomputation of place recommendations for every city and specialist category.
+
+Runs the specialists over CubaTourismSpider.CITIES and publishes the results as a new
+generation read by the guide and the planner. Only cities whose documents changed since
+the current generation are regenerated:
+
+    python materialize.py             # incremental
+    python materialize.py --force     # regenerate every city
+
+Schedule it with cron, e.g. "0 3 * * * cd /path/to/src && python materialize.py".
+"""
+import argparse
+import hashlib
+import json
+import time
+from agents.materialized import MaterializedRecommendations
+from agents.recommendation_cache import normalize_destination
+from telemetry.metrics import MetricsRegistry
+
+
+def city_names(cities):
+    """
+    Deduplicate city spellings, e.g. "viñales" and "vinales".
+
+    Args:
+        cities (list): City names
+
+    Returns:
+        dict: Display name by city key, in first-seen order
+    """
+    names = {}
+    for city in cities:
+        names.setdefault(normalize_destination(city), city.title())
+    return names
+
+
+def city_fingerprints(documents, keys):
+    """
+    Fingerprint the documents about each city, to detect which cities changed.
+
+    Args:
+        documents (list): Documents of the vector database
+        keys (Iterable[str]): City keys
+
+    Returns:
+        dict: SHA-256 of the sorted contents of the city's documents by city key
+    """
+    texts = [
+        (f" {normalize_destination(str(doc.metadata.get('city') or ''))} {normalize_destination(doc.page_content)} ",
+         doc.page_content)
+        for doc in documents
+    ]
+    fingerprints = {}
+    for key in keys:
+        digest = hashlib.sha256()
+        for content in sorted(content for normalized, content in texts if f" {key} " in normalized):
+            digest.update(content.encode("utf-8"))
+        fingerprints[key] = digest.hexdigest()
+    return fingerprints
+
+
+def run_materialization(force=False, n=8):
+    """
+    Regenerate the recommendations of changed cities and publish a new generation.
+
+    Args:
+        force (bool, optional): Regenerate every city. Defaults to False
+        n (int, optional): Places per city and category. Defaults to 8
+
+    Returns:
+        dict: Report with version, duration, regenerated, reused and failed cities, and
+            the age in seconds of the oldest materialization
+    """
+    from chatbot.core import CubaChatbot
+    from agents.guide_agent import create_specialists
+    from spiders.tourism_spider import CubaTourismSpider
+
+    start = time.perf_counter()
+    chatbot = CubaChatbot()
+    specialists = create_specialists(chatbot.vector_db)
+    store = MaterializedRecommendations()
+    current = store.generation()["cities"]
+
+    names = city_names(CubaTourismSpider.CITIES)
+    fingerprints = city_fingerprints(chatbot.vector_db.get_documents(), names)
+
+    cities, regenerated, reused, failed = {}, [], [], []
+    for key, name in names.items():
+        previous = current.get(key)
+        if not force and previous and previous["fingerprint"] == fingerprints[key]:
+            cities[key] = previous
+            reused.append(key)
+            continue
+
+        city_start = time.perf_counter()
+        categories = {}
+        for category, agent in specialists.items():
+            places = agent.generate_places(name, n)
+            if places:
+                categories[category] = [place.to_dict() for place in places]
+        if not categories:
+            print(f"Sin recomendaciones para {name}, se conserva la versión anterior")
+            failed.append(key)
+            if previous:
+                cities[key] = previous
+            continue
+
+        cities[key] = {
+            "name": name,
+            "fingerprint": fingerprints[key],
+            "generated_at": time.time(),
+            "categories": categories
+        }
+        regenerated.append(key)
+        print(f"{name}: {sum(len(p) for p in categories.values())} lugares en {time.perf_counter() - city_start:.1f}s")
+
+    version = store.generation()["version"]
+    if regenerated:
+        version = store.publish({"generated_at": time.time(), "cities": cities})
+
+    ages = store.freshness()
+    duration = time.perf_counter() - start
+    metrics = MetricsRegistry()
+    metrics.observe("materialize.seconds", duration)
+    metrics.observe("materialize.regenerated", len(regenerated))
+    if ages:
+        metrics.observe("materialize.oldest_age_seconds", max(ages.values()))
+    return {
+        "version": version,
+        "seconds": round(duration, 1),
+        "regenerated": regenerated,
+        "reused": reused,
+        "failed": failed,
+        "oldest_age_seconds": round(max(ages.values()), 1) if ages else None
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precálculo de recomendaciones por ciudad de GPTur")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("-n", "--places", type=int, default=8)
+    args = parser.parse_args()
+
+    print(json.dumps(run_materialization(force=args.force, n=args.places), indent=2, ensure_ascii=False))
@@ -0,0 +1,219 @@
+import re
+from functools import lru_cache
+from typing import List, Tuple, Union
+from rank_bm25 import BM25Okapi
+
+try:
+    from mistral_common.tokens.tokenizers.mistral import MistralTokenizer
+except ImportError:
+    MistralTokenizer = None
+
+# Tokens reserved for packed context in each model's prompt. The rest of the
+# window is left for instructions, the question and the completion.
+MODEL_TOKEN_BUDGETS = {
+    "mistral-small": 3000,
+    "mistral-medium": 6000,
+    "mistral-large": 8000,
+}
+DEFAULT_TOKEN_BUDGET = 3000
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=None)
+def _get_tokenizer(model: str):
+    """
+    Load the tokenizer used by a Mistral model.
+
+    Args:
+        model (str): Model name as sent to the API
+
+    Returns:
+        Any: A raw tokenizer with an ``encode`` method, or None if unavailable
+    """
+    if MistralTokenizer is None:
+        return None
+    try:
+        tokenizer = MistralTokenizer.from_model(model)
+    except Exception:
+        tokenizer = MistralTokenizer.v3()
+    return tokenizer.instruct_tokenizer.tokenizer
+
+
+def count_tokens(text: str, model: str = "mistral-medium") -> int:
+    """
+    Count the tokens of a text with the model's tokenizer.
+    Falls back to a character based estimate when mistral_common is not installed.
+
+    Args:
+        text (str): Text to measure
+        model (str, optional): Model whose tokenizer is used. Defaults to "mistral-medium"
+
+    Returns:
+        int: Number of tokens
+    """
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer(model)
+    if tokenizer is None:
+        return max(1, len(text) // 3)
+    return len(tokenizer.encode(text, bos=False, eos=False))
+
+
+def _terms(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if len(word) > 2]
+
+
+def _key(text: str) -> List[str]:
+    # Every word and number counts when comparing sentences: "$20-35 USD" and
+    # "$10-15 USD" share only "usd" and are different facts
+    return _WORD.findall(text.lower())
+
+
+class ContextPacker:
+    """
+    Assembles prompt context from passages within a token budget.
+    Sentences are deduplicated across passages and ranked by BM25 relevance to the
+    query, so the budget is spent on what matters instead of on whatever came first.
+    """
+
+    def __init__(self, budgets=None, dedupe_threshold: float = 0.8):
+        """
+        Initialize the packer.
+
+        Args:
+            budgets (dict, optional): Per-model token budgets overriding MODEL_TOKEN_BUDGETS
+            dedupe_threshold (float, optional): Jaccard similarity of all their words and numbers
+                above which a sentence is considered a duplicate of one already kept. Defaults to 0.8
+        """
+        self.budgets = {**MODEL_TOKEN_BUDGETS, **(budgets or {})}
+        self.dedupe_threshold = dedupe_threshold
+
+    def budget_for(self, model: str) -> int:
+        """
+        Get the context token budget for a model.
+
+        Args:
+            model (str): Model name
+
+        Returns:
+            int: Token budget
+        """
+        return self.budgets.get(model, DEFAULT_TOKEN_BUDGET)
+
+    def _split(self, passages):
+        """
+        Split passages into deduplicated sentences, remembering the line of each one.
+
+        Args:
+            passages (list): List of (label, text) tuples
+
+        Returns:
+            list: Sentences as dicts with passage index, line, position, text and terms
+        """
+        sentences = []
+        kept_keys = []
+        seen = set()
+        for passage_idx, (_, text) in enumerate(passages):
+            position = 0
+            for line_idx, line in enumerate(text.splitlines()):
+                for sentence in _SENTENCE_SPLIT.split(line):
+                    sentence = sentence.strip()
+                    if not sentence:
+                        continue
+                    position += 1
+                    key = _key(sentence)
+                    normalized = " ".join(key) or sentence.lower()
+                    if normalized in seen:
+                        continue
+                    key_set = set(key)
+                    if key_set and any(
+                        len(key_set & other) / len(key_set | other) >= self.dedupe_threshold
+                        for other in kept_keys
+                    ):
+                        continue
+                    seen.add(normalized)
+                    if key_set:
+                        kept_keys.append(key_set)
+                    sentences.append({
+                        "passage": passage_idx,
+                        "line": line_idx,
+                        "position": position,
+                        "text": sentence,
+                        "terms": _terms(sentence)
+                    })
+        return sentences
+
+    def pack(self, query: str, passages: List[Union[str, Tuple[str, str]]],
+             model: str = "mistral-medium", budget: int = None) -> str:
+        """
+        Pack the most relevant, non-redundant sentences of the passages into a budget.
+
+        Args:
+            query (str): The user query used to rank sentences
+            passages (list): Passages as plain strings or (label, text) tuples
+            model (str, optional): Model whose tokenizer and budget are used. Defaults to "mistral-medium"
+            budget (int, optional): Explicit token budget overriding the model budget
+
+        Returns:
+            str: Packed context, one block per passage in relevance order, keeping the
+                passages' line breaks
+        """
+        passages = [
+            (p[0], str(p[1])) if isinstance(p, tuple) else (None, str(p))
+            for p in passages if (p[1] if isinstance(p, tuple) else p)
+        ]
+        if not passages:
+            return ""
+        budget = budget if budget is not None else self.budget_for(model)
+
+        sentences = self._split(passages)
+        if not sentences:
+            return ""
+
+        query_terms = _terms(query)
+        if query_terms:
+            bm25 = BM25Okapi([s["terms"] or [""] for s in sentences])
+            scores = bm25.get_scores(query_terms)
+        else:
+            scores = [0.0] * len(sentences)
+        for sentence, score in zip(sentences, scores):
+            sentence["score"] = float(score)
+
+        passage_scores = {}
+        for sentence in sentences:
+            idx = sentence["passage"]
+            passage_scores[idx] = max(passage_scores.get(idx, 0.0), sentence["score"])
+        passage_rank = {
+            idx: rank for rank, idx in enumerate(
+                sorted(passage_scores, key=lambda i: (-passage_scores[i], i))
+            )
+        }
+
+        selected = {}
+        used = 0
+        ranked = sorted(
+            sentences,
+            key=lambda s: (-s["score"], passage_rank[s["passage"]], s["position"])
+        )
+        for sentence in ranked:
+            cost = count_tokens(sentence["text"], model) + 1
+            idx = sentence["passage"]
+            label = passages[idx][0]
+            if idx not in selected and label:
+                cost += count_tokens(f"{label}:", model) + 1
+            if used + cost > budget:
+                continue
+            selected.setdefault(idx, []).append(sentence)
+            used += cost
+
+        blocks = []
+        for idx in sorted(selected, key=lambda i: passage_rank[i]):
+            lines = {}
+            for sentence in sorted(selected[idx], key=lambda s: s["position"]):
+                lines.setdefault(sentence["line"], []).append(sentence["text"])
+            text = "\n".join(" ".join(line) for line in lines.values())
+            label = passages[idx][0]
+            blocks.append(f"{label}: {text}" if label else text)
+        return "\n\n".join(blocks)
@@ -0,0 +1,202 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Event, Lock
+from telemetry.metrics import MetricsRegistry
+
+_current_token = ContextVar("cancellation_token", default=None)
+
+
+class OperationCancelled(Exception):
+    """
+    Raised when work is attempted under a cancelled token.
+    """
+
+    def __init__(self, operation, reason):
+        super().__init__(f"{operation} cancelado: {reason}")
+        self.operation = operation
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation signal with an optional deadline. A child token is
+    cancelled with its parent and never outlives the parent's deadline.
+    Blocking calls check the token before starting and bound their waits by it.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        """
+        Initialize the token.
+
+        Args:
+            timeout (float, optional): Seconds from now until the deadline. Defaults to no deadline
+            parent (CancellationToken, optional): Token whose cancellation also cancels this one
+        """
+        self.parent = parent
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        if parent is not None and parent.deadline is not None:
+            self.deadline = parent.deadline if self.deadline is None else min(self.deadline, parent.deadline)
+        self.reason = None
+        self._event = Event()
+        self._callbacks = []
+        self._lock = Lock()
+        if parent is not None:
+            parent.add_callback(lambda: self.cancel(parent.reason))
+
+    def cancel(self, reason="cancelled"):
+        """
+        Cancel the token and its children. Later calls keep the first reason.
+
+        Args:
+            reason (str, optional): Why the work was abandoned. Defaults to "cancelled"
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """
+        Call a function when the token is cancelled, right away if it already is.
+
+        Args:
+            callback (callable): Function without arguments
+
+        Returns:
+            callable: Function removing the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @property
+    def cancelled(self):
+        """
+        bool: True if the token was cancelled or its deadline has passed.
+        """
+        return self._event.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def remaining(self, timeout=None):
+        """
+        Get how long a wait may last under this token.
+
+        Args:
+            timeout (float, optional): The caller's own limit
+
+        Returns:
+            float: Seconds left, or None if neither the token nor the caller set a limit
+        """
+        if self.deadline is None:
+            return timeout
+        left = max(0.0, self.deadline - time.monotonic())
+        return left if timeout is None else min(left, timeout)
+
+    def check(self, operation):
+        """
+        Raise if work must not go on, recording the cancellation.
+
+        Args:
+            operation (str): Name of the operation about to run, e.g. "llm" or "vector_search"
+
+        Raises:
+            OperationCancelled: If the token is cancelled or past its deadline
+        """
+        if not self.cancelled:
+            return
+        reason = self.reason or "deadline"
+        metrics = MetricsRegistry()
+        metrics.increment(f"cancellation.{operation}")
+        metrics.increment(f"cancellation.reason.{reason}")
+        raise OperationCancelled(operation, reason)
+
+
+def current_token():
+    """
+    Get the cancellation token of the current context.
+
+    Returns:
+        CancellationToken: The token, or None outside any cancellation scope
+    """
+    return _current_token.get()
+
+
+@contextmanager
+def cancellation_scope(token=None, timeout=None):
+    """
+    Make a token current for the work done in the scope, including threads submitted
+    with a copied context and asyncio tasks created from it.
+
+    Args:
+        token (CancellationToken, optional): Token to use. Defaults to a child of the current token
+        timeout (float, optional): Deadline in seconds for the new child token
+
+    Yields:
+        CancellationToken: The current token
+    """
+    if token is None:
+        token = CancellationToken(timeout, parent=current_token())
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def check_cancelled(operation):
+    """
+    Raise if the current token is cancelled or past its deadline.
+
+    Args:
+        operation (str): Name of the operation about to run
+
+    Raises:
+        OperationCancelled: If the work must not start
+    """
+    token = current_token()
+    if token is not None:
+        token.check(operation)
+
+
+async def run_cancellable(awaitable, operation, timeout=None):
+    """
+    Await a coroutine, cancelling it as soon as the current token is cancelled or expires.
+
+    Args:
+        awaitable: The coroutine or future to await
+        operation (str): Name of the awaited operation
+        timeout (float, optional): The caller's own limit
+
+    Returns:
+        Any: The awaitable's result
+
+    Raises:
+        OperationCancelled: If the token was cancelled or its deadline passed first
+        asyncio.TimeoutError: If the caller's own timeout expired first
+    """
+    token = current_token()
+    if token is None:
+        return await asyncio.wait_for(awaitable, timeout)
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(awaitable)
+    remove = token.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        return await asyncio.wait_for(task, token.remaining(timeout))
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        token.check(operation)
+        raise
+    finally:
+        remove()
@@ -0,0 +1,234 @@
+import asyncio
+import time
+from collections import OrderedDict
+from threading import Lock
+from telemetry.metrics import MetricsRegistry
+
+
+class Stage:
+    """
+    A step of a Pipeline. It reads named values produced by other stages or given to
+    the run, and produces named values of its own.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=None, when=None, default=None,
+                 memo_key=None, memo_ttl=300, memo_size=256):
+        """
+        Initialize the stage.
+
+        Args:
+            name (str): Stage name, used in timings and metrics
+            run (callable): Coroutine function receiving the inputs as keyword arguments.
+                It returns the value of a single output, or a tuple with one value per output
+            inputs (tuple, optional): Names of the values the stage reads. Defaults to none
+            outputs (tuple, optional): Names of the values the stage produces. Defaults to (name,)
+            when (callable, optional): Receives the inputs as a dict; the stage is skipped
+                when it returns False. Defaults to always running
+            default (optional): Value of every output when the stage is skipped. Defaults to None
+            memo_key (callable, optional): Receives the inputs as a dict and returns a hashable
+                key; results are reused for memo_ttl seconds per key. Defaults to no memoization
+            memo_ttl (float, optional): Seconds a memoized result is reused. Defaults to 300
+            memo_size (int, optional): Maximum number of memoized results. Defaults to 256
+        """
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs or (name,))
+        self.when = when
+        self.default = default
+        self.memo_key = memo_key
+        self.memo_ttl = memo_ttl
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = Lock()
+
+    def _recall(self, key):
+        with self._memo_lock:
+            entry = self._memo.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.memo_ttl:
+                return None
+            self._memo.move_to_end(key)
+            return entry
+
+    def _remember(self, key, result):
+        with self._memo_lock:
+            self._memo[key] = (result, time.monotonic())
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _split(self, result):
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result))
+
+    async def execute(self, values):
+        """
+        Run the stage, or reuse its memoized result.
+
+        Args:
+            values (dict): Values available to the run, including every input
+
+        Returns:
+            tuple: (outputs as a dict, status) where status is "ran", "skipped" or "memoized"
+        """
+        arguments = {name: values[name] for name in self.inputs}
+        if self.when is not None and not self.when(arguments):
+            return {output: self.default for output in self.outputs}, "skipped"
+        key = self.memo_key(arguments) if self.memo_key else None
+        if key is not None:
+            entry = self._recall(key)
+            if entry is not None:
+                return self._split(entry[0]), "memoized"
+        result = await self.run(**arguments)
+        if key is not None:
+            self._remember(key, result)
+        return self._split(result), "ran"
+
+
+class PipelineResult:
+    """
+    Values and per-stage timing breakdown of a pipeline run.
+    """
+
+    def __init__(self, values, timings, statuses):
+        self.values = values
+        self.timings = timings
+        self.statuses = statuses
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def breakdown(self):
+        """
+        Get the timing breakdown of the run.
+
+        Returns:
+            dict: seconds and status ("ran", "skipped" or "memoized") by stage, in completion order
+        """
+        return {
+            name: {"seconds": round(seconds, 4), "status": self.statuses[name]}
+            for name, seconds in self.timings.items()
+        }
+
+
+class Pipeline:
+    """
+    Declarative DAG of stages. Each stage starts as soon as the stages producing its
+    inputs finish, so independent stages run concurrently on the event loop. Only the
+    stages needed for the requested outputs run, and values already given to the run
+    are not recomputed.
+    """
+
+    def __init__(self, name, stages):
+        """
+        Initialize the pipeline.
+
+        Args:
+            name (str): Pipeline name, used in metrics as "pipeline.{name}.{stage}.seconds"
+            stages (list): The stages
+
+        Raises:
+            ValueError: If two stages produce the same value or the stages form a cycle
+        """
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"'{output}' is produced by both {self.producers[output].name} and {stage.name}")
+                self.producers[output] = stage
+        self.metrics = MetricsRegistry()
+        self._order = self._topological_order()
+
+    def _dependencies(self, stage):
+        return {self.producers[name].name for name in stage.inputs if name in self.producers}
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(stage):
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Pipeline {self.name} has a cycle through {stage.name}")
+            visiting.add(stage.name)
+            for dependency in self._dependencies(stage):
+                visit(self.stages[dependency])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+            order.append(stage)
+
+        for stage in self.stages.values():
+            visit(stage)
+        return order
+
+    def _plan(self, values, targets):
+        """
+        Select the stages needed to produce the targets from the given values.
+
+        Args:
+            values (dict): Values given to the run
+            targets (Iterable[str]): Values requested
+
+        Returns:
+            list: The stages to run, in topological order
+
+        Raises:
+            KeyError: If a needed value is neither given nor produced by any stage
+        """
+        needed, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name in values:
+                continue
+            stage = self.producers.get(name)
+            if stage is None:
+                raise KeyError(f"Pipeline {self.name} needs '{name}', which no stage produces")
+            if stage.name not in needed:
+                needed.add(stage.name)
+                pending.extend(stage.inputs)
+        return [stage for stage in self._order if stage.name in needed]
+
+    async def run(self, values, targets=None, on_stage=None):
+        """
+        Run the stages needed for the targets.
+
+        Args:
+            values (dict): Initial values, e.g. the prompt and the services the stages use
+            targets (Iterable[str], optional): Values requested. Defaults to every stage output
+            on_stage (callable, optional): Called with the stage name, status and seconds
+                as each stage finishes, e.g. to stream progress
+
+        Returns:
+            PipelineResult: Every value available at the end and the timing of each stage
+        """
+        values = dict(values)
+        timings, statuses = {}, {}
+        tasks = {}
+
+        async def run_stage(stage):
+            dependencies = [tasks[name] for name in self._dependencies(stage) if name in tasks]
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            start = time.perf_counter()
+            outputs, status = await stage.execute(values)
+            elapsed = time.perf_counter() - start
+            values.update(outputs)
+            timings[stage.name] = elapsed
+            statuses[stage.name] = status
+            self.metrics.observe(f"pipeline.{self.name}.{stage.name}.seconds", elapsed)
+            if status != "ran":
+                self.metrics.increment(f"pipeline.{self.name}.{stage.name}.{status}")
+            if on_stage is not None:
+                on_stage(stage.name, status, elapsed)
+
+        for stage in self._plan(values, targets or self.producers):
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return PipelineResult(values, timings, statuses)
@@ -0,0 +1,67 @@
+import asyncio
+from threading import Lock, Thread
+
+_loop = None
+_loop_lock = Lock()
+
+
+def get_event_loop():
+    """
+    Get the process-wide event loop, starting its thread on first use.
+    Every session schedules its turns on this loop, so async clients and their
+    connection pools are shared instead of being rebuilt per asyncio.run call.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running background loop
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                Thread(target=loop.run_forever, name="GPTur_EventLoop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+async def _in_context(coro, context):
+    return await asyncio.get_running_loop().create_task(coro, context=context)
+
+
+def run_coroutine(coro, timeout=None, context=None):
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+
+    Args:
+        coro: The coroutine to run
+        timeout (float, optional): Seconds to wait before giving up
+        context (contextvars.Context, optional): Context the coroutine runs in, e.g. the
+            caller's copy so its cancellation token and turn accounting apply. Defaults to the loop's
+
+    Returns:
+        Any: The coroutine's result
+
+    Raises:
+        RuntimeError: If called from the loop's own thread, where waiting would deadlock
+    """
+    loop = get_event_loop()
+    if asyncio._get_running_loop() is loop:
+        coro.close()
+        raise RuntimeError("run_coroutine no puede esperar en el hilo del bucle de eventos; usa la variante async")
+    if context is not None:
+        coro = _in_context(coro, context)
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+async def arun_coroutine(coro):
+    """
+    Asynchronous variant of run_coroutine, for callers on another event loop such as
+    the HTTP server's. Cancelling the caller cancels the coroutine.
+
+    Args:
+        coro: The coroutine to run
+
+    Returns:
+        Any: The coroutine's result
+    """
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_event_loop()))
@@ -0,0 +1,238 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from queue import PriorityQueue
+from threading import Lock, Thread
+from telemetry.metrics import MetricsRegistry
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = ContextVar("executor_priority", default=INTERACTIVE)
+
+
+# Answer shown to users whose turn is shed
+BUSY_MESSAGE = "GPTur está atendiendo muchas consultas ahora mismo. Inténtalo de nuevo en unos segundos."
+
+
+class ServiceBusyError(RuntimeError):
+    """
+    Raised when a pool is saturated and sheds new work.
+    """
+
+
+@contextmanager
+def background_priority():
+    """
+    Run the work submitted in the scope behind interactive turns.
+    """
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def background_context():
+    """
+    Build an empty context whose work runs at background priority. Work started in it
+    is detached from the current request: no deadline, cancellation or turn accounting.
+
+    Returns:
+        contextvars.Context: The context
+    """
+    context = contextvars.Context()
+    context.run(_priority.set, BACKGROUND)
+    return context
+
+
+class PriorityPool(Executor):
+    """
+    Bounded thread pool serving interactive work before background work.
+    Submissions beyond the queue limit are rejected with ServiceBusyError; background
+    work is rejected once half of the queue is used, so it never crowds out users.
+    Submitted callables run in a copy of the submitter's context.
+    """
+
+    def __init__(self, name, workers, max_queue):
+        """
+        Initialize the pool.
+
+        Args:
+            name (str): Name used for the threads and the metrics
+            workers (int): Number of worker threads
+            max_queue (int): Maximum number of queued tasks
+        """
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.metrics = MetricsRegistry()
+        self._queue = PriorityQueue()
+        self._sequence = count()
+        self._threads = []
+        self._lock = Lock()
+        self._shutdown = False
+
+    def _limit(self, priority):
+        return self.max_queue if priority == INTERACTIVE else self.max_queue // 2
+
+    def saturated(self, priority=INTERACTIVE):
+        """
+        Check whether new work of a priority would be shed.
+
+        Args:
+            priority (int, optional): INTERACTIVE or BACKGROUND. Defaults to INTERACTIVE
+
+        Returns:
+            bool: True if the queue is at its limit for that priority
+        """
+        return self._queue.qsize() >= self._limit(priority)
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = Thread(
+                    target=self._work, name=f"GPTur_{self.name}_{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        Queue a callable with the current context's priority.
+
+        Args:
+            fn (callable): Function to run
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Future: The future of the call
+
+        Raises:
+            ServiceBusyError: If the pool is saturated for the current priority
+            RuntimeError: If the pool has been shut down
+        """
+        if self._shutdown:
+            raise RuntimeError(f"El pool {self.name} está cerrado")
+        priority = _priority.get()
+        if self.saturated(priority):
+            self.metrics.increment(f"executor.{self.name}.shed")
+            raise ServiceBusyError(f"El pool {self.name} está saturado")
+        self._start_workers()
+        future = Future()
+        self._queue.put((
+            priority, next(self._sequence), time.perf_counter(), future,
+            contextvars.copy_context(), fn, args, kwargs
+        ))
+        self.metrics.observe(f"executor.{self.name}.queue_depth", self._queue.qsize())
+        return future
+
+    def _work(self):
+        while True:
+            _, _, queued_at, future, context, fn, args, kwargs = self._queue.get()
+            if future is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.metrics.observe(f"executor.{self.name}.queue_wait_seconds", time.perf_counter() - queued_at)
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._shutdown = True
+        with self._lock:
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put((float("inf"), next(self._sequence), 0, None, None, None, (), {}))
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+class ExecutorService:
+    """
+    Process-wide pools: "cpu" for NLP, embeddings and optimization, and "io" for
+    agents, retrieval and HTTP. LLM calls need no pool: they run on the shared event
+    loop, even when issued synchronously from an "io" thread.
+    """
+
+    def __init__(self, cpu_workers=None, io_workers=None, max_queue=None):
+        """
+        Initialize the service. Sizes default to the GPTUR_CPU_WORKERS, GPTUR_IO_WORKERS
+        and GPTUR_MAX_QUEUE environment variables.
+
+        Args:
+            cpu_workers (int, optional): Threads for CPU-bound work. Defaults to the CPU count
+            io_workers (int, optional): Threads for I/O-bound work. Defaults to 32
+            max_queue (int, optional): Queue limit of each pool. Defaults to 256
+        """
+        max_queue = max_queue or int(os.getenv("GPTUR_MAX_QUEUE", "256"))
+        self.cpu = PriorityPool(
+            "cpu", cpu_workers or int(os.getenv("GPTUR_CPU_WORKERS", str(os.cpu_count() or 2))), max_queue
+        )
+        self.io = PriorityPool("io", io_workers or int(os.getenv("GPTUR_IO_WORKERS", "32")), max_queue)
+
+    def admit(self):
+        """
+        Admission control for a new turn: reject it up front instead of failing midway.
+
+        Raises:
+            ServiceBusyError: If any pool is saturated for the current priority
+        """
+        priority = _priority.get()
+        for pool in (self.cpu, self.io):
+            if pool.saturated(priority):
+                MetricsRegistry().increment("executor.rejected_turns")
+                raise ServiceBusyError(f"El pool {pool.name} está saturado")
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        """
+        Await a CPU-bound call on the cpu pool.
+
+        Args:
+            fn (callable): Function to run
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Any: The result of fn
+        """
+        return await asyncio.wrap_future(self.cpu.submit(fn, *args, **kwargs))
+
+    async def run_io(self, fn, *args, **kwargs):
+        """
+        Await a blocking I/O call on the io pool.
+
+        Args:
+            fn (callable): Function to run
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Any: The result of fn
+        """
+        return await asyncio.wrap_future(self.io.submit(fn, *args, **kwargs))
+
+
+_service = None
+_service_lock = Lock()
+
+
+def get_executor_service():
+    """
+    Get the process-wide executor service, creating it on first use.
+
+    Returns:
+        ExecutorService: The shared service
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ExecutorService()
+    return _service
@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+from telemetry.metrics import MetricsRegistry
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is in flight,
+    further callers with the same key wait on its result instead of repeating the work.
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name):
+        """
+        Initialize the group.
+
+        Args:
+            name (str): Name used for the metrics, e.g. "llm" or "retrieval"
+        """
+        self.name = name
+        self.metrics = MetricsRegistry()
+        self._lock = Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    def _count(self, coalesced):
+        self.metrics.increment(f"single_flight.{self.name}.calls")
+        if coalesced:
+            self.metrics.increment(f"single_flight.{self.name}.coalesced")
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn for a key, or wait for the identical call already in flight.
+
+        Args:
+            key (Hashable): Identity of the call
+            fn (callable): Function doing the work
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Any: The result of fn, shared by every coalesced caller
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        self._count(coalesced=not leader)
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _forget(self, key, call):
+        # A cancelled call may still be finishing when a new one for the key starts
+        if self._tasks.get(key) is call:
+            del self._tasks[key]
+
+    async def ado(self, key, coro_fn, *args, **kwargs):
+        """
+        Asynchronous variant of do. The shared call is cancelled when every caller
+        waiting on it has been cancelled, e.g. by a turn deadline.
+
+        Args:
+            key (Hashable): Identity of the call
+            coro_fn (callable): Coroutine function doing the work
+            *args, **kwargs: Arguments for coro_fn
+
+        Returns:
+            Any: The result of coro_fn, shared by every coalesced caller
+        """
+        call = self._tasks.get(key)
+        leader = call is None
+        if leader:
+            call = {"task": asyncio.ensure_future(coro_fn(*args, **kwargs)), "waiters": 0}
+            self._tasks[key] = call
+            call["task"].add_done_callback(lambda _: self._forget(key, call))
+        self._count(coalesced=not leader)
+        call["waiters"] += 1
+        try:
+            # Shielded so that a cancelled caller does not cancel the work the others wait on
+            return await asyncio.shield(call["task"])
+        except asyncio.CancelledError:
+            if call["waiters"] == 1 and not call["task"].done():
+                self.metrics.increment(f"single_flight.{self.name}.abandoned")
+                self._forget(key, call)
+                call["task"].cancel()
+            raise
+        finally:
+            call["waiters"] -= 1
+
+    def stats(self):
+        """
+        Get the coalescing counts.
+
+        Returns:
+            dict: calls, coalesced and in_flight counts
+        """
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "calls": int(self.metrics.counter(f"single_flight.{self.name}.calls")),
+            "coalesced": int(self.metrics.counter(f"single_flight.{self.name}.coalesced")),
+            "in_flight": in_flight + len(self._tasks)
+        }
@@ -0,0 +1,132 @@
+from collections import defaultdict, deque
+from threading import Lock
+import numpy as np
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry of counters and latency histograms.
+    Histograms keep a bounded window of recent observations to compute percentiles.
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, window=10000):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(MetricsRegistry, cls).__new__(cls)
+                    cls._instance._counters = defaultdict(float)
+                    cls._instance._histograms = defaultdict(lambda: deque(maxlen=window))
+        return cls._instance
+
+    def increment(self, name, value=1):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Counter name
+            value (float, optional): Amount to add. Defaults to 1
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, value):
+        """
+        Record an observation in a histogram.
+
+        Args:
+            name (str): Histogram name
+            value (float): Observed value
+        """
+        with self._lock:
+            self._histograms[name].append(value)
+
+    def counter(self, name):
+        """
+        Get the current value of a counter.
+
+        Args:
+            name (str): Counter name
+
+        Returns:
+            float: Counter value, 0 if never incremented
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def count(self, name):
+        """
+        Get the number of observations held by a histogram.
+
+        Args:
+            name (str): Histogram name
+
+        Returns:
+            int: Number of observations
+        """
+        with self._lock:
+            return len(self._histograms.get(name, ()))
+
+    def percentile(self, name, q):
+        """
+        Get a percentile of a histogram.
+
+        Args:
+            name (str): Histogram name
+            q (float): Percentile between 0 and 100
+
+        Returns:
+            float: The percentile, or None if there are no observations
+        """
+        with self._lock:
+            values = list(self._histograms.get(name, ()))
+        if not values:
+            return None
+        return float(np.percentile(values, q))
+
+    def summary(self, name):
+        """
+        Summarize a histogram.
+
+        Args:
+            name (str): Histogram name
+
+        Returns:
+            dict: count, sum, mean, p50, p95 and p99 of the observations
+        """
+        with self._lock:
+            values = np.array(self._histograms.get(name, ()))
+        if not len(values):
+            return {"count": 0}
+        return {
+            "count": int(len(values)),
+            "sum": float(values.sum()),
+            "mean": float(values.mean()),
+            "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)),
+            "p99": float(np.percentile(values, 99))
+        }
+
+    def snapshot(self):
+        """
+        Get every counter and histogram summary.
+
+        Returns:
+            dict: {"counters": {...}, "histograms": {...}}
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._histograms)
+        return {
+            "counters": counters,
+            "histograms": {name: self.summary(name) for name in names}
+        }
+
+    def reset(self):
+        """
+        Remove every counter and observation.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
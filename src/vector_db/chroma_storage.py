@@ -4,8 +4,11 @@ from .embeddings import get_embeddings
 from langchain_core.documents import Document
 import os
 import json
+import time
 from pathlib import Path
 import chromadb
+from runtime.cancellation import check_cancelled
+from runtime.single_flight import SingleFlight
 
 class VectorStorage:
     def __init__(self):
@@ -24,6 +27,12 @@ class VectorStorage:
             embedding_function=self.embeddings
         )
         
+        self.single_flight = SingleFlight("retrieval")
+        # Bumped whenever documents change, so caches built on retrieval know they are stale
+        self.index_version = 0
+        # time.time() of the last change to the documents, 0 if unchanged since startup
+        self.last_update = 0
+        
         self._sources_file = "sources.json"
         self.sources = self._load_sources()
     
@@ -70,6 +79,8 @@ class VectorStorage:
         documents = loader.load()
         if documents:
             self.db.add_documents(documents)
+            self.index_version += 1
+            self.last_update = time.time()
             print(f"Índice actualizado con {len(documents)} documentos")
 
     def get_documents(self):
@@ -93,9 +104,23 @@ class VectorStorage:
             print(f"Error obteniendo documentos: {str(e)}")
             return []
         
+    def count(self):
+        """
+        Count the documents in the collection.
+
+        Returns:
+            int: Number of documents
+        """
+        try:
+            return self.client.get_collection(self.collection_name).count()
+        except Exception as e:
+            print(f"Error contando documentos: {str(e)}")
+            return 0
+
     def similarity_search(self, query, k=4):
         """
         Perform similarity search on the document collection.
+        Concurrent identical searches share a single lookup.
 
         Args:
             query (str): The search query
@@ -103,8 +128,12 @@ class VectorStorage:
 
         Returns:
             list: Top k similar documents
+
+        Raises:
+            OperationCancelled: If the current request was cancelled or is past its deadline
         """
-        return self.db.similarity_search(query, k=k)
+        check_cancelled("vector_search")
+        return self.single_flight.do((query, k), self.db.similarity_search, query, k=k)
         
     def reload_data(self):
         """
@@ -147,6 +176,8 @@ class VectorStorage:
                 print(f"Se cargaron {len(documents)} documentos")
             else:
                 print("Advertencia: No se cargaron documentos")
+            self.index_version += 1
+            self.last_update = time.time()
                 
         except Exception as e:
             print(f"Error en reload_data: {str(e)}")
@@ -0,0 +1,306 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from threading import Lock
+import numpy as np
+from langchain_core.documents import Document
+from runtime.cancellation import check_cancelled
+from runtime.single_flight import SingleFlight
+from telemetry.metrics import MetricsRegistry
+from .embeddings import get_embeddings
+
+# "local": this process owns the Chroma store; "shared": read the generations published by index_writer.py
+INDEX_MODE = os.getenv("GPTUR_INDEX_MODE", "local")
+INDEX_DIR = Path(os.getenv("GPTUR_INDEX_DIR", Path(__file__).parent / "generations"))
+# Generations kept on disk besides the current one
+INDEX_KEEP = 2
+# Seconds between checks for a newly published generation
+RELOAD_INTERVAL = 10
+# Seconds a starting worker waits for the writer's first generation
+INDEX_WAIT = float(os.getenv("GPTUR_INDEX_WAIT", "120"))
+
+
+class IndexGeneration:
+    """
+    A published generation of the index, memory-mapped read-only: normalized
+    embeddings, document texts and metadata.
+    """
+
+    def __init__(self, directory):
+        """
+        Open a generation.
+
+        Args:
+            directory (Path): The generation's directory
+        """
+        with open(directory / "manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(directory / "metadata.json", "r", encoding="utf-8") as f:
+            self.metadatas = json.load(f)
+        self.version = manifest["version"]
+        self.last_update = manifest["last_update"]
+        self.embeddings = np.load(directory / "embeddings.npy", mmap_mode="r")
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        self.texts = np.memmap(directory / "texts.bin", dtype=np.uint8, mode="r") if self.offsets[-1] else b""
+
+    def __len__(self):
+        return len(self.metadatas)
+
+    def document(self, index):
+        """
+        Get a document of the generation.
+
+        Args:
+            index (int): Position of the document
+
+        Returns:
+            Document: Its text and metadata
+        """
+        text = bytes(self.texts[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+        return Document(page_content=text, metadata=dict(self.metadatas[index]))
+
+    def similarity_search(self, vector, k=4):
+        """
+        Find the documents closest to a normalized query embedding.
+
+        Args:
+            vector (np.ndarray): The query embedding
+            k (int, optional): Number of results. Defaults to 4
+
+        Returns:
+            list: The k most similar documents, best first
+        """
+        if not len(self):
+            return []
+        scores = self.embeddings @ vector
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return [self.document(int(i)) for i in best[np.argsort(-scores[best])]]
+
+
+def publish_generation(embeddings, texts, metadatas, last_update, directory=INDEX_DIR):
+    """
+    Write a new generation and make it current. Readers never see a partial
+    generation: it is written to a temporary directory, renamed, and only then is
+    CURRENT replaced atomically. Old generations are removed; workers still mapping
+    them keep reading their files until they switch.
+
+    Args:
+        embeddings (np.ndarray): Normalized document embeddings, one row per document
+        texts (list): Document texts
+        metadatas (list): Document metadata dicts
+        last_update (float): time.time() of the last change to the documents
+        directory (Path, optional): Root of the generations. Defaults to INDEX_DIR
+
+    Returns:
+        int: The published version
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    version = current_version(directory) + 1
+    staging = directory / f"{version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    encoded = [text.encode("utf-8") for text in texts]
+    np.save(staging / "embeddings.npy", np.ascontiguousarray(embeddings, dtype=np.float32))
+    np.save(staging / "offsets.npy", np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64))
+    with open(staging / "texts.bin", "wb") as f:
+        f.write(b"".join(encoded))
+    with open(staging / "metadata.json", "w", encoding="utf-8") as f:
+        json.dump(metadatas, f, ensure_ascii=False)
+    with open(staging / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"version": version, "documents": len(texts), "last_update": last_update}, f)
+
+    target = directory / str(version)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    current = directory / "CURRENT.tmp"
+    current.write_text(str(version))
+    os.replace(current, directory / "CURRENT")
+
+    for old in directory.iterdir():
+        if old.is_dir() and old.name.isdigit() and int(old.name) < version - INDEX_KEEP:
+            shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+def current_version(directory=INDEX_DIR):
+    """
+    Get the version of the current generation.
+
+    Args:
+        directory (Path, optional): Root of the generations. Defaults to INDEX_DIR
+
+    Returns:
+        int: The version, 0 if none was published
+    """
+    try:
+        return int((directory / "CURRENT").read_text().strip())
+    except (OSError, ValueError):
+        return 0
+
+
+def request_update(kind, directory=INDEX_DIR):
+    """
+    Ask the index writer to change the index.
+
+    Args:
+        kind (str): "update" to add the newly crawled documents, "reload" to rebuild the index
+        directory (Path, optional): Root of the generations. Defaults to INDEX_DIR
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"REQUEST.{kind}").touch()
+
+
+def take_requests(directory=INDEX_DIR):
+    """
+    Collect and clear the pending requests to the index writer.
+
+    Args:
+        directory (Path, optional): Root of the generations. Defaults to INDEX_DIR
+
+    Returns:
+        set: The kinds requested
+    """
+    kinds = set()
+    for request in directory.glob("REQUEST.*"):
+        try:
+            request.unlink()
+            kinds.add(request.suffix[1:])
+        except FileNotFoundError:
+            pass
+    return kinds
+
+
+class SharedVectorStorage:
+    """
+    Read-only VectorStorage for request workers. Searches run over the current
+    generation published by the index writer, memory-mapped and shared by every
+    worker on the host. Changes to the index are requested from the writer, and the
+    workers pick up the new generation within RELOAD_INTERVAL seconds.
+    """
+
+    def __init__(self, directory=INDEX_DIR):
+        """
+        Initialize the storage.
+
+        Args:
+            directory (Path, optional): Root of the generations. Defaults to INDEX_DIR
+        """
+        self.directory = directory
+        self.embeddings = get_embeddings()
+        self.single_flight = SingleFlight("retrieval")
+        self.metrics = MetricsRegistry()
+        self._generation = None
+        self._checked_at = 0.0
+        self._reload_lock = Lock()
+        self._sources_file = Path(__file__).parent.parent / "data" / "sources.json"
+
+    def generation(self):
+        """
+        Get the current generation, opening a newer one if it was published.
+
+        Returns:
+            IndexGeneration: The generation, or None if none was published
+        """
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < RELOAD_INTERVAL:
+            return self._generation
+        with self._reload_lock:
+            if self._generation is not None and now - self._checked_at < RELOAD_INTERVAL:
+                return self._generation
+            self._checked_at = now
+            version = current_version(self.directory)
+            if version and (self._generation is None or self._generation.version != version):
+                try:
+                    self._generation = IndexGeneration(self.directory / str(version))
+                    self.metrics.increment("shared_index.opened")
+                except (OSError, ValueError) as e:
+                    print(f"Error abriendo la generación {version} del índice: {str(e)}")
+        return self._generation
+
+    def wait_for_generation(self, timeout=INDEX_WAIT):
+        """
+        Block until a generation is published, e.g. while a worker starts before the writer.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to INDEX_WAIT
+
+        Returns:
+            IndexGeneration: The generation, or None if none was published in time
+        """
+        deadline = time.monotonic() + timeout
+        while (generation := self.generation()) is None and time.monotonic() < deadline:
+            time.sleep(0.5)
+        return generation
+
+    @property
+    def index_version(self):
+        generation = self.generation()
+        return generation.version if generation else 0
+
+    @property
+    def last_update(self):
+        generation = self.generation()
+        return generation.last_update if generation else 0
+
+    def count(self):
+        generation = self.generation()
+        return len(generation) if generation else 0
+
+    def get_documents(self):
+        generation = self.generation()
+        if generation is None:
+            return []
+        return [generation.document(i) for i in range(len(generation))]
+
+    def _search(self, query, k):
+        generation = self.generation()
+        if generation is None:
+            return []
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        return generation.similarity_search(vector, k)
+
+    def similarity_search(self, query, k=4):
+        """
+        Perform similarity search on the current generation.
+        Concurrent identical searches share a single lookup.
+
+        Args:
+            query (str): The search query
+            k (int, optional): Number of results to return. Defaults to 4
+
+        Returns:
+            list: Top k similar documents
+
+        Raises:
+            OperationCancelled: If the current request was cancelled or is past its deadline
+        """
+        check_cancelled("vector_search")
+        return self.single_flight.do((query, k), self._search, query, k)
+
+    def update_index(self):
+        """
+        Ask the index writer to add the newly crawled documents.
+        """
+        request_update("update", self.directory)
+
+    def reload_data(self):
+        """
+        Ask the index writer to rebuild the index from the data file.
+        """
+        request_update("reload", self.directory)
+
+    def get_sources(self):
+        """
+        Get the list of source URLs for the crawler.
+
+        Returns:
+            list: List of source URLs
+        """
+        if self._sources_file.exists():
+            with open(self._sources_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []